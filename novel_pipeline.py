@@ -14,10 +14,25 @@ import requests
 import re
 import time
 import json
+import math
+import atexit
+import difflib
+import fcntl
 import hashlib
+import io
+import mimetypes
+import queue
+import threading
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from dataclasses import dataclass, asdict
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Union
+
+import numpy as np
 
 # ============================================================
 # CONFIG
@@ -37,6 +52,8 @@ load_env()
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
+TELEGRAM_THREAD_ID = os.environ.get("TELEGRAM_THREAD_ID")  # Forum-Thread pro Run (optional)
+TELEGRAM_WEBHOOK_RELAY = os.environ.get("TELEGRAM_WEBHOOK_RELAY")  # z.B. http://localhost:8444
 QDRANT_URL = os.environ.get("QDRANT_URL", "http://localhost:6333")
 
 GEMINI_MODEL_PRO = "gemini-3-pro-preview"
@@ -58,17 +75,92 @@ def log(message: str, also_print: bool = True):
         with open(LOG_FILE, "a") as f:
             f.write(line + "\n")
 
+# ============================================================
+# RUN-STATUS + STEUERUNG (/pause, /resume, /cancel, /skip)
+# ============================================================
+
+class PipelineCancelled(Exception):
+    """Wird bei /cancel am nächsten Haltepunkt (vor einem LLM-Call) ausgelöst"""
+
+
+# In-Memory Status des laufenden Runs - /status liest nur hieraus, keine Disk-Scans
+RUN_STATE = {
+    "setting": None,
+    "output_dir": None,
+    "phase": "⏳ Warte auf Start",
+    "detail": "",
+    "kapitel": 0,
+    "kapitel_gesamt": 0,
+    "woerter": 0,
+    "llm_calls": 0,
+    "iterationen_gespart": 0,
+    "start": None,
+    "paused": False,
+    "cancel": False,
+    "skip": False,
+}
+_STATE_LOCK = threading.Lock()
+
+
+def set_status(**kwargs):
+    """Aktualisiert den In-Memory Status (thread-safe)"""
+    with _STATE_LOCK:
+        RUN_STATE.update(kwargs)
+
+
+def increment_status(key: str, amount: int = 1):
+    """Zähler im In-Memory Status erhöhen (thread-safe)"""
+    with _STATE_LOCK:
+        RUN_STATE[key] = RUN_STATE.get(key, 0) + amount
+
+
+def check_control():
+    """Kooperativer Haltepunkt zwischen LLM-Calls: blockiert bei /pause, bricht bei /cancel ab"""
+    announced = False
+    while True:
+        with _STATE_LOCK:
+            cancel = RUN_STATE["cancel"]
+            paused = RUN_STATE["paused"]
+        if cancel:
+            raise PipelineCancelled()
+        if not paused:
+            if announced:
+                log("   ▶️ Fortgesetzt")
+            return
+        if not announced:
+            log("   ⏸️ Pausiert - warte auf /resume...")
+            announced = True
+        time.sleep(2)
+
+
+def skip_requested() -> bool:
+    """Löst ein ausstehendes /skip ein - True wenn der aktuelle optionale Schritt entfallen soll"""
+    with _STATE_LOCK:
+        if RUN_STATE["skip"]:
+            RUN_STATE["skip"] = False
+            return True
+    return False
+
+
 # ============================================================
 # API CALLS
 # ============================================================
 
-def call_gemini(prompt: str, max_tokens: int = 16000, retries: int = 3) -> str:
-    """Gemini API Call mit Retry-Logik"""
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+def call_gemini(prompt: str, max_tokens: int = 16000, retries: int = 3, use_flash: bool = False,
+                response_schema: dict = None) -> str:
+    """Gemini API Call mit Retry-Logik (use_flash = Flash-Modell für Kritik/Checks,
+    response_schema = JSON-Ausgabe nach Schema erzwingen, Antwort ist dann ein JSON-String)"""
+    check_control()
+    increment_status("llm_calls")
+    model = GEMINI_MODEL_FLASH if use_flash else GEMINI_MODEL_PRO
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={GEMINI_API_KEY}"
     payload = {
         "contents": [{"parts": [{"text": prompt}]}],
         "generationConfig": {"temperature": 0.8, "maxOutputTokens": max_tokens}
     }
+    if response_schema:
+        payload["generationConfig"]["responseMimeType"] = "application/json"
+        payload["generationConfig"]["responseSchema"] = response_schema
     
     for attempt in range(retries):
         try:
@@ -99,8 +191,69 @@ def call_gemini(prompt: str, max_tokens: int = 16000, retries: int = 3) -> str:
     return ""
 
 
+def validate_schema(data, schema: dict, path: str = "$") -> List[str]:
+    """Minimal-Validierung gegen ein Gemini responseSchema (OpenAPI-Subset) - Liste der Fehler"""
+    typ = schema.get("type", "").upper()
+    checks = {"OBJECT": dict, "ARRAY": list, "STRING": str, "INTEGER": int, "NUMBER": (int, float), "BOOLEAN": bool}
+    if typ in checks and (not isinstance(data, checks[typ]) or (typ in ("INTEGER", "NUMBER") and isinstance(data, bool))):
+        return [f"{path}: erwartet {typ}, erhalten {type(data).__name__}"]
+    
+    errors = []
+    if typ == "OBJECT":
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append(f"{path}.{key}: fehlt")
+        for key, sub in schema.get("properties", {}).items():
+            if key in data:
+                errors.extend(validate_schema(data[key], sub, f"{path}.{key}"))
+    elif typ == "ARRAY":
+        if len(data) < schema.get("minItems", 0):
+            errors.append(f"{path}: mindestens {schema['minItems']} Einträge, erhalten {len(data)}")
+        for i, item in enumerate(data):
+            errors.extend(validate_schema(item, schema.get("items", {}), f"{path}[{i}]"))
+    elif typ in ("INTEGER", "NUMBER"):
+        if "minimum" in schema and data < schema["minimum"]:
+            errors.append(f"{path}: {data} < {schema['minimum']}")
+        if "maximum" in schema and data > schema["maximum"]:
+            errors.append(f"{path}: {data} > {schema['maximum']}")
+    elif typ == "STRING" and "enum" in schema and data not in schema["enum"]:
+        errors.append(f"{path}: \"{data}\" nicht in {schema['enum']}")
+    return errors
+
+
+def call_gemini_json(prompt: str, schema: dict, max_tokens: int = 16000, use_flash: bool = False) -> Optional[dict]:
+    """Gemini mit JSON-Schema - validiert, bei Fehlern EIN gezielter Reparatur-Call (None wenn ungültig)"""
+    raw = call_gemini(prompt, max_tokens=max_tokens, use_flash=use_flash, response_schema=schema)
+    
+    for attempt in range(2):
+        try:
+            data = json.loads(re.sub(r'^```(?:json)?\s*|\s*```$', '', raw.strip()))
+            errors = validate_schema(data, schema)
+        except ValueError as e:
+            data, errors = None, [f"kein gültiges JSON: {e}"]
+        
+        if not errors:
+            return data
+        log(f"    ⚠️ JSON-Ausgabe ungültig ({len(errors)} Fehler): {'; '.join(errors[:3])}")
+        if attempt == 1 or not raw.strip():
+            return None
+        
+        # Reparatur: nur die Fehler beheben, Inhalt unverändert lassen
+        raw = call_gemini(f"""Das folgende JSON verletzt das Schema. Behebe NUR diese Fehler,
+ändere den Inhalt sonst nicht:
+
+FEHLER:
+{chr(10).join(errors[:20])}
+
+JSON:
+{raw}""", max_tokens=max_tokens, use_flash=True, response_schema=schema)
+    return None
+
+
 def call_claude(prompt: str, timeout: int = 600) -> str:
     """Claude Code CLI aufrufen"""
+    check_control()
+    increment_status("llm_calls")
     try:
         result = subprocess.run(
             ["claude", "--print", prompt], 
@@ -121,6 +274,14 @@ def call_claude(prompt: str, timeout: int = 600) -> str:
 # TELEGRAM
 # ============================================================
 
+def telegram_target() -> dict:
+    """Ziel-Felder für Bot-API Calls (Chat + optional Forum-Thread dieses Runs)"""
+    target = {"chat_id": TELEGRAM_CHAT_ID}
+    if TELEGRAM_THREAD_ID:
+        target["message_thread_id"] = TELEGRAM_THREAD_ID
+    return target
+
+
 def telegram_send(message: str) -> bool:
     """Nachricht an Telegram senden - splittet automatisch bei langen Nachrichten"""
     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
@@ -132,7 +293,7 @@ def telegram_send(message: str) -> bool:
         if len(message) <= MAX_LEN:
             # Kurze Nachricht - direkt senden
             requests.post(url, json={
-                "chat_id": TELEGRAM_CHAT_ID,
+                **telegram_target(),
                 "text": message,
                 "parse_mode": "Markdown"
             }, timeout=30)
@@ -162,7 +323,7 @@ def telegram_send(message: str) -> bool:
             for i, part in enumerate(parts):
                 header = f"_Teil {i+1}/{total}_\n\n" if total > 1 else ""
                 requests.post(url, json={
-                    "chat_id": TELEGRAM_CHAT_ID,
+                    **telegram_target(),
                     "text": header + part,
                     "parse_mode": "Markdown"
                 }, timeout=30)
@@ -174,41 +335,120 @@ def telegram_send(message: str) -> bool:
         return False
 
 
-def telegram_send_file(content: str, filename: str, caption: str = "") -> bool:
-    """Sendet eine Textdatei als Dokument via Telegram"""
-    import tempfile
-    
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendDocument"
+TELEGRAM_MAX_UPLOAD = 49 * 1024 * 1024  # Bot-API Limit 50 MB, etwas Luft für Multipart
+TELEGRAM_COMPRESS_UPLOADS = os.environ.get("TELEGRAM_COMPRESS_UPLOADS", "0") == "1"
+
+
+def telegram_send_file(content: Union[str, bytes, Path], filename: str, caption: str = "",
+                       compress: bool = False) -> bool:
+    """Sendet eine Datei als Dokument via Telegram
     
+    content: Text, Bytes oder Pfad eines vorhandenen Artefakts (wird direkt gelesen,
+    keine Temp-Datei). compress=True packt als ZIP. Über TELEGRAM_MAX_UPLOAD wird
+    automatisch in Teile gesplittet.
+    """
     try:
-        # Temporäre Datei erstellen
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as f:
-            f.write(content)
-            temp_path = f.name
-        
-        # Datei senden
-        with open(temp_path, 'rb') as f:
-            r = requests.post(url, data={
-                "chat_id": TELEGRAM_CHAT_ID,
-                "caption": caption[:1024] if caption else ""  # Telegram caption limit
-            }, files={
-                "document": (filename, f, "text/markdown")
-            }, timeout=60)
+        if isinstance(content, Path):
+            if compress:
+                data = zip_files([content])
+            elif content.stat().st_size <= TELEGRAM_MAX_UPLOAD:
+                # Kleines Artefakt: Datei-Handle direkt hochladen
+                with open(content, 'rb') as f:
+                    return _telegram_upload(f, filename, caption)
+            else:
+                data = content.read_bytes()
+        elif isinstance(content, str):
+            data = content.encode("utf-8")
+        else:
+            data = content
         
-        # Aufräumen
-        os.remove(temp_path)
+        if compress and not isinstance(content, Path):
+            data = zip_bytes({filename: data})
+        if compress:
+            filename = filename.rsplit(".", 1)[0] + ".zip"
         
-        if r.status_code == 200:
-            return True
-        else:
-            log(f"    ⚠️ Telegram File Error: {r.text[:200]}")
-            return False
-            
+        parts = split_upload(data, filename)
+        for i, (part_name, part) in enumerate(parts):
+            part_caption = caption if i == 0 else f"Teil {i+1}/{len(parts)}"
+            if not _telegram_upload(io.BytesIO(part), part_name, part_caption):
+                return False
+        return True
+    
     except Exception as e:
         log(f"    ⚠️ Telegram File Fehler: {e}")
         return False
 
 
+def telegram_send_zip(paths: List[Path], zip_name: str, caption: str = "") -> bool:
+    """Mehrere Artefakte als ein ZIP senden (z.B. Roman + alle Kapitel)"""
+    try:
+        return telegram_send_file(zip_files(paths), zip_name, caption)
+    except Exception as e:
+        log(f"    ⚠️ Telegram ZIP Fehler: {e}")
+        return False
+
+
+def zip_bytes(files: Dict[str, bytes]) -> bytes:
+    """In-Memory ZIP aus {Dateiname: Inhalt}"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def zip_files(paths: List[Path]) -> bytes:
+    """In-Memory ZIP aus vorhandenen Dateien (direkt vom Pfad gelesen)"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        for path in paths:
+            zf.write(path, arcname=path.name)
+    return buffer.getvalue()
+
+
+def split_upload(data: bytes, filename: str, max_bytes: int = None) -> List[tuple]:
+    """Teilt Uploads über dem Telegram-Limit: Text an Zeilengrenzen, Binärdaten als .001, .002, ..."""
+    max_bytes = max_bytes or TELEGRAM_MAX_UPLOAD
+    if len(data) <= max_bytes:
+        return [(filename, data)]
+    
+    is_text = filename.rsplit(".", 1)[-1] in ("md", "txt")
+    chunks = []
+    pos = 0
+    while pos < len(data):
+        end = min(pos + max_bytes, len(data))
+        if is_text and end < len(data):
+            # An Zeilengrenze schneiden (UTF-8 bleibt so intakt)
+            newline = data.rfind(b"\n", pos, end)
+            if newline > pos:
+                end = newline + 1
+        chunks.append(data[pos:end])
+        pos = end
+    
+    if is_text:
+        base, ext = filename.rsplit(".", 1)
+        return [(f"{base}_teil{i+1}.{ext}", c) for i, c in enumerate(chunks)]
+    return [(f"{filename}.{i+1:03d}", c) for i, c in enumerate(chunks)]
+
+
+def _telegram_upload(fileobj, filename: str, caption: str) -> bool:
+    """Ein sendDocument Upload aus einem Datei-Objekt"""
+    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendDocument"
+    mime = "text/markdown" if filename.endswith(".md") else (mimetypes.guess_type(filename)[0] or "application/octet-stream")
+    
+    r = requests.post(url, data={
+        **telegram_target(),
+        "caption": caption[:1024] if caption else ""  # Telegram caption limit
+    }, files={
+        "document": (filename, fileobj, mime)
+    }, timeout=300)
+    
+    if r.status_code == 200:
+        return True
+    log(f"    ⚠️ Telegram File Error: {r.text[:200]}")
+    return False
+
+
 def text_to_speech(text: str, output_path: Path, voice: str = "Anna") -> Path:
     """Konvertiert Text zu MP3 via macOS say + ffmpeg"""
     import subprocess
@@ -251,95 +491,293 @@ def text_to_speech(text: str, output_path: Path, voice: str = "Anna") -> Path:
         return None
 
 
-def telegram_approval_file(filename: str, content: str, caption: str, timeout_minutes: int = 60) -> bool:
-    """Telegram Approval mit Datei-Anhang für lange Inhalte"""
-    # Datei senden
-    telegram_send_file(content, filename, caption)
-    # Dann Approval-Buttons als separate Nachricht
-    telegram_send("✅ JA = weiter\n❌ NEIN = neu generieren")
+# Zuletzt zur Freigabe gesendete Fassung je Dokument (für Diff-Runden)
+_APPROVAL_SENT = {}
+
+
+def telegram_approval_file(filename: str, content: str, caption: str, timeout_minutes: int = 60,
+                           key: str = None) -> bool:
+    """Telegram Approval mit Datei-Anhang für lange Inhalte
+    
+    Ab der zweiten Runde desselben Dokuments (key, Default: filename) geht nur
+    eine Änderungs-Übersicht + Unified Diff raus. VOLL schickt die komplette Datei.
+    """
+    key = key or filename
+    previous = _APPROVAL_SENT.get(key)
+    _APPROVAL_SENT[key] = content
+    
+    def send_full():
+        telegram_send_file(content, filename, caption)
+    
+    if previous is None or previous == content:
+        # Erste Runde: Datei senden
+        send_full()
+        # Dann Approval-Buttons als separate Nachricht
+        telegram_send("✅ JA = weiter\n❌ NEIN = neu generieren")
+        return telegram_wait_for_approval(timeout_minutes)
+    
+    summary, diff = approval_diff(previous, content)
+    log(f"      📝 Sende Diff statt Volltext ({len(diff):,} statt {len(content):,} Zeichen)")
+    
+    if len(diff) > len(content) * 0.6:
+        # Fast alles neu - Diff wäre größer als hilfreich
+        send_full()
+    elif len(summary) + len(diff) < 3500:
+        telegram_send(f"{caption}\n\n{summary}\n\n```\n{diff}\n```")
+    else:
+        telegram_send(f"{caption}\n\n{summary}")
+        telegram_send_file(diff, filename.rsplit(".", 1)[0] + "_diff.md", "Änderungen zur letzten Fassung")
+    
+    telegram_send("✅ JA = weiter\n❌ NEIN = neu generieren\n📄 VOLL = komplette Datei")
+    return telegram_wait_for_approval(timeout_minutes, on_full=send_full)
+
+
+def split_sections(text: str) -> Dict[str, str]:
+    """Markdown in {Überschrift: Inhalt} zerlegen (Text vor der ersten Überschrift unter "")
+    
+    Wiederholte Überschriften bekommen ihr Vorkommen angehängt ("Konflikt", "Konflikt [2]"),
+    damit keine Abschnitte zusammenfallen.
+    """
+    sections = {}
+    current = ""
+    lines = []
+    seen = {}
+    for line in text.splitlines():
+        if re.match(r'^#{1,3}\s', line):
+            sections[current] = "\n".join(lines).strip()
+            heading = line.lstrip("#").strip()
+            seen[heading] = seen.get(heading, 0) + 1
+            current = heading if seen[heading] == 1 else f"{heading} [{seen[heading]}]"
+            lines = []
+        else:
+            lines.append(line)
+    sections[current] = "\n".join(lines).strip()
+    if not sections.get(""):
+        sections.pop("", None)
+    return sections
+
+
+def approval_diff(previous: str, current: str) -> tuple:
+    """(Abschnitts-Übersicht, kompakter Unified Diff) zwischen zwei Fassungen"""
+    old_sections = split_sections(previous)
+    new_sections = split_sections(current)
+    
+    summary = []
+    for title, body in new_sections.items():
+        if title not in old_sections:
+            summary.append(f"➕ {title or 'Einleitung'}")
+        elif old_sections[title] != body:
+            ratio = difflib.SequenceMatcher(None, old_sections[title], body).quick_ratio()
+            summary.append(f"✏️ {title or 'Einleitung'} ({100 - int(ratio * 100)}% geändert)")
+    for title in old_sections:
+        if title not in new_sections:
+            summary.append(f"➖ {title or 'Einleitung'}")
+    
+    unchanged = len([t for t in new_sections if old_sections.get(t) == new_sections[t]])
+    header = f"🔄 *Änderungen zur letzten Fassung* ({unchanged} Abschnitte unverändert)"
+    
+    diff = "\n".join(difflib.unified_diff(
+        previous.splitlines(), current.splitlines(),
+        fromfile="vorher", tofile="neu", n=1, lineterm=""
+    ))
+    return header + "\n" + "\n".join(summary), diff
+
+
+def telegram_approval(message: str, timeout_minutes: int = 60) -> bool:
+    """Telegram Approval mit JA/NEIN Antwort"""
+    telegram_send(message + "\n\n✅ JA = weiter\n❌ NEIN = neu generieren")
+    
+    return telegram_wait_for_approval(timeout_minutes)
+
+
+def telegram_wait_for_approval(timeout_minutes: int = 60, on_full=None) -> bool:
+    """Wartet auf JA/NEIN aus dem Update-Listener (Steuerbefehle laufen parallel weiter)
     
+    on_full: Callback für die Antwort VOLL (komplette Datei nachreichen)
+    """
     log(f"      📱 Warte auf Approval (max {timeout_minutes} min)...")
     
-    # Letzte Update-ID merken
-    try:
-        updates = requests.get(
-            f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getUpdates",
-            timeout=10
-        ).json()
-        last_update_id = updates["result"][-1]["update_id"] if updates.get("result") else 0
-    except:
-        last_update_id = 0
+    telegram_start_listener()
+    
+    # Alte Antworten verwerfen - nur Antworten auf DIESE Frage zählen
+    while not TELEGRAM_REPLIES.empty():
+        try:
+            TELEGRAM_REPLIES.get_nowait()
+        except queue.Empty:
+            break
     
     start_time = time.time()
     while time.time() - start_time < timeout_minutes * 60:
-        time.sleep(3)
+        if RUN_STATE["cancel"]:
+            raise PipelineCancelled()
         
         try:
-            updates = requests.get(
-                f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getUpdates",
-                params={"offset": last_update_id + 1},
-                timeout=10
-            ).json()
-            
-            for update in updates.get("result", []):
-                last_update_id = update["update_id"]
-                text = update.get("message", {}).get("text", "").lower().strip()
-                
-                if text in ["ja", "yes", "j", "y", "ok", "👍"]:
-                    log(f"      ✅ Approved!")
-                    return True
-                elif text in ["nein", "no", "n", "👎"]:
-                    log(f"      ❌ Abgelehnt")
-                    return False
-        except:
+            text = TELEGRAM_REPLIES.get(timeout=3).lower().strip()
+        except queue.Empty:
             continue
+        
+        if text in ["ja", "yes", "j", "y", "ok", "👍"]:
+            log(f"      ✅ Approved!")
+            return True
+        elif text in ["nein", "no", "n", "👎"]:
+            log(f"      ❌ Abgelehnt")
+            return False
+        elif on_full and text in ["voll", "full", "📄"]:
+            log(f"      📄 Volltext angefordert")
+            on_full()
     
     log(f"      ⏰ Timeout - fahre fort")
     return True
 
 
-def telegram_approval(message: str, timeout_minutes: int = 60) -> bool:
-    """Telegram Approval mit JA/NEIN Antwort"""
-    telegram_send(message + "\n\n✅ JA = weiter\n❌ NEIN = neu generieren")
+# ============================================================
+# TELEGRAM UPDATE-LISTENER + STEUERBEFEHLE
+# ============================================================
+
+# Freitext-Antworten (JA/NEIN) für die Approval-Checkpoints
+TELEGRAM_REPLIES = queue.Queue()
+_LISTENER_THREAD = None
+
+
+def telegram_get_updates(offset: int = None, timeout: int = 0) -> list:
+    """getUpdates Aufruf (timeout > 0 = Long-Polling)
     
-    log(f"      📱 Warte auf Approval (max {timeout_minutes} min)...")
+    Mit TELEGRAM_WEBHOOK_RELAY kommen die Updates stattdessen vom Webhook-Relay
+    (telegram_webhook_server.py), gefiltert auf Chat + Thread dieses Runs.
+    So teilen sich mehrere Pipelines einen Bot-Token, ohne sich Antworten zu stehlen.
+    """
+    params = {"timeout": timeout}
+    if offset is not None:
+        params["offset"] = offset
     
-    # Letzte Update-ID merken
+    if TELEGRAM_WEBHOOK_RELAY:
+        params["chat_id"] = TELEGRAM_CHAT_ID or ""
+        params["thread_id"] = TELEGRAM_THREAD_ID or ""
+        url = f"{TELEGRAM_WEBHOOK_RELAY.rstrip('/')}/updates"
+    else:
+        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getUpdates"
+    
+    headers = {"X-Relay-Token": os.environ.get("TELEGRAM_WEBHOOK_SECRET", "")} if TELEGRAM_WEBHOOK_RELAY else {}
+    r = requests.get(url, params=params, headers=headers, timeout=timeout + 10)
+    return r.json().get("result", [])
+
+
+def telegram_start_listener():
+    """Startet den einzigen Konsumenten des Update-Streams (Daemon-Thread, idempotent)"""
+    global _LISTENER_THREAD
+    
+    if _LISTENER_THREAD and _LISTENER_THREAD.is_alive():
+        return
+    if not TELEGRAM_BOT_TOKEN and not TELEGRAM_WEBHOOK_RELAY:
+        return
+    
+    _LISTENER_THREAD = threading.Thread(target=_telegram_listen, name="telegram-listener", daemon=True)
+    _LISTENER_THREAD.start()
+
+
+def _telegram_listen():
+    """Pollt Updates und verteilt sie: Befehle an die Handler, Freitext an TELEGRAM_REPLIES"""
+    # Letzte Update-ID merken - alte Nachrichten nicht erneut verarbeiten
     try:
-        updates = requests.get(
-            f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getUpdates",
-            timeout=10
-        ).json()
-        last_update_id = updates["result"][-1]["update_id"] if updates.get("result") else 0
-    except:
+        updates = telegram_get_updates()
+        last_update_id = updates[-1]["update_id"] if updates else 0
+    except Exception:
         last_update_id = 0
     
-    start_time = time.time()
-    while time.time() - start_time < timeout_minutes * 60:
-        time.sleep(3)
-        
+    while True:
         try:
-            updates = requests.get(
-                f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getUpdates",
-                params={"offset": last_update_id + 1},
-                timeout=10
-            ).json()
-            
-            for update in updates.get("result", []):
+            for update in telegram_get_updates(offset=last_update_id + 1, timeout=25):
                 last_update_id = update["update_id"]
-                text = update.get("message", {}).get("text", "").lower().strip()
-                
-                if text in ["ja", "yes", "j", "y", "ok", "👍"]:
-                    log(f"      ✅ Approved!")
-                    return True
-                elif text in ["nein", "no", "n", "👎"]:
-                    log(f"      ❌ Abgelehnt")
-                    return False
-        except:
-            continue
+                telegram_handle_update(update)
+        except Exception as e:
+            log(f"   ⚠️ Telegram Polling Fehler: {e}", also_print=False)
+            time.sleep(3)
+
+
+def telegram_handle_update(update: dict):
+    """Ein einzelnes Update verarbeiten"""
+    message = update.get("message", {})
+    text = message.get("text", "").strip()
+    if not text:
+        return
     
-    log(f"      ⏰ Timeout - fahre fort")
-    return True
+    # Nur der konfigurierte Chat (und Thread) darf steuern
+    chat_id = message.get("chat", {}).get("id")
+    if TELEGRAM_CHAT_ID and chat_id is not None and str(chat_id) != str(TELEGRAM_CHAT_ID):
+        return
+    if TELEGRAM_THREAD_ID and str(message.get("message_thread_id", "")) != str(TELEGRAM_THREAD_ID):
+        return
+    
+    if text.startswith("/"):
+        command = text.split()[0].lower().split("@")[0]
+        handler = TELEGRAM_COMMANDS.get(command)
+        if handler:
+            telegram_send(handler())
+            return
+    
+    TELEGRAM_REPLIES.put(text)
+
+
+def format_status() -> str:
+    """Status-Nachricht aus dem In-Memory Status"""
+    with _STATE_LOCK:
+        state = dict(RUN_STATE)
+    
+    lines = [f"📊 *Status*", "", f"Phase: {state['phase']}"]
+    if state["detail"]:
+        lines.append(f"Schritt: {state['detail']}")
+    if state["kapitel_gesamt"]:
+        lines.append(f"Kapitel: {state['kapitel']}/{state['kapitel_gesamt']}")
+    lines.append(f"Wörter: {state['woerter']:,}")
+    lines.append(f"LLM-Calls: {state['llm_calls']}")
+    if state["iterationen_gespart"]:
+        lines.append(f"Self-Critique gespart: {state['iterationen_gespart']} Iterationen")
+    if state["start"]:
+        lines.append(f"Laufzeit: {str(datetime.now() - state['start']).split('.')[0]}")
+    if state["paused"]:
+        lines.append("⏸️ Pausiert")
+    if state["cancel"]:
+        lines.append("🛑 Abbruch angefordert")
+    return "\n".join(lines)
+
+
+def _command_pause() -> str:
+    set_status(paused=True)
+    return "⏸️ Pause angefordert - greift vor dem nächsten LLM-Call"
+
+
+def _command_resume() -> str:
+    set_status(paused=False)
+    return "▶️ Pipeline läuft weiter"
+
+
+def _command_cancel() -> str:
+    set_status(cancel=True, paused=False)
+    return "🛑 Abbruch angefordert - Checkpoint wird gespeichert"
+
+
+def _command_skip() -> str:
+    set_status(skip=True)
+    return "⏭️ Nächster optionaler Schritt (Self-Critique, Polish, Übergangs-Check) wird übersprungen"
+
+
+def _command_help() -> str:
+    return ("🤖 *Befehle*\n\n"
+            "/status - Fortschritt\n"
+            "/pause - vor dem nächsten LLM-Call anhalten\n"
+            "/resume - weitermachen\n"
+            "/cancel - abbrechen (Checkpoint bleibt, `--resume` möglich)\n"
+            "/skip - aktuellen optionalen Schritt überspringen")
+
+
+TELEGRAM_COMMANDS = {
+    "/status": format_status,
+    "/pause": _command_pause,
+    "/resume": _command_resume,
+    "/cancel": _command_cancel,
+    "/skip": _command_skip,
+    "/help": _command_help,
+}
 
 
 def telegram_wait_for_start(setting_prompt: str = None) -> str:
@@ -354,11 +792,8 @@ def telegram_wait_for_start(setting_prompt: str = None) -> str:
     
     # Letzte Update-ID merken
     try:
-        updates = requests.get(
-            f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getUpdates",
-            timeout=10
-        ).json()
-        last_update_id = updates["result"][-1]["update_id"] if updates.get("result") else 0
+        updates = telegram_get_updates()
+        last_update_id = updates[-1]["update_id"] if updates else 0
     except:
         last_update_id = 0
     
@@ -366,13 +801,9 @@ def telegram_wait_for_start(setting_prompt: str = None) -> str:
         time.sleep(3)
         
         try:
-            updates = requests.get(
-                f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getUpdates",
-                params={"offset": last_update_id + 1},
-                timeout=10
-            ).json()
+            updates = telegram_get_updates(offset=last_update_id + 1)
             
-            for update in updates.get("result", []):
+            for update in updates:
                 last_update_id = update["update_id"]
                 text = update.get("message", {}).get("text", "").strip()
                 
@@ -402,85 +833,1200 @@ def telegram_wait_for_start(setting_prompt: str = None) -> str:
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 QDRANT_COLLECTION = os.environ.get("QDRANT_COLLECTION", "memory_novelpipeline")
+# "shared" = eine Collection, Runs per run_id getrennt | "run" = Collection pro Run |
+# "series" = Collection pro Serie (QDRANT_SERIES), Suche über alle Bände der Serie
+QDRANT_COLLECTION_MODE = os.environ.get("QDRANT_COLLECTION_MODE", "shared")
+QDRANT_SERIES = os.environ.get("QDRANT_SERIES", "")
+
+RUN_ID = None  # Name des Output-Verzeichnisses, gesetzt in run_pipeline
+
+
+# "openai" = text-embedding-3-small (Netzwerk) | "hashing" = lokaler N-Gramm-Vektorisierer (offline)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "openai")
+if EMBEDDING_BACKEND == "hashing":
+    EMBEDDING_MODEL = "hashing-char-ngram-v1"
+    EMBEDDING_DIM = int(os.environ.get("HASHING_EMBEDDING_DIM", "512"))
+else:
+    EMBEDDING_MODEL = "text-embedding-3-small"
+    EMBEDDING_DIM = 1536
+EMBEDDING_BATCH_SIZE = 96  # Inputs pro Backend-Aufruf
+EMBEDDING_CACHE_DIR = Path(os.environ.get("EMBEDDING_CACHE_DIR", Path(__file__).parent / ".embedding_cache"))
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "20000"))  # Vektoren (~6 KB pro Stück)
+
+
+class EmbeddingCache:
+    """Persistenter Embedding-Cache über Runs hinweg (mehrere Prozesse gleichzeitig)
+    
+    Vektoren liegen als float32 Matrix in einer Memmap-Datei (ein Slot pro Text), die erst
+    bei Bedarf wächst (verdoppelt, höchstens capacity Zeilen). Der Index {Text-Hash: Slot}
+    besteht aus einem JSON-Snapshot plus einem Journal, an das jeder Batch nur seine Zeilen
+    "hash slot" anhängt - neue Einträge UND Treffer. Alles läuft unter einem exklusiven
+    fcntl-Lock, vorher liest jeder Prozess die fremden Journal-Zeilen nach. Damit belegen zwei
+    Runs nie denselben freien Slot, und die LRU-Reihenfolge ist die gemeinsame aller Runs:
+    ist der Cache voll, wird der Slot des am längsten von keinem Run genutzten Eintrags
+    wiederverwendet.
+    """
+    
+    GROW_MIN_ROWS = 1024
+    
+    def __init__(self, directory: Path, model: str, dim: int, capacity: int):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.capacity = capacity
+        self.row_bytes = dim * 4
+        self.vectors_path = directory / f"{model}_{dim}.f32"
+        self.index_path = directory / f"{model}_{dim}.json"
+        self.journal_path = directory / f"{model}_{dim}.log"
+        self.lock_path = directory / f"{model}_{dim}.lock"
+        self.lock = threading.Lock()
+        self.index = OrderedDict()  # Hash -> Slot, älteste Nutzung zuerst
+        self.slots = {}             # Slot -> Hash
+        self.journal_offset = 0
+        self.snapshot_stamp = None
+        self.vectors = None
+        self.rows = 0
+        
+        with self.lock, self._file_lock(fcntl.LOCK_EX):
+            size = self.vectors_path.stat().st_size if self.vectors_path.exists() else -1
+            if size < 0 or size % self.row_bytes or size > capacity * self.row_bytes:
+                # Neu, anderes Format oder Kapazität verkleinert - leer anlegen
+                self.vectors_path.write_bytes(b"")
+                self._write_snapshot()
+            self._sync()
+    
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+    
+    @contextmanager
+    def _file_lock(self, mode: int):
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def _map(self):
+        """Memmap an die aktuelle Dateigröße anpassen (ein anderer Prozess kann sie vergrößert haben)"""
+        rows = self.vectors_path.stat().st_size // self.row_bytes
+        if rows != self.rows:
+            self.vectors = (np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+                            if rows else None)
+            self.rows = rows
+    
+    def _grow(self, slot: int):
+        """Datei vergrößern, bis slot hineinpasst (nur unter exklusivem Lock)"""
+        if slot < self.rows:
+            return
+        rows = min(self.capacity, max(self.rows * 2, slot + 1, self.GROW_MIN_ROWS))
+        if self.vectors is not None:
+            self.vectors.flush()
+        with open(self.vectors_path, "r+b") as f:
+            f.truncate(rows * self.row_bytes)  # mit Nullen auffüllen (sparse)
+        self._map()
+    
+    def _apply(self, key: str, slot: int):
+        """Eintrag übernehmen bzw. als zuletzt genutzt markieren - ein bisheriger Besitzer des Slots fliegt raus"""
+        previous = self.slots.get(slot)
+        if previous is not None and previous != key:
+            self.index.pop(previous, None)
+        old_slot = self.index.pop(key, None)
+        if old_slot is not None and old_slot != slot:
+            self.slots.pop(old_slot, None)
+        self.index[key] = slot
+        self.slots[slot] = key
+    
+    def _sync(self):
+        """Änderungen anderer Prozesse nachlesen (nur unter Datei-Lock aufrufen)"""
+        stamp = self.index_path.stat().st_mtime_ns if self.index_path.exists() else None
+        journal_size = self.journal_path.stat().st_size if self.journal_path.exists() else 0
+        if stamp != self.snapshot_stamp or journal_size < self.journal_offset:
+            # Snapshot neu geschrieben (Kompaktierung) - komplett neu laden
+            self.index.clear()
+            self.slots.clear()
+            self.journal_offset = 0
+            self.snapshot_stamp = stamp
+            if stamp is not None:
+                for key, slot in json.loads(self.index_path.read_text()):
+                    self._apply(key, slot)
+        if journal_size > self.journal_offset:
+            with open(self.journal_path, "rb") as f:
+                f.seek(self.journal_offset)
+                neu = f.read(journal_size - self.journal_offset)
+            # Nur vollständige Zeilen übernehmen
+            neu = neu[:neu.rfind(b"\n") + 1]
+            for line in neu.decode("utf-8").splitlines():
+                key, slot = line.split()
+                self._apply(key, int(slot))
+            self.journal_offset += len(neu)
+        self._map()
+    
+    def _write_snapshot(self):
+        """Index als JSON-Snapshot schreiben und Journal leeren (nur unter exklusivem Lock)"""
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(list(self.index.items())))
+        tmp.replace(self.index_path)
+        self.journal_path.write_bytes(b"")
+        self.journal_offset = 0
+        self.snapshot_stamp = self.index_path.stat().st_mtime_ns
+    
+    def _append_journal(self, zeilen: List[str]):
+        """Zeilen anhängen, bei zu langem Journal kompaktieren (nur unter exklusivem Lock)"""
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write("".join(zeilen))
+        self.journal_offset = self.journal_path.stat().st_size
+        if self.journal_offset > self.capacity * 20:  # ~ capacity/2 Zeilen: kompaktieren
+            self._write_snapshot()
+    
+    def _free_slot(self) -> int:
+        if len(self.slots) < self.capacity:
+            slot = len(self.slots)
+            if slot not in self.slots:
+                return slot
+            return next(s for s in range(self.capacity) if s not in self.slots)
+        _, slot = next(iter(self.index.items()))  # LRU verdrängen
+        return slot
+    
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cache-Treffer (Kopie) oder None je Text, Treffer rücken im gemeinsamen LRU nach hinten"""
+        results = []
+        zeilen = []
+        with self.lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            for text in texts:
+                key = self.key(text)
+                slot = self.index.get(key)
+                if slot is None:
+                    results.append(None)
+                else:
+                    self.index.move_to_end(key)
+                    results.append(np.array(self.vectors[slot]))
+                    zeilen.append(f"{key} {slot}\n")
+            if zeilen:
+                self._append_journal(zeilen)
+        return results
+    
+    def put_many(self, texts: List[str], vectors: List[np.ndarray]):
+        """Vektoren speichern, neue Index-Einträge ans Journal anhängen"""
+        with self.lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            zeilen = []
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                if key in self.index:
+                    continue  # Inzwischen von einem anderen Run gespeichert
+                slot = self._free_slot()
+                self._grow(slot)
+                self.vectors[slot] = vector
+                self._apply(key, slot)
+                zeilen.append(f"{key} {slot}\n")
+            if not zeilen:
+                return
+            # Vektoren vor dem Journal auf Disk: Leser sehen nie einen Eintrag ohne Vektor
+            self.vectors.flush()
+            self._append_journal(zeilen)
+    
+    def flush(self):
+        with self.lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            if self.vectors is not None:
+                self.vectors.flush()
+            self._write_snapshot()
+
+
+_EMBEDDING_CACHE = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Embedding-Cache lazy öffnen (einmal pro Prozess)"""
+    global _EMBEDDING_CACHE
+    if _EMBEDDING_CACHE is None:
+        _EMBEDDING_CACHE = EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL, EMBEDDING_DIM, EMBEDDING_CACHE_SIZE)
+    return _EMBEDDING_CACHE
+
+
+def embed_openai(texts: List[str], dokumente: bool = True) -> List[np.ndarray]:
+    """Embedding-Backend: OpenAI, ein Request pro Batch"""
+    r = requests.post("https://api.openai.com/v1/embeddings", headers={
+        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "Content-Type": "application/json"
+    }, json={
+        "model": EMBEDDING_MODEL,
+        "input": texts
+    }, timeout=60)
+    r.raise_for_status()
+    return [np.asarray(d["embedding"], dtype=np.float32)
+            for d in sorted(r.json()["data"], key=lambda d: d["index"])]
+
+
+class HashingEmbedder:
+    """Offline Embedding-Backend: gehashte Zeichen-N-Gramme (3-5) mit TF-IDF
+    
+    N-Gramme werden vektorisiert (Rolling Hash in NumPy) in 2^18 Buckets gezählt,
+    sublinear gewichtet (1 + log tf) und mit IDF aus einer laufend fortgeschriebenen
+    Dokumenthäufigkeit skaliert. Ein Count-Sketch (fester Bucket -> Dimension + Vorzeichen)
+    reduziert auf EMBEDDING_DIM - Skalarprodukte bleiben im Erwartungswert erhalten.
+    Nur gespeicherte Dokumente zählen für die Dokumenthäufigkeit, Suchanfragen nicht, und
+    jeder Text nur beim ersten Mal (Hash in seen). Die Häufigkeiten liegen neben dem
+    Embedding-Cache, damit Reruns dieselben Gewichte sehen. Sie werden verzögert geschrieben
+    (save: beim Flush und beim Beenden), nicht pro Aufruf.
+    Die Vektoren hängen vom IDF-Stand ab und gehen deshalb nicht in den EmbeddingCache -
+    ein alter Vektor wäre mit frischen nicht vergleichbar, und neu rechnen kostet nur NumPy.
+    """
+    
+    BITS = 18
+    NGRAMS = (3, 4, 5)
+    MASK = np.uint64(0xFFFFFFFF)
+    
+    def __init__(self, dim: int, state_path: Path = None):
+        self.dim = dim
+        self.state_path = state_path
+        self.lock = threading.Lock()
+        size = 1 << self.BITS
+        
+        buckets = np.arange(size, dtype=np.uint64)
+        mixed = (buckets * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)
+        self.projection = (mixed % np.uint64(dim)).astype(np.int64)
+        self.signs = np.where((mixed >> np.uint64(31)) & np.uint64(1), -1.0, 1.0).astype(np.float32)
+        
+        self.df = np.zeros(size, dtype=np.float32)
+        self.documents = 0
+        self.seen = set()  # 64-bit Hashes bereits gezählter Dokumente
+        self.dirty = False
+        if state_path and state_path.exists():
+            state = np.load(state_path)
+            self.df, self.documents = state["df"], int(state["documents"])
+            if "seen" in state:
+                self.seen = set(state["seen"].tolist())
+        atexit.register(self.save)
+    
+    def counts(self, text: str) -> np.ndarray:
+        """N-Gramm-Zählung eines Textes über alle Buckets"""
+        normalized = " " + " ".join(text.lower().split()) + " "
+        codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        hashes = []
+        for n in self.NGRAMS:
+            if len(codes) < n:
+                continue
+            h = np.full(len(codes) - n + 1, n, dtype=np.uint64)
+            for j in range(n):
+                h = (h * np.uint64(1000003) + codes[j:len(codes) - n + 1 + j]) & self.MASK
+            hashes.append(((h * np.uint64(2654435761)) & self.MASK) >> np.uint64(32 - self.BITS))
+        if not hashes:
+            return np.zeros(1 << self.BITS, dtype=np.float32)
+        return np.bincount(np.concatenate(hashes).astype(np.int64), minlength=1 << self.BITS).astype(np.float32)
+    
+    def save(self):
+        """Dokumenthäufigkeiten schreiben, falls seit dem letzten Speichern geändert"""
+        with self.lock:
+            if self.dirty and self.state_path:
+                np.savez(self.state_path, df=self.df, documents=self.documents,
+                         seen=np.fromiter(self.seen, dtype=np.uint64, count=len(self.seen)))
+                self.dirty = False
+    
+    def embed(self, texts: List[str], dokumente: bool = True) -> List[np.ndarray]:
+        """dokumente=False (Suchanfragen): IDF nur lesen, nicht fortschreiben"""
+        counts = [self.counts(t) for t in texts]
+        with self.lock:
+            if dokumente:
+                for text, c in zip(texts, counts):
+                    key = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16)
+                    if key in self.seen:
+                        continue
+                    self.seen.add(key)
+                    self.df += c > 0
+                    self.documents += 1
+                    self.dirty = True
+            idf = np.log((1.0 + self.documents) / (1.0 + self.df)) + 1.0
+        
+        vectors = []
+        for c in counts:
+            nz = np.flatnonzero(c)
+            weights = (1.0 + np.log(c[nz])) * idf[nz] * self.signs[nz]
+            vector = np.bincount(self.projection[nz], weights=weights, minlength=self.dim).astype(np.float32)
+            vectors.append(vector / (np.linalg.norm(vector) or 1.0))
+        return vectors
+
+
+_HASHING_EMBEDDER = None
+
+
+def embed_hashing(texts: List[str], dokumente: bool = True) -> List[np.ndarray]:
+    """Embedding-Backend: lokaler Hashing-Vektorisierer"""
+    global _HASHING_EMBEDDER
+    if _HASHING_EMBEDDER is None:
+        EMBEDDING_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _HASHING_EMBEDDER = HashingEmbedder(EMBEDDING_DIM, EMBEDDING_CACHE_DIR / f"{EMBEDDING_MODEL}_{EMBEDDING_DIM}_df.npz")
+    return _HASHING_EMBEDDER.embed(texts, dokumente)
+
+
+EMBEDDING_BACKENDS = {
+    "openai": embed_openai,
+    "hashing": embed_hashing,
+}
+# Vektoren hängen vom Zustand des Backends ab (IDF) - nicht im EmbeddingCache ablegen
+UNCACHED_BACKENDS = {"hashing"}
+
+
+def get_embeddings(texts: List[str], dokumente: bool = True) -> List[List[float]]:
+    """Batch-Embeddings mit persistentem Cache - nur Cache-Misses gehen ans Backend
+    
+    Fehlgeschlagene Texte liefern [] (wie get_embedding). dokumente=False für Suchanfragen.
+    """
+    texts = [t[:8000] for t in texts]  # Token limit
+    cache = get_embedding_cache() if EMBEDDING_BACKEND not in UNCACHED_BACKENDS else None
+    vectors = cache.get_many(texts) if cache else [None] * len(texts)
+    
+    # Duplikate nur einmal anfragen
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    fetched = {}
+    
+    for i in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+        batch = missing[i:i + EMBEDDING_BATCH_SIZE]
+        try:
+            batch_vectors = EMBEDDING_BACKENDS[EMBEDDING_BACKEND](batch, dokumente)
+            if cache:
+                cache.put_many(batch, batch_vectors)
+            fetched.update(zip(batch, batch_vectors))
+        except Exception as e:
+            log(f"   ⚠️ Embedding Fehler ({EMBEDDING_BACKEND}): {e}")
+    
+    if missing:
+        log(f"   🧮 Embeddings: {len(texts) - len(missing)} aus Cache, {len(fetched)} neu", also_print=False)
+    
+    results = []
+    for text, vector in zip(texts, vectors):
+        if vector is None:
+            vector = fetched.get(text)
+        results.append(vector.tolist() if vector is not None else [])
+    return results
 
 
 def get_embedding(text: str) -> List[float]:
-    """OpenAI Embedding für Text generieren (1536 dims)"""
-    try:
-        url = "https://api.openai.com/v1/embeddings"
-        headers = {
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": "text-embedding-3-small",
-            "input": text[:8000]  # Token limit
-        }
-        r = requests.post(url, headers=headers, json=payload, timeout=30)
-        r.raise_for_status()
-        return r.json()["data"][0]["embedding"]
-    except Exception as e:
-        log(f"   ⚠️ OpenAI Embedding Fehler: {e}")
-        return []
+    """Embedding für Text generieren (EMBEDDING_BACKEND, über Batch-API + Cache)"""
+    return get_embeddings([text])[0]
+
+
+# ============================================================
+# PASSAGEN-CHUNKING
+# ============================================================
+
+PASSAGE_WORDS = 220   # Ziel-Länge einer Passage
+PASSAGE_OVERLAP = 1   # Absätze, die in die nächste Passage überlappen
+
+# Szenenwechsel: *** / * * * / --- / ### Szene N
+SCENE_BREAK = re.compile(r'^\s*(?:\*\s*\*\s*\*|-{3,}|#{1,4}\s*Szene\b.*)\s*$', re.IGNORECASE)
+
 
+def split_paragraphs(text: str) -> List[tuple]:
+    """[(offset, absatz)] an Leerzeilen"""
+    return [(m.start(), m.group(0).strip()) for m in re.finditer(r'\S(?:.|\n(?!\s*\n))*', text)]
 
-def qdrant_init_collection(collection_name: str = None):
-    """Prüft ob Qdrant Collection erreichbar ist"""
-    collection_name = collection_name or QDRANT_COLLECTION
+
+def chunk_passages(text: str, max_words: int = PASSAGE_WORDS, overlap: int = PASSAGE_OVERLAP) -> List[dict]:
+    """Absatz-basierte, überlappende Passagen mit Szenen-Nummer und Zeichen-Offset
+    
+    Eine Passage endet bei ~max_words Wörtern oder an einem Szenenwechsel;
+    die letzten `overlap` Absätze werden in die nächste Passage übernommen
+    (nicht über Szenengrenzen hinweg).
+    """
+    passages = []
+    current = []  # [(offset, absatz, wörter)]
+    fresh = 0     # Absätze in current, die noch in keiner Passage stehen
+    szene = 1
+    
+    def emit():
+        passages.append({
+            "passage": len(passages),
+            "offset": current[0][0],
+            "szene": szene,
+            "text": "\n\n".join(p for _, p, _ in current)
+        })
+    
+    for offset, paragraph in split_paragraphs(text):
+        if SCENE_BREAK.match(paragraph):
+            if fresh:
+                emit()
+            if passages or fresh:
+                szene += 1
+            current, fresh = [], 0
+            continue
+        
+        current.append((offset, paragraph, len(paragraph.split())))
+        fresh += 1
+        if sum(w for _, _, w in current) >= max_words:
+            emit()
+            current = current[-overlap:] if overlap and len(current) > overlap else []
+            fresh = 0
+    
+    if fresh:
+        emit()
+    return passages
+
+
+# ============================================================
+# LOKALER VEKTOR-INDEX (NumPy, Fallback/Alternative zu Qdrant)
+# ============================================================
+
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "qdrant")  # "qdrant" oder "local"
+LOCAL_INDEX_QUANT = os.environ.get("LOCAL_INDEX_QUANT", "float32")  # "float32" oder "int8"
+# int8-Scan erst ab dieser float32-Matrixgröße - darunter liegt die Matrix im Page-Cache
+# und der exakte Scan ist mindestens gleich schnell
+LOCAL_INDEX_QUANT_MIN_MB = float(os.environ.get("LOCAL_INDEX_QUANT_MIN_MB", "512"))
+
+
+class LocalVectorStore:
+    """Eingebetteter Vektor-Store pro Output-Verzeichnis
+    
+    vectors.f32: float32 Matrix (L2-normalisiert, eine Zeile pro Punkt), für die Suche
+    als Memmap geöffnet - Cosinus-Suche ist ein einziges Matrix-Vektor-Produkt.
+    points.jsonl: {id, row, payload} pro Upsert, spätere Zeilen überschreiben frühere.
+    
+    quantize=True: zusätzlich vectors.i8 + scales.f32 (int8 pro Komponente, ein float32
+    Skalierungsfaktor pro Vektor). Der Scan läuft blockweise über die int8 Matrix (1/4 des
+    Speichers), nur die besten Kandidaten werden mit float32 exakt nachbewertet.
+    vectors.f32 bleibt bewusst erhalten: Es ist die Quelle für den exakten Rerank und für den
+    Neuaufbau der int8 Dateien. Die Platte wächst so um ~25%. Der Gewinn ist der
+    Arbeitsspeicher beim Scan: Nur die int8 Matrix plus rerank_depth float32-Zeilen müssen
+    im Page-Cache liegen, nicht die ganze float32 Matrix. Solange die float32 Matrix unter
+    scan_min_bytes liegt, scannt search() exakt (schneller). vectors.i8.stamp merkt sich,
+    zu welchem Stand von vectors.f32 die int8 Dateien passen.
+    
+    Filter: Die Felder aus FILTER_FIELDS liegen zusätzlich spaltenweise als int32 Codes im
+    Speicher (ein Code pro Wert, -1 = fehlt/gelöscht). Die Kandidatenzeilen einer Suche
+    entstehen so aus Array-Vergleichen statt aus einer Python-Schleife über alle Payloads -
+    nur Filter auf andere Felder prüfen die (bereits eingegrenzten) Payloads einzeln.
+    """
+    
+    SCAN_BLOCK = 512  # Zeilen pro int8-Block (float32 Zwischenblock bleibt im CPU-Cache)
+    FILTER_FIELDS = ("type", "ebene", "run_id", "kapitel")
+    
+    def __init__(self, directory: Path, dim: int, quantize: bool = False,
+                 scan_min_bytes: float = LOCAL_INDEX_QUANT_MIN_MB * 1e6):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.quantize = quantize
+        self.vectors_path = directory / "vectors.f32"
+        self.int8_path = directory / "vectors.i8"
+        self.scales_path = directory / "scales.f32"
+        self.stamp_path = directory / "vectors.i8.stamp"
+        self.points_path = directory / "points.jsonl"
+        self.scan_min_bytes = scan_min_bytes
+        self.lock = threading.Lock()
+        self.rows = {}      # point id -> Zeile
+        self.payloads = []  # Zeile -> Payload
+        self._matrix = None
+        self._int8 = None
+        self.alive = np.zeros(0, dtype=bool)                          # Zeile belegt?
+        self.columns = {f: np.zeros(0, dtype=np.int32) for f in self.FILTER_FIELDS}
+        self.codes = {f: {} for f in self.FILTER_FIELDS}              # Feld -> {Wert: Code}
+        
+        if self.points_path.exists():
+            for line in self.points_path.read_text(encoding="utf-8").splitlines():
+                entry = json.loads(line)
+                if entry["payload"] is None:
+                    # Gelöschter Punkt
+                    self.rows.pop(entry["id"], None)
+                    self.payloads[entry["row"]] = None
+                    continue
+                self.rows[entry["id"]] = entry["row"]
+                if entry["row"] >= len(self.payloads):
+                    self.payloads.extend([None] * (entry["row"] + 1 - len(self.payloads)))
+                self.payloads[entry["row"]] = entry["payload"]
+            for row, payload in enumerate(self.payloads):
+                self._set_columns(row, payload)
+            if self.points_path.stat().st_size and len(self.payloads) * 2 < sum(1 for _ in open(self.points_path, "rb")):
+                self.compact()
+        
+        # int8 neu aufbauen, wenn vectors.f32 ohne quantize geändert wurde (Stempel passt nicht)
+        if quantize and self.payloads and (not self.int8_path.exists() or
+                                           not self.stamp_path.exists() or
+                                           self.stamp_path.read_text() != self._f32_stamp()):
+            self._rebuild_int8()
+    
+    @staticmethod
+    def quantize_vector(vector: np.ndarray) -> tuple:
+        """float32 -> (int8 Komponenten, float32 Skalierung)"""
+        scale = float(np.abs(vector).max()) / 127.0 or 1.0
+        return np.round(vector / scale).astype(np.int8), np.float32(scale)
+    
+    def _set_columns(self, row: int, payload: Optional[dict]):
+        """Filter-Spalten einer Zeile setzen (Arrays wachsen verdoppelnd mit)"""
+        if row >= len(self.alive):
+            size = max(row + 1, 2 * len(self.alive), 1024)
+            self.alive = np.concatenate([self.alive, np.zeros(size - len(self.alive), dtype=bool)])
+            for f, column in self.columns.items():
+                self.columns[f] = np.concatenate([column, np.full(size - len(column), -1, dtype=np.int32)])
+        self.alive[row] = payload is not None
+        for f, column in self.columns.items():
+            value = payload.get(f) if payload else None
+            column[row] = -1 if value is None else self.codes[f].setdefault(value, len(self.codes[f]))
+    
+    def _filter_rows(self, filters: dict = None) -> np.ndarray:
+        """Zeilen, deren Payload zu filters passt (nur unter self.lock aufrufen)"""
+        n = len(self.payloads)
+        mask = self.alive[:n].copy()
+        rest = {}
+        for key, value in (filters or {}).items():
+            if key not in self.columns:
+                rest[key] = value
+                continue
+            werte = value if isinstance(value, (list, tuple, set)) else [value]
+            codes = [-1 if w is None else self.codes[key].get(w, -2) for w in werte]
+            column = self.columns[key][:n]
+            mask &= np.isin(column, codes) if len(codes) > 1 else column == codes[0]
+        rows = np.flatnonzero(mask)
+        if rest:
+            rows = rows[[payload_matches(self.payloads[r], rest) for r in rows]] if len(rows) else rows
+        return rows
+    
+    def _f32_stamp(self) -> str:
+        """Stand von vectors.f32 (Größe + Änderungszeit) für den int8-Stempel"""
+        stat = self.vectors_path.stat()
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+    
+    def _rebuild_int8(self):
+        """int8 Dateien aus vectors.f32 neu erzeugen (z.B. nach Umstellung auf quantize)"""
+        matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.payloads), self.dim))
+        with open(self.int8_path, "wb") as qf, open(self.scales_path, "wb") as sf:
+            for start in range(0, len(matrix), self.SCAN_BLOCK):
+                block = np.asarray(matrix[start:start + self.SCAN_BLOCK])
+                scales = (np.abs(block).max(axis=1) / 127.0).astype(np.float32)
+                scales[scales == 0] = 1.0
+                qf.write(np.round(block / scales[:, None]).astype(np.int8).tobytes())
+                sf.write(scales.tobytes())
+        self.stamp_path.write_text(self._f32_stamp())
+    
+    def compact(self):
+        """points.jsonl auf eine Zeile pro Punkt eindampfen (überschriebene Upserts entfernen)"""
+        with self.lock:
+            tmp = self.points_path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                for point_id, row in self.rows.items():
+                    f.write(json.dumps({"id": point_id, "row": row, "payload": self.payloads[row]},
+                                       ensure_ascii=False) + "\n")
+            tmp.replace(self.points_path)
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def upsert(self, points: List[dict]):
+        """Qdrant-Format: [{"id", "vector", "payload"}] - bestehende IDs werden überschrieben"""
+        with self.lock:
+            files = [(self.vectors_path, 4 * self.dim)]
+            if self.quantize:
+                files += [(self.int8_path, self.dim), (self.scales_path, 4)]
+            handles = [open(path, "r+b" if path.exists() else "wb") for path, _ in files]
+            try:
+                with open(self.points_path, "a", encoding="utf-8") as pf:
+                    for point in points:
+                        vector = np.asarray(point["vector"], dtype=np.float32)
+                        vector = vector / (np.linalg.norm(vector) or 1.0)
+                        
+                        row = self.rows.get(point["id"])
+                        if row is None:
+                            row = len(self.payloads)
+                            self.payloads.append(None)
+                        
+                        data = [vector.tobytes()]
+                        if self.quantize:
+                            q, scale = self.quantize_vector(vector)
+                            data += [q.tobytes(), scale.tobytes()]
+                        # Zeile an Position row schreiben (Anhängen oder in-place überschreiben)
+                        for f, (_, row_bytes), chunk in zip(handles, files, data):
+                            f.seek(row * row_bytes)
+                            f.write(chunk)
+                        
+                        self.rows[point["id"]] = row
+                        self.payloads[row] = point["payload"]
+                        self._set_columns(row, point["payload"])
+                        pf.write(json.dumps({"id": point["id"], "row": row, "payload": point["payload"]},
+                                            ensure_ascii=False) + "\n")
+            finally:
+                for f in handles:
+                    f.close()
+            if self.quantize:
+                self.stamp_path.write_text(self._f32_stamp())
+            self._matrix = None
+            self._int8 = None
+    
+    def matrix(self) -> np.ndarray:
+        """Memmap der Vektor-Matrix (neu geöffnet nach Upserts)"""
+        if self._matrix is None:
+            if not self.payloads:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                     shape=(len(self.payloads), self.dim))
+        return self._matrix
+    
+    def matrix_int8(self) -> tuple:
+        """(int8 Memmap, Skalierungen) - neu geöffnet nach Upserts"""
+        if self._int8 is None:
+            n = len(self.payloads)
+            self._int8 = (np.memmap(self.int8_path, dtype=np.int8, mode="r", shape=(n, self.dim)),
+                          np.fromfile(self.scales_path, dtype=np.float32, count=n))
+        return self._int8
+    
+    def search(self, vector: List[float], limit: int = 5, filters: dict = None,
+               rerank_depth: int = None) -> List[dict]:
+        """Top-k Payloads nach Cosinus-Ähnlichkeit (filters wie qdrant_search)"""
+        with self.lock:
+            matrix = self.matrix()
+            int8 = self.matrix_int8() if self.quantize and len(matrix) and \
+                matrix.nbytes >= self.scan_min_bytes else None
+            payloads = self.payloads
+            rows = self._filter_rows(filters) if len(matrix) else np.zeros(0, dtype=np.int64)
+        if not len(rows):
+            return []
+        
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        
+        if int8 is None:
+            if len(rows) == len(matrix):
+                scores = matrix @ query
+            else:
+                # Gefiltert blockweise: keine Kopie aller passenden Zeilen auf einmal
+                scores = np.empty(len(rows), dtype=np.float32)
+                for start in range(0, len(rows), 8 * self.SCAN_BLOCK):
+                    block = rows[start:start + 8 * self.SCAN_BLOCK]
+                    scores[start:start + len(block)] = matrix[block] @ query
+        else:
+            # Grobe int8-Suche, dann float32-Rerank der besten Kandidaten
+            approx = np.empty(len(rows), dtype=np.float32)
+            full = len(rows) == len(matrix)
+            for start in range(0, len(rows), self.SCAN_BLOCK):
+                # Ohne Filter zusammenhängende Slices lesen (kein Fancy-Index-Kopieren)
+                block = slice(start, start + self.SCAN_BLOCK) if full else rows[start:start + self.SCAN_BLOCK]
+                chunk = int8[0][block]
+                approx[start:start + len(chunk)] = (chunk.astype(np.float32) @ query) * int8[1][block]
+            depth = min(rerank_depth or max(limit * 4, 32), len(rows))
+            candidates = np.argpartition(-approx, depth - 1)[:depth]
+            rows = rows[candidates]
+            scores = matrix[rows] @ query
+        
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [payloads[rows[i]] for i in top]
+    
+    def delete(self, filters: dict):
+        """Punkte per Filter entfernen (Zeile bleibt ungenutzt in der Matrix)"""
+        with self.lock:
+            doomed = set(self._filter_rows(filters).tolist())
+            doomed = [(pid, row) for pid, row in self.rows.items() if row in doomed]
+            if not doomed:
+                return
+            with open(self.points_path, "a", encoding="utf-8") as pf:
+                for pid, row in doomed:
+                    del self.rows[pid]
+                    self.payloads[row] = None
+                    self._set_columns(row, None)
+                    pf.write(json.dumps({"id": pid, "row": row, "payload": None}) + "\n")
+    
+    def get(self, ids: List[int]) -> List[dict]:
+        """Payloads per Punkt-ID (fehlende IDs werden ausgelassen)"""
+        with self.lock:
+            return [self.payloads[self.rows[i]] for i in ids if i in self.rows]
+
+
+# ============================================================
+# LEXIKALISCHER INDEX (BM25) + RECIPROCAL RANK FUSION
+# ============================================================
+
+HYBRID_SEARCH = os.environ.get("HYBRID_SEARCH", "1") == "1"
+RRF_K = 60
+
+STOPWORDS = set("""der die das den dem des ein eine einer eines einem einen und oder aber
+nicht sie er es ich du wir ihr ihn ihm ihre ihrer sein seine seiner zu zum zur im in an am
+auf aus bei mit von vor nach über unter für ist war sind waren hat hatte haben wie als so
+dass da was wer wo noch nur schon auch sich mich dich uns euch man kein keine""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Kleinbuchstaben-Wörter ohne Stoppwörter (Namen und Orte bleiben erhalten)"""
+    return [t for t in re.findall(r'\w+', text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """BM25 Inverted Index über die Passagen des Runs
+    
+    Wird vom Indexer inkrementell mitgeführt und als JSONL (eine Zeile pro
+    Upsert/Löschung) im Output-Verzeichnis persistiert - kein Netzwerk. Überwiegen
+    überschriebene und gelöschte Zeilen, wird die Datei auf eine Zeile pro Passage
+    kompaktiert (beim Laden und im laufenden Betrieb).
+    """
+    
+    K1 = 1.5
+    B = 0.75
+    COMPACT_SLACK = 1000  # Zeilen Spielraum, damit kleine Indizes nicht ständig neu geschrieben werden
+    
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.docs = {}       # point id -> (payload, länge)
+        self.postings = {}   # term -> {point id: tf}
+        self.total_length = 0
+        self.lines = 0       # Zeilen in der JSONL-Datei
+        
+        if path and path.exists():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                entry = json.loads(line)
+                self._remove(entry["id"])
+                if entry["payload"] is not None:
+                    self._add(entry["id"], entry["payload"])
+                self.lines += 1
+            self._maybe_compact()
+    
+    def _add(self, point_id, payload: dict):
+        tokens = tokenize(payload.get("content", ""))
+        self.docs[point_id] = (payload, len(tokens))
+        self.total_length += len(tokens)
+        for term in tokens:
+            postings = self.postings.setdefault(term, {})
+            postings[point_id] = postings.get(point_id, 0) + 1
+    
+    def _remove(self, point_id):
+        doc = self.docs.pop(point_id, None)
+        if not doc:
+            return
+        self.total_length -= doc[1]
+        for term in set(tokenize(doc[0].get("content", ""))):
+            self.postings.get(term, {}).pop(point_id, None)
+    
+    def _persist(self, entries: List[dict]):
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.lines += len(entries)
+            self._maybe_compact()
+    
+    def _maybe_compact(self):
+        """JSONL neu schreiben, wenn mehr als die Hälfte der Zeilen überholt ist"""
+        if not self.path or self.lines <= 2 * len(self.docs) + self.COMPACT_SLACK:
+            return
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for pid, (payload, _) in self.docs.items():
+                f.write(json.dumps({"id": pid, "payload": payload}, ensure_ascii=False) + "\n")
+        tmp.replace(self.path)
+        self.lines = len(self.docs)
+    
+    def add(self, points: List[dict]):
+        """Qdrant-Punkte (id + payload) aufnehmen, bestehende IDs werden ersetzt"""
+        with self.lock:
+            for point in points:
+                self._remove(point["id"])
+                self._add(point["id"], point["payload"])
+            self._persist([{"id": p["id"], "payload": p["payload"]} for p in points])
+    
+    def delete(self, filters: dict):
+        with self.lock:
+            doomed = [pid for pid, (payload, _) in self.docs.items() if payload_matches(payload, filters)]
+            for pid in doomed:
+                self._remove(pid)
+            self._persist([{"id": pid, "payload": None} for pid in doomed])
+    
+    def search(self, query: str, limit: int = 5, filters: dict = None) -> List[dict]:
+        """Top-k Payloads nach BM25"""
+        with self.lock:
+            if not self.docs:
+                return []
+            n = len(self.docs)
+            avg_length = self.total_length / n or 1.0
+            scores = {}
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for pid, tf in postings.items():
+                    length = self.docs[pid][1]
+                    scores[pid] = scores.get(pid, 0.0) + idf * tf * (self.K1 + 1) / (
+                        tf + self.K1 * (1 - self.B + self.B * length / avg_length))
+            
+            ranked = sorted(scores.items(), key=lambda x: -x[1])
+            results = []
+            for pid, _ in ranked:
+                payload = self.docs[pid][0]
+                if not filters or payload_matches(payload, filters):
+                    results.append(payload)
+                    if len(results) >= limit:
+                        break
+            return results
+
+
+def reciprocal_rank_fusion(rankings: List[List[dict]], limit: int) -> List[dict]:
+    """Mehrere Trefferlisten per RRF (1 / (k + rang)) zu einer Liste zusammenführen"""
+    scores = {}
+    payloads = {}
+    for ranking in rankings:
+        for rank, payload in enumerate(ranking):
+            key = qdrant_point_id(payload, payload.get("run_id"))
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            payloads.setdefault(key, payload)
+    return [payloads[key] for key, _ in sorted(scores.items(), key=lambda x: -x[1])[:limit]]
+
+
+_LEXICAL_INDEX = None  # gesetzt in qdrant_init_collection
+
+
+_LOCAL_STORE = None  # gesetzt wenn lokal gearbeitet wird (primär oder Fallback)
+
+# Payload-Felder mit Index in Qdrant (für serverseitige Filter)
+QDRANT_PAYLOAD_INDEXES = {
+    "type": "keyword",
+    "kapitel": "integer",
+    "akt": "integer",
+    "akt_num": "integer",
+    "run_id": "keyword",
+    "ebene": "keyword",
+    "szene": "integer",
+}
+
+# Felder die ein Artefakt eindeutig identifizieren (-> deterministische Punkt-ID)
+ARTIFACT_KEYS = ("type", "kapitel", "akt_num", "passage")
+
+QDRANT_UPSERT_BATCH = 256  # Punkte pro PUT
+
+
+def qdrant_point_id(metadata: dict, run_id: str = None) -> int:
+    """Deterministische 64-bit Punkt-ID aus Run + identifizierenden Metadaten"""
+    identity = {k: metadata[k] for k in ARTIFACT_KEYS if k in metadata}
+    identity["run_id"] = run_id or RUN_ID or ""
+    return int(hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()[:16], 16)
+
+
+def qdrant_collection() -> str:
+    """Collection-Name je nach QDRANT_COLLECTION_MODE"""
+    if QDRANT_COLLECTION_MODE == "run" and RUN_ID:
+        suffix = RUN_ID
+    elif QDRANT_COLLECTION_MODE == "series" and QDRANT_SERIES:
+        suffix = QDRANT_SERIES
+    else:
+        return QDRANT_COLLECTION
+    return f"{QDRANT_COLLECTION}_{re.sub(r'[^a-zA-Z0-9_-]', '_', suffix)}"
+
+
+def run_filters(filters: dict = None) -> dict:
+    """Such-Filter um den aktuellen Run ergänzen ({"run_id": None} = alle Runs)
+    
+    Im Serien-Modus wird über alle Bände der Serie gesucht. Nur für Lesezugriffe -
+    Schreib- und Löschpfade nehmen write_filters.
+    """
+    filters = dict(filters or {})
+    if "run_id" not in filters and RUN_ID and QDRANT_COLLECTION_MODE != "series":
+        filters["run_id"] = RUN_ID
+    if filters.get("run_id") is None:
+        filters.pop("run_id", None)
+    return filters
+
+
+def write_filters(filters: dict) -> dict:
+    """Filter für Löschen/Überschreiben: immer auf den eigenen Run beschränkt
+    
+    Anders als run_filters auch im Serien-Modus - sonst träfe ein Re-Store von Kapitel 5
+    die Passagen von Kapitel 5 aller Bände der Serie.
+    """
+    return {**filters, "run_id": RUN_ID or ""}
+
+
+def qdrant_filter(filters: dict) -> dict:
+    """{feld: wert | [werte]} -> Qdrant Filter (alle Bedingungen müssen passen)"""
+    must = []
+    for key, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            must.append({"key": key, "match": {"any": list(value)}})
+        else:
+            must.append({"key": key, "match": {"value": value}})
+    return {"must": must}
+
+
+def payload_matches(payload: dict, filters: dict) -> bool:
+    """Lokales Gegenstück zu qdrant_filter"""
+    for key, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            if payload.get(key) not in value:
+                return False
+        elif payload.get(key) != value:
+            return False
+    return True
+
+
+def qdrant_init_collection(collection_name: str = None, local_dir: Path = None):
+    """Prüft ob Qdrant Collection erreichbar ist - sonst lokaler Vektor-Index in local_dir
+    
+    VECTOR_STORE=local nutzt direkt den lokalen Index (Single-Node, kein Netzwerk-Hop).
+    """
+    global _LOCAL_STORE, _LEXICAL_INDEX
+    collection_name = collection_name or qdrant_collection()
+    _LOCAL_STORE = None
+    _LEXICAL_INDEX = LexicalIndex(local_dir / "lexical_index.jsonl" if local_dir else None)
+    
+    if VECTOR_STORE == "local" and local_dir:
+        _LOCAL_STORE = LocalVectorStore(local_dir / "vector_index", EMBEDDING_DIM,
+                                        quantize=LOCAL_INDEX_QUANT == "int8")
+        log(f"   ✓ Lokaler Vektor-Index ({len(_LOCAL_STORE)} Punkte)")
+        return True
+    
     try:
         r = requests.get(f"{QDRANT_URL}/collections/{collection_name}", timeout=5)
+        if r.status_code == 404:
+            r = requests.put(f"{QDRANT_URL}/collections/{collection_name}", json={
+                "vectors": {"size": EMBEDDING_DIM, "distance": "Cosine"}
+            }, timeout=15)
+            log(f"   ✓ Qdrant Collection '{collection_name}' angelegt")
+        elif r.status_code == 200:
+            # Bestehende Collection mit anderer Dimension: jeder Upsert würde scheitern
+            size = r.json().get("result", {}).get("config", {}).get("params", {}).get("vectors", {}).get("size")
+            if size and size != EMBEDDING_DIM:
+                log(f"   ⚠️ Qdrant Collection '{collection_name}' hat Dimension {size}, "
+                    f"{EMBEDDING_MODEL} liefert {EMBEDDING_DIM} - andere QDRANT_COLLECTION wählen")
+                raise ValueError("Dimension passt nicht")
         if r.status_code == 200:
+            # Payload-Indizes für gefilterte Suche (idempotent)
+            for field, schema in QDRANT_PAYLOAD_INDEXES.items():
+                requests.put(f"{QDRANT_URL}/collections/{collection_name}/index", json={
+                    "field_name": field,
+                    "field_schema": schema
+                }, timeout=15)
             log(f"   ✓ Qdrant Collection '{collection_name}' verbunden")
             return True
-        log(f"   ⚠️ Qdrant Collection '{collection_name}' nicht gefunden")
-        return False
+        log(f"   ⚠️ Qdrant Collection '{collection_name}' nicht verfügbar ({r.status_code})")
     except Exception as e:
         log(f"   ⚠️ Qdrant nicht erreichbar: {e}")
-        return False
+    
+    if local_dir:
+        _LOCAL_STORE = LocalVectorStore(local_dir / "vector_index", EMBEDDING_DIM,
+                                        quantize=LOCAL_INDEX_QUANT == "int8")
+        log(f"   ↪️ Fallback: lokaler Vektor-Index ({len(_LOCAL_STORE)} Punkte)")
+        return True
+    return False
 
 
 def qdrant_store(content: str, metadata: dict, collection: str = None):
-    """Text mit OpenAI Embedding in Qdrant speichern"""
-    collection = collection or QDRANT_COLLECTION
+    """Text mit OpenAI Embedding in Qdrant speichern (Dokument + Passagen)
+    
+    Blockiert nicht: die Arbeit geht an den Hintergrund-Indexer. Wer direkt danach
+    lesen muss, ruft vorher qdrant_flush() auf.
+    """
+    global _INDEX_PENDING
+    with _INDEX_CONDITION:
+        _INDEX_PENDING += 1
+    _start_indexer()
+    _INDEX_QUEUE.put((content, metadata, collection))
+    return True
+
+
+def qdrant_store_kapitel(nr: int, text: str):
+    """Kapiteltext (neu) indexieren - ersetzt Dokument-Punkt und Passagen der alten Fassung"""
+    return qdrant_store(text, {"type": "kapitel_text", "kapitel": nr, "wortzahl": len(text.split())})
+
+
+# ============================================================
+# HINTERGRUND-INDEXER
+# ============================================================
+
+INDEXER_BATCH = 16  # Artefakte pro Embedding-Batch + Upsert
+
+_INDEX_QUEUE = queue.Queue()
+_INDEX_CONDITION = threading.Condition()
+_INDEX_PENDING = 0
+_INDEXER_THREAD = None
+
+
+def _start_indexer():
+    """Indexer-Thread starten (idempotent)"""
+    global _INDEXER_THREAD
+    if _INDEXER_THREAD and _INDEXER_THREAD.is_alive():
+        return
+    _INDEXER_THREAD = threading.Thread(target=_indexer_loop, name="qdrant-indexer", daemon=True)
+    _INDEXER_THREAD.start()
+
+
+def _indexer_loop():
+    """Sammelt wartende Stores zu Batches: ein Embedding-Request + ein Upsert pro Collection"""
+    global _INDEX_PENDING
+    while True:
+        batch = [_INDEX_QUEUE.get()]
+        while len(batch) < INDEXER_BATCH:
+            try:
+                batch.append(_INDEX_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+        
+        try:
+            by_collection = {}
+            for content, metadata, collection in batch:
+                by_collection.setdefault(collection, []).append((content, metadata))
+            for collection, items in by_collection.items():
+                qdrant_store_many(items, collection)
+        except Exception as e:
+            # Der Thread muss weiterlaufen - sonst bleibt jeder spätere Flush hängen
+            log(f"   ⚠️ Indexer Fehler ({len(batch)} Stores verworfen): {e}")
+        finally:
+            with _INDEX_CONDITION:
+                _INDEX_PENDING -= len(batch)
+                _INDEX_CONDITION.notify_all()
+
+
+QDRANT_FLUSH_TIMEOUT = 120  # Sekunden für consistent=True Lesezugriffe
+
+
+def qdrant_flush(timeout: float = None) -> bool:
+    """Barriere: wartet bis alle eingereihten Stores geschrieben sind (Read-after-Write)"""
+    with _INDEX_CONDITION:
+        done = _INDEX_CONDITION.wait_for(lambda: _INDEX_PENDING == 0, timeout)
+    if _HASHING_EMBEDDER is not None:
+        _HASHING_EMBEDDER.save()
+    if not done:
+        log(f"   ⚠️ Qdrant Flush Timeout ({_INDEX_PENDING} ausstehend)")
+    return done
+
+
+def qdrant_store_many(items: List[tuple], collection: str = None):
+    """Mehrere (content, metadata) Paare: ein Embedding-Batch, ein Bulk-Upsert
+    
+    Pro Artefakt entsteht ein Dokument-Punkt (voller Text, für qdrant_get) und je
+    eine Passage pro Absatz-Chunk (für die Suche) mit kapitel/szene/offset Metadaten.
+    """
+    collection = collection or qdrant_collection()
     try:
-        # OpenAI Embedding
-        embedding = get_embedding(content[:4000])
-        if not embedding:
+        timestamp = datetime.now().isoformat()
+        texts = []
+        points = []
+        for content, metadata in items:
+            base = {"timestamp": timestamp, "run_id": RUN_ID or "", **metadata}
+            texts.append(content[:4000])
+            points.append({
+                "id": qdrant_point_id(metadata),
+                "payload": {"content": content, "ebene": "dokument", **base}
+            })
+            for passage in chunk_passages(content):
+                texts.append(passage["text"])
+                points.append({
+                    "id": qdrant_point_id({**metadata, "passage": passage["passage"]}),
+                    "payload": {
+                        "content": passage["text"],
+                        "ebene": "passage",
+                        "passage": passage["passage"],
+                        "szene": passage["szene"],
+                        "offset": passage["offset"],
+                        **base
+                    }
+                })
+        
+        alte_passagen = [write_filters({**{k: metadata[k] for k in ARTIFACT_KEYS if k in metadata}, "ebene": "passage"})
+                         for _, metadata in items]
+        
+        # BM25 zuerst und unabhängig von den Embeddings - lexikalische Treffer überleben einen Ausfall
+        if _LEXICAL_INDEX is not None:
+            for filters in alte_passagen:
+                _LEXICAL_INDEX.delete(filters)
+            _LEXICAL_INDEX.add([p for p in points if p["payload"]["ebene"] == "passage"])
+        
+        # OpenAI Embeddings (gebatcht + gecacht)
+        embeddings = get_embeddings(texts)
+        points = [{**p, "vector": e} for p, e in zip(points, embeddings) if e]
+        if not points:
             return False
         
-        # Unique ID aus Metadata
-        point_id = int(hashlib.md5(json.dumps(metadata, sort_keys=True).encode()).hexdigest()[:8], 16)
-        
-        requests.put(f"{QDRANT_URL}/collections/{collection}/points", json={
-            "points": [{
-                "id": point_id,
-                "vector": embedding,
-                "payload": {
-                    "content": content[:15000],
-                    "timestamp": datetime.now().isoformat(),
-                    **metadata
-                }
-            }]
-        }, timeout=15)
+        # Alte Passagen der Artefakte entfernen (neue Fassung kann weniger haben)
+        for filters in alte_passagen:
+            qdrant_delete(filters, collection, lexical=False)
+        
+        if _LOCAL_STORE is not None:
+            _LOCAL_STORE.upsert(points)
+            return True
+        
+        for i in range(0, len(points), QDRANT_UPSERT_BATCH):
+            r = requests.put(f"{QDRANT_URL}/collections/{collection}/points", json={
+                "points": points[i:i + QDRANT_UPSERT_BATCH]
+            }, timeout=60)
+            fehler = qdrant_fehler(r)
+            if fehler:
+                # z.B. falsche Vektor-Dimension nach Wechsel von EMBEDDING_BACKEND
+                log(f"   ⚠️ Qdrant Upsert abgelehnt ({len(points) - i} Punkte nicht gespeichert): {fehler}")
+                return False
         return True
     except Exception as e:
         log(f"   ⚠️ Qdrant Store Fehler: {e}")
         return False
 
 
-def qdrant_search(query: str, collection: str = None, limit: int = 5) -> List[dict]:
-    """Semantische Suche in Qdrant mit OpenAI Embedding"""
-    collection = collection or QDRANT_COLLECTION
+def qdrant_fehler(r) -> Optional[str]:
+    """Fehlertext einer Qdrant-Antwort (None = HTTP 200 mit status ok)"""
     try:
-        embedding = get_embedding(query)
+        status = r.json().get("status")
+    except ValueError:
+        status = None
+    if r.status_code == 200 and status == "ok":
+        return None
+    if isinstance(status, dict):
+        status = status.get("error", status)
+    return f"HTTP {r.status_code}: {status or r.text[:200]}"
+
+
+def qdrant_delete(filters: dict, collection: str = None, lexical: bool = True) -> bool:
+    """Punkte per Filter löschen (lexical=False: BM25-Index unberührt lassen)"""
+    collection = collection or qdrant_collection()
+    if lexical and _LEXICAL_INDEX is not None:
+        _LEXICAL_INDEX.delete(filters)
+    if _LOCAL_STORE is not None:
+        _LOCAL_STORE.delete(filters)
+        return True
+    r = requests.post(f"{QDRANT_URL}/collections/{collection}/points/delete", params={"wait": "true"},
+                      json={"filter": qdrant_filter(filters)}, timeout=30)
+    return r.status_code == 200
+
+
+def qdrant_search(query: str, collection: str = None, limit: int = 5, filters: dict = None,
+                  consistent: bool = False) -> List[dict]:
+    """Semantische Suche in Qdrant mit OpenAI Embedding (+ BM25, per RRF fusioniert)
+    
+    filters: {feld: wert | [werte]} z.B. {"type": ["gliederung", "akt"], "kapitel": 5} -
+    wird serverseitig als Qdrant Filter angewendet, limit zählt nur passende Treffer.
+    consistent=True wartet vorher auf den Hintergrund-Indexer.
+    """
+    collection = collection or qdrant_collection()
+    if consistent:
+        qdrant_flush(timeout=QDRANT_FLUSH_TIMEOUT)
+    
+    # Suche läuft über Passagen, Dokument-Punkte sind für qdrant_get
+    filters = run_filters({"ebene": "passage", **(filters or {})})
+    
+    if not HYBRID_SEARCH or _LEXICAL_INDEX is None:
+        return _vector_search(query, collection, limit, filters)
+    
+    # Beide Listen etwas tiefer holen, damit die Fusion Auswahl hat
+    depth = max(limit * 3, 10)
+    return reciprocal_rank_fusion([
+        _vector_search(query, collection, depth, filters),
+        _LEXICAL_INDEX.search(query, depth, filters)
+    ], limit)
+
+
+def _vector_search(query: str, collection: str, limit: int, filters: dict) -> List[dict]:
+    """Reine Vektor-Suche (lokal oder Qdrant)"""
+    try:
+        embedding = get_embeddings([query], dokumente=False)[0]
         if not embedding:
             return []
         
-        r = requests.post(f"{QDRANT_URL}/collections/{collection}/points/search", json={
+        if _LOCAL_STORE is not None:
+            return _LOCAL_STORE.search(embedding, limit, filters)
+        
+        body = {
             "vector": embedding,
             "limit": limit,
             "with_payload": True
-        }, timeout=15)
+        }
+        if filters:
+            body["filter"] = qdrant_filter(filters)
+        
+        r = requests.post(f"{QDRANT_URL}/collections/{collection}/points/search", json=body, timeout=15)
         
         if r.status_code == 200:
             return [hit["payload"] for hit in r.json().get("result", [])]
@@ -490,28 +2036,339 @@ def qdrant_search(query: str, collection: str = None, limit: int = 5) -> List[di
         return []
 
 
-# ============================================================
-# VERSIONIERTES SPEICHERN
-# ============================================================
+def qdrant_get(artifacts: List[dict], collection: str = None, consistent: bool = False) -> List[dict]:
+    """Direkter Abruf bekannter Artefakte per Punkt-ID - kein Embedding, keine Suche
+    
+    artifacts: identifizierende Metadaten, z.B. [{"type": "kapitel_gliederung", "kapitel": 5}]
+    """
+    collection = collection or qdrant_collection()
+    if consistent:
+        qdrant_flush(timeout=QDRANT_FLUSH_TIMEOUT)
+    ids = [qdrant_point_id(a, a.get("run_id")) for a in artifacts]
+    try:
+        if _LOCAL_STORE is not None:
+            return _LOCAL_STORE.get(ids)
+        
+        r = requests.post(f"{QDRANT_URL}/collections/{collection}/points", json={
+            "ids": ids,
+            "with_payload": True,
+            "with_vector": False
+        }, timeout=15)
+        
+        if r.status_code == 200:
+            return [point["payload"] for point in r.json().get("result", [])]
+        return []
+    except Exception as e:
+        log(f"   ⚠️ Qdrant Get Fehler: {e}")
+        return []
+
+
+def _collection_suffix(name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_-]', '_', name)
+
+
+def qdrant_cleanup(run_id: str, collection: str = None) -> bool:
+    """Alle Punkte eines Runs löschen (bzw. die Run-Collection im Modus "run")
+    
+    Ohne collection: die Collection des konfigurierten Modus (Serien-Modus: QDRANT_SERIES).
+    """
+    try:
+        if QDRANT_COLLECTION_MODE == "run":
+            run_collection = f"{collection or QDRANT_COLLECTION}_{_collection_suffix(run_id)}"
+            r = requests.delete(f"{QDRANT_URL}/collections/{run_collection}", timeout=30)
+        else:
+            collection = collection or qdrant_collection()
+            r = requests.post(f"{QDRANT_URL}/collections/{collection}/points/delete",
+                              params={"wait": "true"},
+                              json={"filter": qdrant_filter({"run_id": run_id})}, timeout=60)
+        log(f"   🧹 Qdrant Cleanup '{run_id}': {r.status_code}")
+        return r.status_code == 200
+    except Exception as e:
+        log(f"   ⚠️ Qdrant Cleanup Fehler: {e}")
+        return False
+
+
+def _qdrant_run_ids(collection: str) -> set:
+    """Alle run_ids einer Collection per Scroll einsammeln (nur das eine Payload-Feld übertragen)"""
+    run_ids = set()
+    offset = None
+    while True:
+        body = {"limit": 1000, "with_payload": {"include": ["run_id"]}, "with_vector": False}
+        if offset is not None:
+            body["offset"] = offset
+        r = requests.post(f"{QDRANT_URL}/collections/{collection}/points/scroll", json=body, timeout=60)
+        r.raise_for_status()
+        result = r.json().get("result", {})
+        run_ids.update(p.get("payload", {}).get("run_id", "") for p in result.get("points", []))
+        offset = result.get("next_page_offset")
+        if offset is None:
+            return run_ids
+
+
+def qdrant_compact(output_root: Path, apply: bool = False, altbestand: bool = False) -> List[str]:
+    """Runs ohne Output-Verzeichnis unter output_root finden und (mit apply) entfernen
+    
+    Berücksichtigt den konfigurierten Modus: shared = QDRANT_COLLECTION, series = die
+    Serien-Collection, run = alle Run-Collections "<QDRANT_COLLECTION>_<run>". Ohne apply
+    wird nur aufgelistet (Dry-Run). altbestand: zusätzlich Punkte ohne run_id löschen.
+    Gibt die (zu) löschenden run_ids zurück.
+    """
+    output_root = Path(output_root)
+    if not output_root.is_dir():
+        raise ValueError(f"Output-Root {output_root} existiert nicht")
+    vorhanden = {_collection_suffix(d.name) for d in output_root.iterdir() if d.is_dir()}
+    
+    stale = []
+    if QDRANT_COLLECTION_MODE == "run":
+        r = requests.get(f"{QDRANT_URL}/collections", timeout=30)
+        r.raise_for_status()
+        prefix = f"{QDRANT_COLLECTION}_"
+        for c in r.json().get("result", {}).get("collections", []):
+            suffix = c["name"][len(prefix):] if c["name"].startswith(prefix) else ""
+            # Nur echte Run-Collections: alle Punkte gehören genau diesem Run (keine Serien-Collection)
+            if suffix and suffix not in vorhanden and \
+                    {_collection_suffix(r) for r in _qdrant_run_ids(c["name"])} <= {suffix}:
+                stale.append(suffix)
+        collection = None
+    else:
+        collection = qdrant_collection()
+        run_ids = _qdrant_run_ids(collection)
+        stale = [r for r in run_ids if r and _collection_suffix(r) not in vorhanden]
+    stale.sort()
+    
+    log(f"   🧹 Qdrant-Kompaktierung ({QDRANT_COLLECTION_MODE}, Output-Root {output_root.resolve()}): "
+        f"{len(stale)} verwaiste Runs{' (Dry-Run)' if not apply else ''}")
+    for run_id in stale:
+        log(f"      - {run_id}")
+    if not apply:
+        return stale
+    
+    for run_id in stale:
+        qdrant_cleanup(run_id, QDRANT_COLLECTION if QDRANT_COLLECTION_MODE == "run" else collection)
+    
+    if altbestand and collection:
+        # Altbestand ohne Run-Zuordnung (nur auf ausdrücklichen Wunsch)
+        requests.post(f"{QDRANT_URL}/collections/{collection}/points/delete", params={"wait": "true"}, json={
+            "filter": {"should": [{"is_empty": {"key": "run_id"}}, {"key": "run_id", "match": {"value": ""}}]}
+        }, timeout=60)
+        log(f"   🧹 Altbestand ohne run_id aus {collection} entfernt")
+    return stale
+
+
+# ============================================================
+# VERSIONIERTES SPEICHERN
+# ============================================================
+
+def save_versioned(output_dir: Path, filename: str, content: str, iteration: int = None):
+    """Speichert mit Versionierung - überschreibt nichts"""
+    base = filename.rsplit(".", 1)[0]
+    ext = filename.rsplit(".", 1)[1] if "." in filename else "md"
+    
+    if iteration is not None:
+        versioned_name = f"{base}_v{iteration:02d}.{ext}"
+    else:
+        versioned_name = filename
+    
+    filepath = output_dir / versioned_name
+    filepath.write_text(content, encoding="utf-8")
+    
+    # Auch immer die "aktuelle" Version speichern
+    current = output_dir / filename
+    current.write_text(content, encoding="utf-8")
+    
+    return filepath
+
+
+def load_json(path: Path) -> Optional[dict]:
+    """JSON-Artefakt laden (None wenn nicht vorhanden oder kaputt)"""
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(output_dir: Path, **data):
+    """Checkpoint für --resume aktualisieren (atomar via Temp-Datei)"""
+    path = output_dir / "checkpoint.json"
+    checkpoint = load_checkpoint(output_dir)
+    checkpoint.update(data)
+    checkpoint["updated"] = datetime.now().isoformat()
+    
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(checkpoint, ensure_ascii=False, indent=1), encoding="utf-8")
+    tmp.replace(path)
+
+
+def load_checkpoint(output_dir: Path) -> dict:
+    """Checkpoint laden (leer wenn keiner existiert)"""
+    path = output_dir / "checkpoint.json"
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+# ============================================================
+# STORY-MODELL (freigegebene Gliederung, einmal geparst)
+# ============================================================
+
+@dataclass(slots=True)
+class Figur:
+    name: str
+    beschreibung: str
+
+
+@dataclass(slots=True)
+class StoryPhase:
+    nummer: int
+    titel: str
+    kapitel: List[int]
+    beschreibung: str
+
+
+@dataclass(slots=True)
+class StoryModel:
+    """Strukturierte Sicht auf 01_gliederung.md
+    
+    sections: nummerierte Top-Level-Abschnitte ("HAUPTCHARAKTERE", "DIE 7 PHASEN", ...)
+    inkl. Überschrift und Unterabschnitten - Zugriff per Dict statt Regex pro Kapitel.
+    quelle: SHA-256 der Gliederung, mit der das Modell erzeugt wurde (Cache-Prüfung).
+    """
+    titel: str
+    heldin: str
+    hero: str
+    antagonist: str
+    nebenfiguren: List[Figur]
+    phasen: List[StoryPhase]
+    sections: Dict[str, str]
+    quelle: str
+    
+    def section(self, name: str) -> str:
+        return self.sections.get(name.upper(), "")
+    
+    @property
+    def hauptcharaktere(self) -> str:
+        return self.section("HAUPTCHARAKTERE")
+    
+    @property
+    def nebencharaktere(self) -> str:
+        return self.section("NEBENCHARAKTERE")
+    
+    def phase_fuer_kapitel(self, kapitel_nr: int) -> Optional[StoryPhase]:
+        for phase in self.phasen:
+            if kapitel_nr in phase.kapitel:
+                return phase
+        return None
+    
+    def to_dict(self) -> dict:
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "StoryModel":
+        data = dict(data)
+        data["nebenfiguren"] = [Figur(**f) for f in data["nebenfiguren"]]
+        data["phasen"] = [StoryPhase(**p) for p in data["phasen"]]
+        return cls(**data)
+
+
+STORY_SECTION = re.compile(r'^(#{1,3})\s*(\d+)\.?\s*(.+?)\s*$', re.MULTILINE)
 
-def save_versioned(output_dir: Path, filename: str, content: str, iteration: int = None):
-    """Speichert mit Versionierung - überschreibt nichts"""
-    base = filename.rsplit(".", 1)[0]
-    ext = filename.rsplit(".", 1)[1] if "." in filename else "md"
+
+def _section_key(heading: str) -> str:
+    """Abschnitts-Schlüssel: Nummer, Klammerzusatz und Formatierung entfernen"""
+    heading = re.sub(r'^[\d.\s]*', '', heading.strip(" *"))
+    return re.sub(r'\s*\(.*$', '', heading).strip(" *:").upper()
+
+
+def _kapitel_nummern(text: str) -> List[int]:
+    """Kapitel-Nummern aus "Kapitel 1-3, 5" / "Kapitel: 4 bis 6" """
+    line = re.search(r'Kapitel[n]?\b[^\n\d]*([^\n]*)', text, re.IGNORECASE)
+    if not line:
+        return []
+    nummern = []
+    angabe = re.sub(r'\(.*?\)', '', line.group(1))  # "(15%)" o.ä. ignorieren
+    for start, ende in re.findall(r'(\d+)(?:\s*(?:-|–|bis)\s*(\d+))?', angabe):
+        nummern.extend(range(int(start), int(ende or start) + 1))
+    return sorted(set(nummern))
+
+
+def _titel_zeile(text: str) -> str:
+    for line in text.splitlines():
+        line = re.sub(r'^[-*•\s]*(Titel(-Vorschlag)?\s*:)?\s*', '', line, flags=re.IGNORECASE)
+        line = line.strip(' *"„“”\'')
+        if line:
+            return line
+    return ""
+
+
+def parse_gliederung(gliederung: str) -> StoryModel:
+    """Gliederung aus Phase 1 in ein StoryModel übersetzen (tolerant bei fehlenden Abschnitten)"""
+    # Top-Level = nummerierte Überschriften der höchsten Ebene ("## 2. HAUPTCHARAKTERE"),
+    # nummerierte Unterüberschriften ("### 1. Mara") bleiben Teil ihres Abschnitts
+    sections = {}
+    matches = list(STORY_SECTION.finditer(gliederung))
+    if matches:
+        ebene = min(len(m.group(1)) for m in matches)
+        matches = [m for m in matches if len(m.group(1)) == ebene]
+    for i, match in enumerate(matches):
+        ende = matches[i + 1].start() if i + 1 < len(matches) else len(gliederung)
+        sections.setdefault(_section_key(match.group(3)), gliederung[match.start():ende].strip())
     
-    if iteration is not None:
-        versioned_name = f"{base}_v{iteration:02d}.{ext}"
-    else:
-        versioned_name = filename
+    def inhalt(key: str) -> str:
+        """Abschnitt ohne seine eigene Überschrift"""
+        return sections.get(key, "").split("\n", 1)[-1] if "\n" in sections.get(key, "") else ""
     
-    filepath = output_dir / versioned_name
-    filepath.write_text(content, encoding="utf-8")
+    # Hauptfiguren: Unterabschnitte HELDIN / HERO / ANTAGONIST
+    leads = {"HELDIN": "", "HERO": "", "ANTAGONIST": ""}
+    for heading, body in split_sections(inhalt("HAUPTCHARAKTERE")).items():
+        for key in leads:
+            if heading.upper().startswith(key) and not leads[key]:
+                leads[key] = body
     
-    # Auch immer die "aktuelle" Version speichern
-    current = output_dir / filename
-    current.write_text(content, encoding="utf-8")
+    # Nebenfiguren: eine Unterüberschrift bzw. ein fett gesetzter Name pro Person
+    nebenfiguren = []
+    neben = inhalt("NEBENCHARAKTERE")
+    for heading, body in split_sections(neben).items():
+        if heading:
+            nebenfiguren.append(Figur(re.sub(r'^[\d.\s]*', '', heading).strip(" *"), body))
+    if not nebenfiguren:
+        for name, body in re.findall(r'^\s*(?:[-*\d.]+\s*)?\*\*([^*\n]+)\*\*[:\s]*(.*(?:\n(?!\s*(?:[-*\d.]+\s*)?\*\*).*)*)',
+                                     neben, re.MULTILINE):
+            nebenfiguren.append(Figur(name.strip(" :"), body.strip()))
     
-    return filepath
+    # 7 Phasen mit Kapitel-Bereichen
+    phasen = []
+    for heading, body in split_sections(inhalt("DIE 7 PHASEN")).items():
+        if heading and re.search(r'Phase', heading, re.IGNORECASE):
+            phasen.append(StoryPhase(len(phasen) + 1, heading.strip(" *"), _kapitel_nummern(body), body))
+    
+    return StoryModel(
+        titel=_titel_zeile(inhalt("TITEL")) or "Roman",
+        heldin=leads["HELDIN"],
+        hero=leads["HERO"],
+        antagonist=leads["ANTAGONIST"],
+        nebenfiguren=nebenfiguren,
+        phasen=phasen,
+        sections=sections,
+        quelle=hashlib.sha256(gliederung.encode("utf-8")).hexdigest(),
+    )
+
+
+def load_story_model(gliederung: str, output_dir: Path) -> StoryModel:
+    """StoryModel aus 01_gliederung.json (wenn zur Gliederung passend), sonst parsen + speichern"""
+    path = output_dir / "01_gliederung.json"
+    quelle = hashlib.sha256(gliederung.encode("utf-8")).hexdigest()
+    if path.exists():
+        try:
+            story = StoryModel.from_dict(json.loads(path.read_text(encoding="utf-8")))
+            if story.quelle == quelle:
+                return story
+        except (ValueError, TypeError, KeyError):
+            pass
+    
+    story = parse_gliederung(gliederung)
+    path.write_text(json.dumps(story.to_dict(), ensure_ascii=False, indent=1), encoding="utf-8")
+    log(f"   📐 Story-Modell: \"{story.titel}\", {len(story.nebenfiguren)} Nebenfiguren, {len(story.phasen)} Phasen")
+    return story
 
 
 # ============================================================
@@ -692,16 +2549,163 @@ Sei EHRLICH. Sei KRITISCH. Dann VERBESSERE.
 """
 
 
+# ============================================================
+# KONVERGENZ (Self-Critique-Schleifen früh beenden)
+# ============================================================
+
+# Maximale Self-Critique-Iterationen pro Phase
+CRITIQUE_ITERATIONS = {
+    "gliederung": int(os.environ.get("PHASE1_ITERATIONS", "3")),
+    "akt": int(os.environ.get("PHASE2_ITERATIONS", "1")),
+    "kapitel": int(os.environ.get("PHASE2_5_ITERATIONS", "1")),
+}
+CONVERGENCE_RATIO = float(os.environ.get("CONVERGENCE_RATIO", "0.9"))  # Ähnlichkeit ganzer Text
+CONVERGENCE_SECTION_RATIO = 0.75  # darunter gilt ein einzelner Abschnitt als umgeschrieben
+
+
+FASSUNG_MARKER = "=== ÜBERARBEITETE FASSUNG ==="
+
+
+def ohne_kritik(antwort: str) -> str:
+    """Aus "Kritik + überarbeitete Fassung" nur die Fassung behalten
+    
+    Bevorzugt ab FASSUNG_MARKER, sonst ab der ersten Überschrift, die nicht zur Kritik gehört.
+    Ohne beides bleibt die Antwort unverändert.
+    """
+    if FASSUNG_MARKER in antwort:
+        return antwort.split(FASSUNG_MARKER, 1)[1].strip()
+    for match in re.finditer(r'^#{1,3}\s.*$', antwort, re.MULTILINE):
+        if not re.search(r'kritik|schwäche|analyse|bewertung|probleme', match.group(0), re.IGNORECASE):
+            return antwort[match.start():].strip()
+    return antwort
+
+
+def konvergiert(alt: str, neu: str, label: str) -> bool:
+    """Hat sich eine Überarbeitung kaum noch verändert? (Wort-Ähnlichkeit + Abschnitts-Diff)
+    
+    Konvergiert, wenn der ganze Text zu >= CONVERGENCE_RATIO gleich ist UND kein einzelner
+    Abschnitt umgeschrieben wurde - sonst ginge eine neue Figur in einem langen Text unter.
+    """
+    ratio = difflib.SequenceMatcher(None, alt.split(), neu.split()).ratio()
+    alte_abschnitte = split_sections(alt)
+    neue_abschnitte = split_sections(neu)
+    umgeschrieben = [titel or "Einleitung" for titel, body in neue_abschnitte.items()
+                     if titel not in alte_abschnitte or difflib.SequenceMatcher(
+                         None, alte_abschnitte[titel].split(), body.split()).ratio() < CONVERGENCE_SECTION_RATIO]
+    umgeschrieben += [titel or "Einleitung" for titel in alte_abschnitte if titel not in neue_abschnitte]
+    
+    fertig = ratio >= CONVERGENCE_RATIO and not umgeschrieben
+    log(f"      📏 {label}: {ratio:.0%} unverändert, {len(umgeschrieben)}/{len(neue_abschnitte)} "
+        f"Abschnitte umgeschrieben{' - konvergiert' if fertig else ''}")
+    return fertig
+
+
+def iterationen_gespart(label: str, gelaufen: int, maximum: int):
+    """Eingesparte Self-Critique-Iterationen loggen + im Status zählen"""
+    gespart = maximum - gelaufen
+    if gespart > 0:
+        increment_status("iterationen_gespart", gespart)
+        log(f"   ⏩ {label}: nach {gelaufen}/{maximum} Iterationen stabil - {gespart} gespart")
+
+
+# ============================================================
+# GLIEDERUNGS-KRITIK (Kritik -> gezielte Abschnitts-Überarbeitung)
+# ============================================================
+
+KRITIK_MIN_SCHWERE = 2  # 1 = kosmetisch, 2 = spürbar, 3 = strukturell
+
+
+def gliederung_kritik_schema(abschnitte: List[str]) -> dict:
+    """Schema der Gliederungs-Kritik - "abschnitt" nur aus den tatsächlich vorhandenen Abschnitten"""
+    return {
+        "type": "OBJECT",
+        "properties": {
+            "probleme": {"type": "ARRAY", "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "abschnitt": {"type": "STRING", "enum": abschnitte},
+                    "schwere": {"type": "INTEGER", "minimum": 1, "maximum": 3},
+                    "problem": {"type": "STRING"},
+                    "vorschlag": {"type": "STRING"},
+                },
+                "required": ["abschnitt", "schwere", "problem"],
+            }},
+        },
+        "required": ["probleme"],
+    }
+
+
+def gliederung_kritik(gliederung: str, abschnitte: Dict[str, str]) -> Optional[List[dict]]:
+    """Kurze strukturierte Kritik: [{abschnitt, schwere, problem, vorschlag}] (None = kein JSON)"""
+    kritik = call_gemini_json(f"""{SELF_CRITIQUE_PROMPT}
+
+Hier ist die aktuelle Roman-Gliederung:
+
+{gliederung}
+
+AUFGABE: KRITISIERE diese Gliederung SCHONUNGSLOS - aber gib sie NICHT neu aus.
+Liste jedes KONKRETE Problem mit:
+- abschnitt: einer von {", ".join(abschnitte)}
+- schwere: 1 = kosmetisch, 2 = spürbar (Lektor würde es anmerken), 3 = strukturell (7-Phasen,
+  Proportionen, Suspense-Eskalation, Motive)
+- problem + vorschlag (konkret, 1-2 Sätze)
+Keine Probleme: leere Liste.""", gliederung_kritik_schema(list(abschnitte)), max_tokens=3000, use_flash=True)
+    return kritik["probleme"] if kritik else None
+
+
+def gliederung_ueberarbeiten(gliederung: str, abschnitte: Dict[str, str], probleme: List[dict]) -> str:
+    """Nur die kritisierten Abschnitte neu schreiben (parallel) und in die Gliederung einsetzen"""
+    nach_abschnitt = {}
+    for p in probleme:
+        nach_abschnitt.setdefault(p["abschnitt"], []).append(p)
+    
+    def abschnitt_neu(key: str) -> str:
+        alt = abschnitte[key]
+        liste = "\n".join(f"- [Schwere {p['schwere']}] {p['problem']}"
+                          + (f" → {p['vorschlag']}" if p.get("vorschlag") else "") for p in nach_abschnitt[key])
+        neu = call_gemini(f"""{REGELWERK}
+
+GESAMT-GLIEDERUNG (nur Kontext):
+{gliederung}
+
+ABSCHNITT "{key}":
+{alt}
+
+PROBLEME IN DIESEM ABSCHNITT:
+{liste}
+
+AUFGABE: Gib NUR diesen Abschnitt VOLLSTÄNDIG überarbeitet aus, beginnend mit seiner Überschrift.
+Behebe die Probleme, behalte alles Gute, bleib konsistent mit dem Rest der Gliederung.""",
+                          max_tokens=6000, use_flash=True).strip()
+        if len(neu) < len(alt) * 0.5:
+            log(f"      ⚠️ {key}: Überarbeitung zu kurz, behalte Abschnitt")
+            return alt
+        if not neu.startswith("#"):
+            neu = alt.split("\n", 1)[0] + "\n" + neu  # Überschrift für parse_gliederung erhalten
+        return neu
+    
+    with ThreadPoolExecutor(max_workers=len(nach_abschnitt), thread_name_prefix="gliederung") as executor:
+        neu = dict(zip(nach_abschnitt, executor.map(abschnitt_neu, nach_abschnitt)))
+    
+    for key, text in neu.items():
+        gliederung = gliederung.replace(abschnitte[key], text, 1)
+    return gliederung
+
+
 # ============================================================
 # PHASE 1: GROB-GLIEDERUNG
 # ============================================================
 
-def phase1_gliederung(setting: str, output_dir: Path, iterations: int = 3) -> str:
-    """Grob-Gliederung mit Gemini Self-Critique"""
+def phase1_gliederung(setting: str, output_dir: Path, iterations: int = None) -> str:
+    """Grob-Gliederung mit Gemini Self-Critique (stoppt, sobald die Fassungen konvergieren)"""
+    
+    if iterations is None:
+        iterations = CRITIQUE_ITERATIONS["gliederung"]
     
     log(f"\n{'='*60}")
     log("PHASE 1: GROB-GLIEDERUNG")
     log(f"{'='*60}")
+    set_status(phase="Phase 1: Grob-Gliederung", detail="Erste Version")
     
     telegram_send(f"🚀 *Phase 1 gestartet*\n\nSetting: {setting}")
     
@@ -769,15 +2773,34 @@ PRÜFE VOR DER AUSGABE:
 - Hat jede Phase einen KLAREN Höhepunkt?
 """
 
-    gliederung = call_gemini(prompt, max_tokens=16000)
-    log(f"   ✓ Erste Version ({len(gliederung)} Zeichen)")
-    save_versioned(output_dir, "01_gliederung.md", gliederung, iteration=1)
+    version = 0
     
-    # Self-Critique Loop
-    for i in range(iterations):
-        log(f"\n   [Iteration {i+2}/{iterations+1}] Self-Critique...")
-        
-        critique_prompt = f"""{SELF_CRITIQUE_PROMPT}
+    def self_critique(gliederung: str) -> str:
+        """Self-Critique bis keine Probleme ab KRITIK_MIN_SCHWERE mehr offen sind bzw. zur Konvergenz"""
+        nonlocal version
+        for i in range(iterations):
+            if skip_requested():
+                log(f"   ⏭️ Self-Critique übersprungen (/skip)")
+                break
+            log(f"\n   [Iteration {i+2}/{iterations+1}] Self-Critique...")
+            set_status(detail=f"Self-Critique {i+1}/{iterations}")
+            
+            # 1. Kurze Kritik mit Schwere pro Abschnitt, 2. nur diese Abschnitte neu schreiben
+            abschnitte = parse_gliederung(gliederung).sections
+            probleme = gliederung_kritik(gliederung, abschnitte) if abschnitte else None
+            
+            if probleme is not None:
+                relevant = [p for p in probleme if p["schwere"] >= KRITIK_MIN_SCHWERE]
+                log(f"   📋 Kritik: {len(probleme)} Probleme, {len(relevant)} ab Schwere {KRITIK_MIN_SCHWERE}"
+                    + (f" in {', '.join(sorted({p['abschnitt'] for p in relevant}))}" if relevant else ""))
+                if not relevant:
+                    # Die Kritik dieser Iteration ist schon gelaufen - zählt als gelaufen
+                    iterationen_gespart("Gliederung", i + 1, iterations)
+                    break
+                verbessert = gliederung_ueberarbeiten(gliederung, abschnitte, relevant)
+            else:
+                # Fallback (keine Abschnitte erkannt / kein gültiges JSON): Kritik + Komplett-Neufassung
+                verbessert = call_gemini(f"""{SELF_CRITIQUE_PROMPT}
 
 Hier ist die aktuelle Roman-Gliederung:
 
@@ -786,19 +2809,32 @@ Hier ist die aktuelle Roman-Gliederung:
 AUFGABE:
 1. KRITISIERE diese Gliederung SCHONUNGSLOS
 2. Liste KONKRETE Schwächen auf
-3. Dann: Gib die VOLLSTÄNDIG ÜBERARBEITETE Gliederung aus
+3. Dann: Schreibe die Zeile {FASSUNG_MARKER} und danach die VOLLSTÄNDIG ÜBERARBEITETE Gliederung
 
 Die überarbeitete Version muss KOMPLETT sein - nicht nur die Änderungen!
-"""
-        
-        verbessert = call_gemini(critique_prompt, max_tokens=16000, use_flash=True)
-        
-        if len(verbessert) > len(gliederung) * 0.5:
-            gliederung = verbessert
-            log(f"   ✓ Überarbeitet ({len(gliederung)} Zeichen)")
-            save_versioned(output_dir, "01_gliederung.md", gliederung, iteration=i+2)
-        else:
-            log(f"   ⚠️ Überarbeitung zu kurz, behalte vorherige Version")
+""", max_tokens=16000, use_flash=True)
+                verbessert = ohne_kritik(verbessert)
+            
+            if len(verbessert) > len(gliederung) * 0.5:
+                stabil = konvergiert(gliederung, verbessert, "Gliederung")
+                gliederung = verbessert
+                version += 1
+                log(f"   ✓ Überarbeitet ({len(gliederung)} Zeichen)")
+                save_versioned(output_dir, "01_gliederung.md", gliederung, iteration=version)
+                if stabil:
+                    iterationen_gespart("Gliederung", i + 1, iterations)
+                    break
+            else:
+                log(f"   ⚠️ Überarbeitung zu kurz, behalte vorherige Version")
+        return gliederung
+    
+    gliederung = call_gemini(prompt, max_tokens=16000)
+    log(f"   ✓ Erste Version ({len(gliederung)} Zeichen)")
+    version += 1
+    save_versioned(output_dir, "01_gliederung.md", gliederung, iteration=version)
+    
+    # Self-Critique Loop
+    gliederung = self_critique(gliederung)
     
     # TELEGRAM APPROVAL - Gliederung direkt
     log(f"\n   📱 Sende Gliederung zur Freigabe...")
@@ -806,11 +2842,13 @@ Die überarbeitete Version muss KOMPLETT sein - nicht nur die Änderungen!
     attempt = 0
     while True:
         attempt += 1
+        set_status(detail=f"Warte auf Freigabe (Versuch {attempt})")
         # Volle Gliederung senden (wird automatisch gesplittet)
         approved = telegram_approval_file(
             f"gliederung_v{attempt}.md",
             gliederung,
-            f"📋 *GLIEDERUNG* (Versuch {attempt})"
+            f"📋 *GLIEDERUNG* (Versuch {attempt})",
+            key="gliederung"
         )
         
         if approved:
@@ -825,10 +2863,9 @@ Die überarbeitete Version muss KOMPLETT sein - nicht nur die Änderungen!
         else:
             log(f"   🔄 Generiere neue Version...")
             gliederung = call_gemini(prompt, max_tokens=16000)
-            for j in range(iterations):
-                critique_prompt = f"""{SELF_CRITIQUE_PROMPT}\n\n{gliederung}\n\nVOLLSTÄNDIG ÜBERARBEITETE Gliederung:"""
-                gliederung = call_gemini(critique_prompt, max_tokens=16000, use_flash=True)
-            save_versioned(output_dir, "01_gliederung.md", gliederung, iteration=attempt+iterations+1)
+            version += 1
+            save_versioned(output_dir, "01_gliederung.md", gliederung, iteration=version)
+            gliederung = self_critique(gliederung)
     
     # Finale Version speichern
     save_versioned(output_dir, "01_gliederung.md", gliederung)
@@ -837,6 +2874,199 @@ Die überarbeitete Version muss KOMPLETT sein - nicht nur die Änderungen!
     return gliederung
 
 
+# ============================================================
+# PLANUNGS-SCHEMAS (strukturierte Akt- + Kapitel-Gliederungen)
+# ============================================================
+
+_STR = {"type": "STRING"}
+_STR_LIST = {"type": "ARRAY", "items": _STR}
+
+AKT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "akt": {"type": "INTEGER"},
+        "kapitel": {
+            "type": "ARRAY",
+            "minItems": 1,
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "nummer": {"type": "INTEGER", "minimum": 1},
+                    "titel": _STR,
+                    "phasen": _STR_LIST,
+                    "suspense": {"type": "INTEGER"},
+                    "szenen": {**_STR_LIST, "minItems": 1},
+                    "figuren": _STR_LIST,
+                    "beat": _STR,
+                    "wortzahl": {"type": "INTEGER", "minimum": 500},
+                },
+                "required": ["nummer", "titel", "szenen", "wortzahl"],
+            },
+        },
+    },
+    "required": ["kapitel"],
+}
+
+KAPITEL_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "nummer": {"type": "INTEGER"},
+        "titel": _STR,
+        "wortzahl": {"type": "INTEGER", "minimum": 500},
+        "phase": _STR,
+        "suspense": {"type": "INTEGER"},
+        "bogen": _STR,
+        "figuren": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"name": _STR, "rolle": _STR, "verhalten": _STR, "interaktion": _STR},
+                "required": ["name", "rolle"],
+            },
+        },
+        "szenen": {
+            "type": "ARRAY",
+            "minItems": 1,
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "titel": _STR,
+                    "ort": _STR,
+                    "figuren": _STR_LIST,
+                    "ziel": _STR,
+                    "beats": _STR_LIST,
+                    "dynamik": _STR,
+                    "momente": _STR,
+                    "atmosphaere": _STR,
+                },
+                "required": ["titel", "ort", "ziel", "beats"],
+            },
+        },
+        "anknuepfung": _STR,
+        "setup": _STR,
+        "constraints": _STR_LIST,
+    },
+    "required": ["titel", "wortzahl", "figuren", "szenen"],
+}
+
+
+KAPITEL_JSON_HINWEIS = """
+AUSGABE als JSON nach Schema - Abschnitte von oben: METADATEN -> nummer, titel, wortzahl, phase,
+suspense, bogen; FIGUREN -> figuren [{name, rolle, verhalten, interaktion}]; SZENEN -> szenen
+[{titel, ort, figuren, ziel, beats, dynamik, momente, atmosphaere}]; VERBINDUNGEN -> anknuepfung,
+setup; CONSTRAINTS -> constraints."""
+
+
+def render_akt(plan: dict, akt_num: int) -> str:
+    """Akt-Plan (AKT_SCHEMA) als Markdown für Approval, Qdrant und Prompts"""
+    lines = [f"# AKT {akt_num}"]
+    for kap in plan["kapitel"]:
+        lines += ["", f"## Kapitel {kap['nummer']}: {kap['titel']}"]
+        if kap.get("phasen"):
+            lines.append(f"- Phase(n): {', '.join(kap['phasen'])}")
+        if kap.get("suspense"):
+            lines.append(f"- Suspense-Level: {kap['suspense']}")
+        lines.append(f"- Wortzahl: {kap['wortzahl']}")
+        if kap.get("figuren"):
+            lines.append(f"- Figuren: {', '.join(kap['figuren'])}")
+        lines.append("- Kernszenen:")
+        lines += [f"  {i}. {szene}" for i, szene in enumerate(kap["szenen"], 1)]
+        if kap.get("beat"):
+            lines.append(f"- Emotionaler Beat: {kap['beat']}")
+    return "\n".join(lines)
+
+
+def render_kapitel_gliederung(plan: dict, kapitel_nr: int) -> str:
+    """Kapitel-Plan (KAPITEL_SCHEMA) im bisherigen Markdown-Format der Szenen-Gliederung"""
+    lines = [
+        "## METADATEN",
+        f"- Nummer: {kapitel_nr}",
+        f"- Titel: {plan['titel']}",
+        f"- Wortzahl: {plan['wortzahl']}",
+        f"- Phase: {plan.get('phase', '')}",
+        f"- Suspense-Level: {plan.get('suspense', '')}",
+        f"- Emotionaler Bogen: {plan.get('bogen', '')}",
+        "",
+        "## FIGUREN IN DIESEM KAPITEL",
+    ]
+    for figur in plan["figuren"]:
+        details = "; ".join(v for v in (figur.get("verhalten"), figur.get("interaktion")) if v)
+        lines.append(f"- **{figur['name']}**: {figur['rolle']}" + (f" ({details})" if details else ""))
+    
+    lines += ["", "## SZENEN"]
+    for i, szene in enumerate(plan["szenen"], 1):
+        lines += ["", f"### Szene {i}: {szene['titel']}", f"- Ort: {szene['ort']}"]
+        if szene.get("figuren"):
+            lines.append(f"- Anwesende Figuren: {', '.join(szene['figuren'])}")
+        lines += [f"- Ziel: {szene['ziel']}", "- Beats:"]
+        lines += [f"  {j}. {beat}" for j, beat in enumerate(szene["beats"], 1)]
+        for key, label in (("dynamik", "Charakter-Dynamik"), ("momente", "Wichtige Momente"),
+                           ("atmosphaere", "Atmosphäre")):
+            if szene.get(key):
+                lines.append(f"- {label}: {szene[key]}")
+    
+    lines += ["", "## VERBINDUNGEN",
+              f"- Anknüpfung an Kapitel {kapitel_nr - 1}: {plan.get('anknuepfung', '')}",
+              f"- Setup für Kapitel {kapitel_nr + 1}: {plan.get('setup', '')}"]
+    if plan.get("constraints"):
+        lines += ["", "## CONSTRAINTS"] + [f"- {c}" for c in plan["constraints"]]
+    return "\n".join(lines)
+
+
+def plane_strukturiert(prompt: str, json_hinweis: str, schema: dict, render, output_dir: Path,
+                       filename: str, max_tokens: int, iteration: int = 1, critique_label: str = "",
+                       iterations: int = 1) -> tuple:
+    """Planungs-Call als JSON + Self-Critique im selben Schema -> (Markdown, Plan)
+    
+    Bis zu iterations Self-Critique-Durchläufe, Abbruch sobald die Fassungen konvergieren.
+    Plan ist None, wenn Gemini auch nach dem Reparatur-Call kein gültiges JSON liefert -
+    dann läuft der bisherige Freitext-Weg (Markdown ohne JSON-Artefakt).
+    """
+    json_path = output_dir / filename.replace(".md", ".json")
+    plan = call_gemini_json(prompt + json_hinweis, schema, max_tokens=max_tokens)
+    text = render(plan) if plan else call_gemini(prompt, max_tokens=max_tokens)
+    save_versioned(output_dir, filename, text, iteration=iteration)
+    
+    for i in range(iterations):
+        if skip_requested():
+            break
+        if plan:
+            improved = call_gemini_json(f"""{SELF_CRITIQUE_PROMPT}
+
+{critique_label} (JSON):
+{json.dumps(plan, ensure_ascii=False, indent=1)}
+
+Wende deine Kritik an und gib die VOLLSTÄNDIG ÜBERARBEITETE {critique_label} im selben JSON-Schema aus.""",
+                                        schema, max_tokens=max_tokens, use_flash=True)
+            if not improved:
+                continue
+            neu = render(improved)
+            plan = improved
+        else:
+            neu = call_gemini(f"""{SELF_CRITIQUE_PROMPT}
+
+{critique_label}:
+{text}
+
+Erst KRITIK, dann die Zeile {FASSUNG_MARKER}, danach die VOLLSTÄNDIG ÜBERARBEITETE {critique_label}:""",
+                              max_tokens=max_tokens, use_flash=True)
+            neu = ohne_kritik(neu)
+            if len(neu) <= len(text) * 0.5:
+                continue
+        stabil = konvergiert(text, neu, critique_label)
+        text = neu
+        save_versioned(output_dir, filename, text, iteration=iteration + i + 1)
+        if stabil:
+            iterationen_gespart(critique_label, i + 1, iterations)
+            break
+    
+    if plan:
+        json_path.write_text(json.dumps(plan, ensure_ascii=False, indent=1), encoding="utf-8")
+    elif json_path.exists():
+        json_path.unlink()  # Veralteter Plan einer früheren Fassung
+    return text, plan
+
+
 # ============================================================
 # PHASE 2: AKT-GLIEDERUNGEN
 # ============================================================
@@ -847,6 +3077,7 @@ def phase2_akte(gliederung: str, output_dir: Path) -> dict:
     log(f"\n{'='*60}")
     log("PHASE 2: AKT-GLIEDERUNGEN")
     log(f"{'='*60}")
+    set_status(phase="Phase 2: Akt-Gliederungen", detail="")
     
     telegram_send("📋 *Phase 2 gestartet*: Akt-Gliederungen")
     
@@ -859,6 +3090,7 @@ def phase2_akte(gliederung: str, output_dir: Path) -> dict:
     
     for akt_num, beschreibung in akt_phasen.items():
         log(f"\n   [Akt {akt_num}] {beschreibung}")
+        set_status(detail=f"Akt {akt_num}/3")
         
         prompt = f"""{REGELWERK}
 
@@ -876,38 +3108,31 @@ Für JEDES Kapitel in diesem Akt:
 5. Emotionaler Beat am Ende
 6. Wortzahl-Ziel (Gesamt ~80.000 Wörter, 18-22 Kapitel)
 """
+        json_hinweis = """
+AUSGABE als JSON: {"akt", "kapitel": [{"nummer", "titel", "phasen", "suspense", "szenen",
+"figuren", "beat", "wortzahl"}]} - ein Eintrag pro Kapitel, "szenen" = Kernszenen."""
         
-        akt = call_gemini(prompt, max_tokens=12000)
-        log(f"      ✓ Erstellt ({len(akt)} Zeichen)")
-        save_versioned(output_dir, f"02_akt_{akt_num}.md", akt, iteration=1)
+        def akt_erstellen(iteration: int) -> str:
+            akt, plan = plane_strukturiert(
+                prompt, json_hinweis, AKT_SCHEMA, lambda p: render_akt(p, akt_num), output_dir,
+                f"02_akt_{akt_num}.md", max_tokens=12000, iteration=iteration,
+                critique_label=f"Akt {akt_num} Gliederung", iterations=CRITIQUE_ITERATIONS["akt"]
+            )
+            log(f"      ✓ Erstellt ({len(plan['kapitel']) if plan else '?'} Kapitel, {len(akt)} Zeichen)")
+            return akt
         
-        # Self-Critique
-        critique = call_gemini(f"""{SELF_CRITIQUE_PROMPT}
-
-Akt {akt_num} Gliederung:
-{akt}
-
-KRITIK + VOLLSTÄNDIG ÜBERARBEITETE Akt-Gliederung:""", max_tokens=12000, use_flash=True)
+        akt = akt_erstellen(iteration=1)
         
-        if len(critique) > len(akt) * 0.5:
-            akt = critique
-            log(f"      ✓ Überarbeitet")
-            save_versioned(output_dir, f"02_akt_{akt_num}.md", akt, iteration=2)
-        
-        # TELEGRAM APPROVAL für diesen Akt
-        approved = telegram_approval_file(
+        # TELEGRAM APPROVAL für diesen Akt (Neufassungen gehen als Diff raus)
+        attempt = 1
+        while not telegram_approval_file(
             f"akt_{akt_num}.md",
             akt,
-            f"📋 *AKT {akt_num}* - {beschreibung}"
-        )
-        
-        if not approved:
+            f"📋 *AKT {akt_num}* - {beschreibung}" + (f" (Versuch {attempt})" if attempt > 1 else "")
+        ):
+            attempt += 1
             log(f"   🔄 Akt {akt_num} abgelehnt - generiere neu...")
-            akt = call_gemini(prompt, max_tokens=12000)
-            critique = call_gemini(f"""{SELF_CRITIQUE_PROMPT}\n\nAkt {akt_num}:\n{akt}\n\nÜBERARBEITET:""", max_tokens=12000, use_flash=True)
-            if len(critique) > len(akt) * 0.5:
-                akt = critique
-            save_versioned(output_dir, f"02_akt_{akt_num}.md", akt, iteration=3)
+            akt = akt_erstellen(iteration=(attempt - 1) * (CRITIQUE_ITERATIONS["akt"] + 1) + 1)
         
         akte[f"akt_{akt_num}"] = akt
         save_versioned(output_dir, f"02_akt_{akt_num}.md", akt)
@@ -923,41 +3148,42 @@ KRITIK + VOLLSTÄNDIG ÜBERARBEITETE Akt-Gliederung:""", max_tokens=12000, use_f
 # PHASE 2.5: KAPITEL-GLIEDERUNGEN  
 # ============================================================
 
-def phase2_5_kapitel(gliederung: str, akte: dict, output_dir: Path) -> list:
+def phase2_5_kapitel(gliederung: str, akte: dict, output_dir: Path, story: StoryModel = None) -> list:
     """Detaillierte Szenen-Gliederung pro Kapitel"""
     
     log(f"\n{'='*60}")
     log("PHASE 2.5: KAPITEL-GLIEDERUNGEN")
     log(f"{'='*60}")
+    set_status(phase="Phase 2.5: Kapitel-Gliederungen", detail="")
     
     telegram_send("📝 *Phase 2.5 gestartet*: Kapitel-Gliederungen")
     
     kapitel_liste = []
     kapitel_nr = 1
     
+    # Charaktere einmal aus dem Story-Modell (nicht pro Kapitel per Regex)
+    story = story or load_story_model(gliederung, output_dir)
+    charakter_section = story.nebencharaktere[:3000]
+    if not charakter_section and "NEBENCHARAKTERE" in gliederung.upper():
+        charakter_section = gliederung[:4000]
+    
     for akt_num in [1, 2, 3]:
         log(f"\n   [Akt {akt_num}]")
         akt_text = akte[f"akt_{akt_num}"]
         
-        # Kapitel aus Akt extrahieren
-        matches = re.findall(r'Kapitel\s*(\d+)[:\s]*([^\n]+)', akt_text, re.IGNORECASE)
-        if not matches:
-            # Fallback: Schätze 6-7 Kapitel pro Akt
-            matches = [(str(kapitel_nr + i), f"Kapitel {kapitel_nr + i}") for i in range(7)]
+        # Kapitel aus dem strukturierten Akt-Plan (02_akt_N.json)
+        akt_plan = load_json(output_dir / f"02_akt_{akt_num}.json")
+        if akt_plan:
+            matches = [(kap.get("wortzahl"), kap["titel"]) for kap in akt_plan["kapitel"]]
+        else:
+            # Freitext-Akt (JSON fehlgeschlagen): Kapitel per Regex, sonst 7 schätzen
+            matches = [(None, t) for _, t in re.findall(r'Kapitel\s*(\d+)[:\s]*([^\n]+)', akt_text, re.IGNORECASE)]
+            if not matches:
+                matches = [(None, f"Kapitel {kapitel_nr + i}") for i in range(7)]
         
-        for _, titel in matches:
+        for akt_wortzahl, titel in matches:
             log(f"      [Kapitel {kapitel_nr}] {titel[:40]}...")
-            
-            # Charaktere aus Gliederung extrahieren
-            charakter_section = ""
-            if "NEBENCHARAKTERE" in gliederung or "Nebencharaktere" in gliederung:
-                # Versuche Charakter-Sektion zu extrahieren
-                match = re.search(r'(##\s*3\.?\s*NEBENCHARAKTERE.*?)(?=##\s*4\.?\s*|##\s*DIE\s*7|$)', gliederung, re.DOTALL | re.IGNORECASE)
-                if match:
-                    charakter_section = match.group(1)[:3000]
-                else:
-                    # Fallback: Suche nach Charakternamen
-                    charakter_section = gliederung[:4000]
+            set_status(detail=f"Kapitel {kapitel_nr} (Akt {akt_num})")
             
             prompt = f"""{STIL}
 
@@ -983,7 +3209,7 @@ AUFGABE: DETAILLIERTE Szenen-Gliederung für KAPITEL {kapitel_nr}: {titel}
 ## METADATEN
 - Nummer: {kapitel_nr}
 - Titel: {titel}
-- Wortzahl: [3000-4000]
+- Wortzahl: {akt_wortzahl or "[3000-4000]"}
 - Phase: [Welche der 7 Phasen?]
 - Suspense-Level: [1/2/3]
 - Emotionaler Bogen: [Start] → [Ende]
@@ -995,133 +3221,630 @@ Liste ALLE Figuren die vorkommen mit:
 - Ihr typisches Verhalten (aus Charakter-Beschreibung!)
 - Wie interagieren sie mit Heldin/Hero?
 
-## SZENEN (3-5 pro Kapitel)
+## SZENEN (3-5 pro Kapitel)
+
+### Szene X: [Titel]
+- Ort: [KONKRET]
+- Anwesende Figuren: [Namen + was sie TUN]
+- Ziel: [Was MUSS passieren?]
+- Beats:
+  1. [Einstieg]
+  2. [Entwicklung]  
+  3. [Wendepunkt/Hook]
+- Charakter-Dynamik: [Wie verhalten sich die Figuren zueinander?]
+- Wichtige Momente: [Spezifische Dialoge/Aktionen]
+- Atmosphäre: [Stimmung]
+
+## VERBINDUNGEN
+- Anknüpfung an Kapitel {kapitel_nr - 1}
+- Setup für Kapitel {kapitel_nr + 1}
+
+## CONSTRAINTS
+- Was darf NICHT passieren?
+- Welches Charakter-Verhalten wäre OOC (out of character)?
+"""
+            
+            kap_gliederung, kap_plan = plane_strukturiert(
+                prompt, KAPITEL_JSON_HINWEIS, KAPITEL_SCHEMA,
+                lambda p, nr=kapitel_nr: render_kapitel_gliederung(p, nr), output_dir,
+                f"02.5_kapitel_{kapitel_nr:02d}_gliederung.md", max_tokens=8000,
+                critique_label="Kapitel-Gliederung", iterations=CRITIQUE_ITERATIONS["kapitel"]
+            )
+            
+            log(f"         ✓ Erstellt ({len(kap_gliederung)} Zeichen)")
+            
+            kapitel_liste.append({
+                "nummer": kapitel_nr,
+                "titel": titel.strip(),
+                "akt": akt_num,
+                "gliederung": kap_gliederung,
+                # Exakte Planungsdaten (None/leer beim Freitext-Fallback)
+                "wortzahl": kap_plan["wortzahl"] if kap_plan else akt_wortzahl,
+                "szenen": kap_plan["szenen"] if kap_plan else []
+            })
+            
+            # In Qdrant
+            qdrant_store(kap_gliederung, {
+                "type": "kapitel_gliederung",
+                "kapitel": kapitel_nr,
+                "akt": akt_num
+            })
+            
+            save_versioned(output_dir, f"02.5_kapitel_{kapitel_nr:02d}_gliederung.md", kap_gliederung)
+            kapitel_nr += 1
+    
+    # TELEGRAM APPROVAL für Kapitel-Struktur
+    log(f"\n   📱 Sende Kapitel-Übersicht zur Freigabe...")
+    
+    # Alle Kapitel-Gliederungen zusammenfassen
+    kapitel_inhalt = ""
+    for k in kapitel_liste:
+        kapitel_inhalt += f"\n\n{'='*60}\n"
+        kapitel_inhalt += f"KAPITEL {k['nummer']}: {k['titel']}\n"
+        kapitel_inhalt += f"{'='*60}\n\n"
+        kapitel_inhalt += k.get('gliederung', '[Keine Gliederung]')
+    
+    telegram_approval_file(
+        "kapitel_struktur.md",
+        kapitel_inhalt,
+        f"📚 *KAPITEL-STRUKTUR* - {len(kapitel_liste)} Kapitel"
+    )
+    
+    log(f"\n✓ Phase 2.5 abgeschlossen! {len(kapitel_liste)} Kapitel")
+    return kapitel_liste
+
+
+# ============================================================
+# PATCH-EDITS (SUCHEN/ERSETZEN statt Komplett-Neufassung)
+# ============================================================
+
+PATCH_PROTOKOLL = """AUSGABE-FORMAT: Gib NICHT den ganzen Text aus, sondern nur Änderungs-Blöcke:
+
+<<<<<<< SUCHEN
+[exakte Passage aus dem Text - Zeichen für Zeichen kopiert, eindeutig, 1-3 Sätze]
+=======
+[neue Fassung dieser Passage]
+>>>>>>> ERSETZEN
+
+- Beliebig viele Blöcke, jeder SUCHEN-Text muss genau EINMAL im Text vorkommen
+- Einfügen: SUCHEN = Satz vor der Stelle, ERSETZEN = derselbe Satz + neuer Text
+- Streichen: ERSETZEN leer lassen
+- Keine Kommentare außerhalb der Blöcke. Nichts zu ändern: nur KEINE ÄNDERUNGEN"""
+
+PATCH_BLOCK = re.compile(r'<{5,}\s*SUCHEN\s*\n(.*?)\n={5,}\s*\n(.*?)\n?>{5,}\s*ERSETZEN', re.DOTALL)
+PATCH_MARKER = re.compile(r'^\[(?:K\d+ )?¶\d+\]\s*', re.MULTILINE)  # Absatz-Marker aus Prompts
+
+
+def parse_patches(antwort: str) -> List[tuple]:
+    """[(suchen, ersetzen)] aus einer Patch-Antwort (Absatz-Marker werden entfernt)"""
+    return [(PATCH_MARKER.sub('', suchen).strip(), PATCH_MARKER.sub('', ersetzen).strip())
+            for suchen, ersetzen in PATCH_BLOCK.findall(antwort)]
+
+
+def _find_anchor(text: str, suchen: str) -> List[tuple]:
+    """Fundstellen (start, ende) - exakt, sonst whitespace-tolerant"""
+    spans = [(m.start(), m.start() + len(suchen)) for m in re.finditer(re.escape(suchen), text)]
+    if not spans and suchen:
+        pattern = r'\s+'.join(re.escape(w) for w in suchen.split())
+        spans = [m.span() for m in re.finditer(pattern, text)]
+    return spans
+
+
+def apply_patches(text: str, patches: List[tuple]) -> tuple:
+    """Patches validieren + anwenden -> (neuer Text, [(patch, Fehler)] der nicht anwendbaren)
+    
+    Jeder Anker muss genau einmal vorkommen und darf sich nicht mit einem anderen
+    überschneiden. Gültige Patches werden angewendet, ungültige zurückgegeben.
+    """
+    gueltig, fehler = [], []
+    for suchen, ersetzen in patches:
+        spans = _find_anchor(text, suchen)
+        if len(spans) != 1:
+            fehler.append(((suchen, ersetzen), "nicht gefunden" if not spans else f"{len(spans)}x gefunden"))
+        elif any(s < spans[0][1] and spans[0][0] < e for s, e, _ in gueltig):
+            fehler.append(((suchen, ersetzen), "überschneidet sich mit anderem Block"))
+        else:
+            gueltig.append((spans[0][0], spans[0][1], ersetzen))
+    
+    for start, ende, ersetzen in sorted(gueltig, reverse=True):
+        text = text[:start] + ersetzen + text[ende:]
+    # Durch Streichungen entstandene Mehrfach-Leerzeilen glätten
+    return re.sub(r'\n{3,}', '\n\n', text), fehler
+
+
+def claude_patch(text: str, auftrag: str, rewrite_prompt: str, label: str = "Patch:",
+                 text_im_prompt: str = None) -> str:
+    """Überarbeitung als Patches (Claude), lokal angewendet
+    
+    auftrag: was zu ändern ist (ohne Ausgabe-Anweisung). Nicht passende Anker bekommen
+    einen Reparatur-Call; scheitert auch der, läuft rewrite_prompt (Komplett-Neufassung).
+    text_im_prompt: Anzeige-Fassung des Texts (z.B. mit Absatz-Markern).
+    """
+    antwort = call_claude(f"""{auftrag}
+
+{PATCH_PROTOKOLL}
+
+TEXT:
+{text_im_prompt or text}""")
+    patches = parse_patches(antwort)
+    
+    if patches:
+        neu, fehler = apply_patches(text, patches)
+        if fehler:
+            # Ein Reparatur-Versuch nur für die kaputten Anker, gegen den bereits gepatchten Text
+            log(f"      ⚠️ {label} {len(fehler)}/{len(patches)} Patches ohne Anker - Reparatur...")
+            liste = "\n\n".join(f"<<<<<<< SUCHEN\n{s}\n=======\n{e}\n>>>>>>> ERSETZEN\n(Fehler: {grund})"
+                                for (s, e), grund in fehler)
+            antwort = call_claude(f"""Diese Änderungs-Blöcke passen nicht auf den Text: der SUCHEN-Teil muss
+Zeichen für Zeichen und genau einmal im Text vorkommen. Korrigiere NUR die SUCHEN-Teile.
+
+{liste}
+
+{PATCH_PROTOKOLL}
+
+TEXT:
+{neu}""")
+            neu, fehler = apply_patches(neu, parse_patches(antwort))
+        if not fehler:
+            log(f"      ✓ {label} {len(patches)} Patches angewendet")
+            return neu
+    elif "KEINE ÄNDERUNGEN" in antwort.upper() and len(antwort) < 100:
+        log(f"      ✓ {label} keine Änderungen nötig")
+        return text
+    
+    # Fallback: Komplett-Neufassung
+    log(f"      ⚠️ {label} Patches nicht anwendbar - Komplett-Neufassung")
+    rewritten = call_claude(rewrite_prompt)
+    return rewritten if len(rewritten.split()) > len(text.split()) * 0.5 else text
+
+
+# ============================================================
+# ROLLIERENDE ZUSAMMENFASSUNGEN (Story so far)
+# ============================================================
+
+SUMMARY_WORDS = 180        # Zusammenfassung pro Kapitel
+DIGEST_WORDS = 700         # "Story so far" über alle bisherigen Kapitel
+PREV_TAIL_WORDS = 400      # Wörtlicher Rest des Vorkapitels für den Anschluss
+
+
+class StoryDigest:
+    """Kapitel-Zusammenfassungen + inkrementeller Gesamt-Digest (zusammenfassungen.json)
+    
+    Läuft auf einem Hintergrund-Thread mit Gemini Flash: submit() nach dem Entwurf eines
+    Kapitels, die Zusammenfassung entsteht parallel zum Polish. kontext() wartet nur, bis
+    alle eingereihten Kapitel verarbeitet sind. Der Digest wird pro Kapitel fortgeschrieben
+    (alter Digest + neue Zusammenfassung -> neuer Digest), frühe Kapitel werden dabei
+    immer stärker verdichtet. Fehlt ein Kapitel (Gemini-Fehler), wird es aus
+    kapitel_NN.md nachgeholt, bevor das nächste dazukommt.
+    """
+    
+    def __init__(self, output_dir: Path):
+        self.output_dir = output_dir
+        self.path = output_dir / "zusammenfassungen.json"
+        data = load_json(self.path) or {}
+        self.kapitel = {int(k): v for k, v in data.get("kapitel", {}).items()}
+        self.digest = data.get("digest", "")
+        self.bis_kapitel = data.get("bis_kapitel", 0)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="story-digest")
+        self.pending = []
+    
+    def submit(self, kapitel_nr: int, text: str):
+        """Kapitel zusammenfassen + Digest fortschreiben (asynchron, in Reihenfolge)"""
+        if kapitel_nr <= self.bis_kapitel:
+            return
+        self.pending.append(self.executor.submit(self._update, kapitel_nr, text))
+    
+    def _update(self, kapitel_nr: int, text: str):
+        """Kapitel in den Digest falten - vorher fehlende Kapitel aus ihrer Datei nachholen
+        
+        Der Digest bleibt lückenlos: scheitert ein Kapitel auch beim Nachholen, bleibt
+        bis_kapitel stehen und das neue Kapitel wird nicht darübergefaltet.
+        """
+        if kapitel_nr <= self.bis_kapitel:
+            return
+        for nr in range(self.bis_kapitel + 1, kapitel_nr):
+            datei = self.output_dir / f"kapitel_{nr:02d}.md"
+            log(f"      📚 Kapitel {nr} fehlt in der Story so far - hole nach")
+            if not datei.exists() or not self._fortschreiben(nr, datei.read_text(encoding="utf-8")):
+                log(f"      ⚠️ Story so far bleibt bei Kapitel {self.bis_kapitel}, Kapitel {kapitel_nr} wartet")
+                return
+        self._fortschreiben(kapitel_nr, text)
+    
+    def _fortschreiben(self, kapitel_nr: int, text: str, versuche: int = 2) -> bool:
+        """Zusammenfassung + neuer Digest für ein Kapitel (True = Digest steht bei kapitel_nr)"""
+        for versuch in range(1, versuche + 1):
+            try:
+                summary = call_gemini(f"""Fasse Kapitel {kapitel_nr} eines Liebesromans in höchstens {SUMMARY_WORDS} Wörtern zusammen.
+Nur Fakten, keine Wertung:
+- Was passiert (Handlung, Wendepunkte)
+- Wer weiß jetzt was (Geheimnisse, Enthüllungen)
+- Stand der Beziehung Heldin/Hero
+- Offene Fäden, Ort + Zeit und Situation am Kapitelende
+
+KAPITEL {kapitel_nr}:
+{text}""", max_tokens=1000, use_flash=True).strip()
+                if not summary:
+                    raise ValueError("leere Antwort")
+                
+                digest = summary
+                if self.digest:
+                    digest = call_gemini(f"""Aktualisiere die "Story so far" eines Romans um das neue Kapitel.
+Maximal {DIGEST_WORDS} Wörter. Verdichte ältere Kapitel stärker als neuere, aber behalte
+alles, was für die Kontinuität zählt: Figuren-Wissen, Beziehungsstand, offene Fäden,
+Versprechen, Verletzungen, Orte, Zeitangaben.
+
+BISHER (bis Kapitel {self.bis_kapitel}):
+{self.digest}
+
+NEU - KAPITEL {kapitel_nr}:
+{summary}
+
+AKTUALISIERTE STORY SO FAR:""", max_tokens=2000, use_flash=True).strip() or f"{self.digest}\n\n{summary}"
+                
+                self.kapitel[kapitel_nr] = summary
+                self.digest = digest
+                self.bis_kapitel = kapitel_nr
+                self.path.write_text(json.dumps({
+                    "kapitel": self.kapitel, "digest": self.digest, "bis_kapitel": self.bis_kapitel
+                }, ensure_ascii=False, indent=1), encoding="utf-8")
+                log(f"      📚 Story so far bis Kapitel {kapitel_nr} ({len(digest.split())} Wörter)")
+                return True
+            except PipelineCancelled:
+                return False  # Der Hauptthread bricht selbst ab
+            except Exception as e:
+                log(f"      ⚠️ Zusammenfassung Kapitel {kapitel_nr} fehlgeschlagen (Versuch {versuch}/{versuche}): {e}")
+        return False
+    
+    def kontext(self, kapitel_nr: int, timeout: float = 600) -> str:
+        """Digest bis Kapitel kapitel_nr - 1 (wartet auf ausstehende Zusammenfassungen)"""
+        for future in self.pending:
+            try:
+                future.result(timeout=timeout)
+            except FutureTimeout:
+                log(f"      ⚠️ Story so far nicht rechtzeitig fertig")
+                break
+        self.pending = [f for f in self.pending if not f.done()]
+        if self.bis_kapitel == kapitel_nr - 1:
+            return self.digest
+        if self.bis_kapitel < kapitel_nr - 1:
+            log(f"      ⚠️ Story so far reicht nur bis Kapitel {self.bis_kapitel} - Kapitel {kapitel_nr} ohne Digest")
+        return ""
+
+
+# ============================================================
+# STORY-BIBLE (Fakten-Ledger pro Run)
+# ============================================================
+
+_MERKMALE = {"type": "ARRAY", "items": {
+    "type": "OBJECT",
+    "properties": {"attribut": _STR, "wert": _STR},
+    "required": ["attribut", "wert"],
+}}
+_ENTITAETEN = {"type": "ARRAY", "items": {
+    "type": "OBJECT",
+    "properties": {"name": _STR, "merkmale": _MERKMALE},
+    "required": ["name", "merkmale"],
+}}
+
+FAKTEN_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "figuren": _ENTITAETEN,
+        "orte": _ENTITAETEN,
+        "objekte": _ENTITAETEN,
+        "geheimnisse": {"type": "ARRAY", "items": {
+            "type": "OBJECT",
+            "properties": {
+                "id": _STR,
+                "inhalt": _STR,
+                "wissende": _STR_LIST,
+                "unwissende": _STR_LIST,
+                "enthuellt_an": _STR_LIST,
+            },
+            "required": ["id", "wissende"],
+        }},
+        "zeit": {
+            "type": "OBJECT",
+            "properties": {"tag": {"type": "INTEGER"}, "marker": _STR, "rueckblende": {"type": "BOOLEAN"}},
+        },
+    },
+    "required": ["figuren", "orte", "objekte", "geheimnisse"],
+}
+
+
+def _norm(text: str) -> str:
+    return re.sub(r'[^\wäöüß ]', '', str(text).casefold()).strip()
+
+
+def _werte_vertraeglich(alt: str, neu: str) -> bool:
+    """Gleich, enthalten oder gemeinsame Wörter ("grüne Augen" ~ "grün") - sonst Konflikt-Kandidat"""
+    a, b = _norm(alt), _norm(neu)
+    if not a or not b or a in b or b in a:
+        return True
+    stems = lambda s: {w[:4] for w in s.split() if len(w) > 2}
+    return bool(stems(a) & stems(b))
+
+
+class StoryBible:
+    """Strukturierte Fakten pro Kapitel (story_bible.json) + lokale Konflikt-Erkennung
+    
+    Nach jedem Kapitel extrahiert Gemini Flash feste Merkmale von Figuren/Orten/Objekten,
+    Geheimnisse (wer weiß was) und die Zeitmarke - im Hintergrund wie StoryDigest.
+    konflikte() spielt das Ledger Kapitel für Kapitel ab und vergleicht per Dict/Set:
+    widersprüchliche Merkmale, plötzliches oder vergessenes Wissen, rückwärts laufende Zeit.
+    Nur diese Kandidaten gehen später an ein LLM.
+    """
+    
+    def __init__(self, output_dir: Path):
+        self.path = output_dir / "story_bible.json"
+        data = load_json(self.path) or {}
+        self.kapitel = {int(k): v for k, v in data.get("kapitel", {}).items()}
+        self.geprueft = set(data.get("geprueft", []))  # vom LLM als unkritisch bestätigte Konflikte
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="story-bible")
+        self.pending = []
+    
+    def submit(self, kapitel_nr: int, text: str, force: bool = False):
+        """Fakten aus einem Kapitel extrahieren (asynchron; force = überarbeitete Fassung)"""
+        if kapitel_nr in self.kapitel and not force:
+            return
+        self.pending.append(self.executor.submit(self.extract, kapitel_nr, text))
+    
+    def wait(self, timeout: float = 900):
+        for future in self.pending:
+            try:
+                future.result(timeout=timeout)
+            except FutureTimeout:
+                log(f"   ⚠️ Story-Bible nicht rechtzeitig fertig")
+                break
+        self.pending = [f for f in self.pending if not f.done()]
+    
+    def bekannte_schluessel(self) -> dict:
+        """Bisher verwendete Namen/Attribute/Geheimnis-IDs (damit Folgekapitel dieselben Schlüssel nutzen)"""
+        keys = {"figuren": {}, "orte": {}, "objekte": {}, "geheimnisse": {}}
+        with self.lock:
+            for nr in sorted(self.kapitel):
+                fakten = self.kapitel[nr]
+                for kategorie in ("figuren", "orte", "objekte"):
+                    for e in fakten.get(kategorie, []):
+                        attribute = keys[kategorie].setdefault(e["name"], [])
+                        attribute.extend(m["attribut"] for m in e.get("merkmale", []) if m["attribut"] not in attribute)
+                for g in fakten.get("geheimnisse", []):
+                    keys["geheimnisse"].setdefault(g["id"], g.get("inhalt", ""))
+        return keys
+    
+    def extract(self, kapitel_nr: int, text: str):
+        try:
+            fakten = call_gemini_json(f"""Extrahiere die Kontinuitäts-Fakten aus Kapitel {kapitel_nr} eines Romans.
+
+- figuren / orte / objekte: nur FESTE Merkmale (Aussehen, Alter, Beruf, Herkunft, Beziehungen,
+  Lage, Einrichtung, Besitzer) - keine Stimmungen oder momentanen Zustände
+- geheimnisse: jedes Geheimnis mit wissende / unwissende Figuren am Kapitelende,
+  enthuellt_an = Figuren, die es IN DIESEM Kapitel erfahren
+- zeit: tag = Handlungstag seit Romanbeginn (0 wenn unklar), marker = Zeitangabe im Text,
+  rueckblende = true wenn das Kapitel in der Vergangenheit spielt
+
+BEKANNTE SCHLÜSSEL (exakt wiederverwenden, wenn dieselbe Figur / dasselbe Attribut /
+dasselbe Geheimnis gemeint ist):
+{json.dumps(self.bekannte_schluessel(), ensure_ascii=False)}
+
+KAPITEL {kapitel_nr}:
+{text}""", FAKTEN_SCHEMA, max_tokens=4000, use_flash=True)
+            if fakten is None:
+                return
+            with self.lock:
+                self.kapitel[kapitel_nr] = fakten
+                self._save()
+            log(f"      📒 Story-Bible: Kapitel {kapitel_nr} ({len(fakten['figuren'])} Figuren, "
+                f"{len(fakten['geheimnisse'])} Geheimnisse)")
+        except Exception as e:
+            log(f"      ⚠️ Story-Bible Kapitel {kapitel_nr} fehlgeschlagen: {e}")
+    
+    def _save(self):
+        self.path.write_text(json.dumps({"kapitel": self.kapitel, "geprueft": sorted(self.geprueft)},
+                                        ensure_ascii=False, indent=1), encoding="utf-8")
+    
+    @staticmethod
+    def _konflikt_key(k: dict) -> str:
+        return f"{k['kapitel']}|{k['typ']}|{k['subjekt']}|{k['detail']}"
+    
+    def als_geprueft(self, konflikte: List[dict]):
+        """Konflikte, die das LLM als unkritisch bewertet hat, nicht erneut melden"""
+        with self.lock:
+            self.geprueft.update(self._konflikt_key(k) for k in konflikte)
+            self._save()
+    
+    def konflikte(self, offen: bool = True) -> List[dict]:
+        """Konflikt-Kandidaten: [{kapitel, typ, subjekt, detail, vorher_kapitel}]
+        (offen=True: ohne die bereits als unkritisch geprüften)"""
+        with self.lock:
+            kapitel = {nr: self.kapitel[nr] for nr in sorted(self.kapitel)}
+        
+        merkmale = {}   # (kategorie, name, attribut) -> (wert, kapitel)
+        wissen = {}     # (geheimnis, figur) -> (weiß es?, kapitel)
+        letzter_tag = None
+        gefunden = []
+        
+        for nr, fakten in kapitel.items():
+            for kategorie in ("figuren", "orte", "objekte"):
+                for e in fakten.get(kategorie, []):
+                    for m in e.get("merkmale", []):
+                        key = (kategorie, _norm(e["name"]), _norm(m["attribut"]))
+                        if key not in merkmale:
+                            merkmale[key] = (m["wert"], nr)
+                        elif not _werte_vertraeglich(merkmale[key][0], m["wert"]):
+                            gefunden.append({"kapitel": nr, "typ": "merkmal", "subjekt": e["name"],
+                                             "vorher_kapitel": merkmale[key][1],
+                                             "detail": f"{m['attribut']}: \"{merkmale[key][0]}\" → \"{m['wert']}\""})
+            
+            for g in fakten.get("geheimnisse", []):
+                enthuellt = {_norm(f) for f in g.get("enthuellt_an", [])}
+                for figur in g.get("wissende", []):
+                    vorher = wissen.get((_norm(g["id"]), _norm(figur)))
+                    if vorher and not vorher[0] and _norm(figur) not in enthuellt:
+                        gefunden.append({"kapitel": nr, "typ": "wissen", "subjekt": figur, "vorher_kapitel": vorher[1],
+                                         "detail": f"weiß plötzlich \"{g.get('inhalt') or g['id']}\" (ohne Enthüllung)"})
+                    wissen[(_norm(g["id"]), _norm(figur))] = (True, nr)
+                for figur in g.get("unwissende", []):
+                    vorher = wissen.get((_norm(g["id"]), _norm(figur)))
+                    if vorher and vorher[0]:
+                        gefunden.append({"kapitel": nr, "typ": "wissen", "subjekt": figur, "vorher_kapitel": vorher[1],
+                                         "detail": f"weiß \"{g.get('inhalt') or g['id']}\" nicht mehr"})
+                    else:
+                        wissen[(_norm(g["id"]), _norm(figur))] = (False, nr)
+            
+            zeit = fakten.get("zeit") or {}
+            if zeit.get("tag") and not zeit.get("rueckblende"):
+                if letzter_tag and zeit["tag"] < letzter_tag[0]:
+                    gefunden.append({"kapitel": nr, "typ": "zeit", "subjekt": zeit.get("marker", ""),
+                                     "vorher_kapitel": letzter_tag[1],
+                                     "detail": f"Tag {zeit['tag']} nach Tag {letzter_tag[0]} (keine Rückblende)"})
+                letzter_tag = (zeit["tag"], nr)
+        
+        if offen:
+            gefunden = [k for k in gefunden if self._konflikt_key(k) not in self.geprueft]
+        return gefunden
+    
+    @staticmethod
+    def format_konflikte(konflikte: List[dict]) -> str:
+        return "\n".join(f"- Kapitel {k['kapitel']} ({k['typ']}, vorher Kapitel {k['vorher_kapitel']}): "
+                         f"{k['subjekt']} - {k['detail']}" for k in konflikte)
+
+
+# ============================================================
+# PHASE 3: SCHREIBEN (Claude Code)
+# ============================================================
+
+SCENE_PARALLEL = os.environ.get("SCENE_PARALLEL", "1") != "0"  # Szenen parallel entwerfen
+SCENE_WORKERS = int(os.environ.get("SCENE_WORKERS", "4"))
 
-### Szene X: [Titel]
-- Ort: [KONKRET]
-- Anwesende Figuren: [Namen + was sie TUN]
-- Ziel: [Was MUSS passieren?]
-- Beats:
-  1. [Einstieg]
-  2. [Entwicklung]  
-  3. [Wendepunkt/Hook]
-- Charakter-Dynamik: [Wie verhalten sich die Figuren zueinander?]
-- Wichtige Momente: [Spezifische Dialoge/Aktionen]
-- Atmosphäre: [Stimmung]
 
-## VERBINDUNGEN
-- Anknüpfung an Kapitel {kapitel_nr - 1}
-- Setup für Kapitel {kapitel_nr + 1}
+def szenen_uebergabe(szene: dict) -> str:
+    """Kurze Übergabe: geplanter Ausgang einer Szene (aus dem Kapitel-Plan, nicht aus dem Text)"""
+    figuren = f", mit {', '.join(szene['figuren'])}" if szene.get("figuren") else ""
+    return (f"Szene \"{szene['titel']}\" ({szene['ort']}{figuren}) - Ziel: {szene['ziel']}. "
+            f"Endet mit: {szene['beats'][-1] if szene.get('beats') else szene['ziel']}")
 
-## CONSTRAINTS
-- Was darf NICHT passieren?
-- Welches Charakter-Verhalten wäre OOC (out of character)?
+
+def szenen_schreiben(kontext: str, vorheriges: str, szenen: List[dict], nr: int, titel: str,
+                     ziel_wortzahl: int) -> Optional[str]:
+    """Kapitel szenenweise entwerfen: alle Szenen parallel, danach ein Nahtdurchgang
+    
+    Jede Szene kennt nur den geplanten Ausgang der vorherigen (Übergabe aus dem Plan) und
+    den geplanten Einstieg der nächsten - die Szenen sind dadurch unabhängig voneinander.
+    None, wenn eine Szene leer bleibt: der Aufrufer schreibt das Kapitel dann am Stück.
+    """
+    ziel_szene = max(300, ziel_wortzahl // len(szenen))
+    log(f"      🎬 {len(szenen)} Szenen parallel (je ~{ziel_szene} Wörter)")
+    
+    def szene_schreiben(i: int) -> str:
+        szene = szenen[i]
+        erste, letzte = i == 0, i == len(szenen) - 1
+        uebergabe = vorheriges if erste else f"""
+═══════════════════════════════════════════════════════════════
+ÜBERGABE (geplanter Ausgang der vorherigen Szene - knüpfe daran an)
+═══════════════════════════════════════════════════════════════
+{szenen_uebergabe(szenen[i - 1])}
 """
-            
-            kap_gliederung = call_gemini(prompt, max_tokens=8000)
-            save_versioned(output_dir, f"02.5_kapitel_{kapitel_nr:02d}_gliederung.md", kap_gliederung, iteration=1)
-            
-            # Self-Critique
-            improved = call_gemini(f"""{SELF_CRITIQUE_PROMPT}
+        return call_claude(f"""{kontext}{uebergabe}
+═══════════════════════════════════════════════════════════════
+AUFGABE: Schreibe NUR Szene {i + 1} von {len(szenen)} aus KAPITEL {nr}: {titel}
+═══════════════════════════════════════════════════════════════
 
-Kapitel-Gliederung:
-{kap_gliederung}
+SZENE {i + 1}: {szene['titel']}
+- Ort: {szene['ort']}
+- Ziel: {szene['ziel']}
+- Beats: {"; ".join(szene.get('beats', []))}
 
-KRITIK + VOLLSTÄNDIG ÜBERARBEITETE Kapitel-Gliederung:""", max_tokens=8000, use_flash=True)
-            
-            if len(improved) > len(kap_gliederung) * 0.5:
-                kap_gliederung = improved
-                save_versioned(output_dir, f"02.5_kapitel_{kapitel_nr:02d}_gliederung.md", kap_gliederung, iteration=2)
-            
-            log(f"         ✓ Erstellt ({len(kap_gliederung)} Zeichen)")
-            
-            kapitel_liste.append({
-                "nummer": kapitel_nr,
-                "titel": titel.strip(),
-                "akt": akt_num,
-                "gliederung": kap_gliederung
-            })
-            
-            # In Qdrant
-            qdrant_store(kap_gliederung, {
-                "type": "kapitel_gliederung",
-                "kapitel": kapitel_nr,
-                "akt": akt_num
-            })
-            
-            save_versioned(output_dir, f"02.5_kapitel_{kapitel_nr:02d}_gliederung.md", kap_gliederung)
-            kapitel_nr += 1
+REGELN:
+- Ca. {ziel_szene} Wörter (±10%)
+- Schreibe NUR diese Szene - nichts aus den anderen Szenen vorwegnehmen oder wiederholen
+- {"Steige direkt ins Kapitel ein (Anschluss an das vorherige Kapitel)" if erste else "Steige direkt in die Szene ein, ohne Rückblick auf die vorherige"}
+- {"Ende mit Hook oder emotionalem Beat (Kapitelende)" if letzte else f"Ende so, dass die nächste Szene anschließen kann: {szenen[i + 1]['titel']} ({szenen[i + 1]['ort']})"}
+- Single POV (Heldin, dritte Person), Gedanken der Heldin: Ich-Form, KURSIV (*Gedanke*)
+- KEINE Überschrift, KEINE Meta-Kommentare, beginne DIREKT mit dem Text
+
+BEGINNE JETZT:""").strip()
     
-    # TELEGRAM APPROVAL für Kapitel-Struktur
-    log(f"\n   📱 Sende Kapitel-Übersicht zur Freigabe...")
+    with ThreadPoolExecutor(max_workers=SCENE_WORKERS, thread_name_prefix="szene") as executor:
+        teile = list(executor.map(szene_schreiben, range(len(szenen))))
     
-    # Alle Kapitel-Gliederungen zusammenfassen
-    kapitel_inhalt = ""
-    for k in kapitel_liste:
-        kapitel_inhalt += f"\n\n{'='*60}\n"
-        kapitel_inhalt += f"KAPITEL {k['nummer']}: {k['titel']}\n"
-        kapitel_inhalt += f"{'='*60}\n\n"
-        kapitel_inhalt += k.get('gliederung', '[Keine Gliederung]')
+    fehlend = [i + 1 for i, teil in enumerate(teile) if not teil]
+    if fehlend:
+        log(f"      ⚠️ Szene(n) {fehlend} leer - schreibe Kapitel am Stück")
+        return None
     
-    telegram_approval_file(
-        "kapitel_struktur.md",
-        kapitel_inhalt,
-        f"📚 *KAPITEL-STRUKTUR* - {len(kapitel_liste)} Kapitel"
-    )
+    text = "\n\n* * *\n\n".join(teile)
     
-    log(f"\n✓ Phase 2.5 abgeschlossen! {len(kapitel_liste)} Kapitel")
-    return kapitel_liste
+    # Nahtdurchgang: Übergänge glätten, Dopplungen an den Grenzen entfernen
+    auftrag = f"""Dieses Kapitel wurde Szene für Szene getrennt geschrieben (Grenzen: * * *).
 
+STIL-REGELN:
+{STIL}
+
+AUFGABE: Glätte NUR die Übergänge zwischen den Szenen:
+- Doppelte Einstiege, wiederholte Erklärungen oder Rückblicke an den Grenzen streichen
+- Fehlende Überleitungen (Zeit, Ort, Stimmung) mit 1-2 Sätzen ergänzen
+- Widersprüche zwischen den Szenen (Details, wer weiß was) angleichen
+Szenenwechsel (* * *) bleiben erhalten, der übrige Text bleibt unverändert."""
+    return claude_patch(text, auftrag, f"""{auftrag}
+
+KAPITEL:
+{text}
+
+Gib das VOLLSTÄNDIGE Kapitel aus:""", label="Szenen-Nähte:")
 
-# ============================================================
-# PHASE 3: SCHREIBEN (Claude Code)
-# ============================================================
 
 def phase3_schreiben(kapitel: dict, vorheriges_kapitel: str, output_dir: Path, 
-                     roman_gliederung: str = "", akt_gliederung: str = "") -> str:
-    """Kapitel mit Claude Code schreiben - mit VOLLEM Kontext"""
+                     roman_gliederung: str = "", akt_gliederung: str = "",
+                     story: StoryModel = None, story_so_far: str = "") -> str:
+    """Kapitel mit Claude Code schreiben - mit VOLLEM Kontext
+    
+    story_so_far: rollierender Digest aller bisherigen Kapitel - dann reicht vom
+    Vorkapitel ein kurzes wörtliches Ende (sonst die letzten 2000 Wörter).
+    Mit Szenen im Kapitel-Plan (kapitel["szenen"]) wird szenenweise parallel entworfen.
+    """
     
     nr = kapitel["nummer"]
     titel = kapitel["titel"]
     kapitel_gliederung = kapitel["gliederung"]
     
-    # Wortzahl aus Gliederung
-    match = re.search(r'Wortzahl[:\s]*\[?(\d+)', kapitel_gliederung)
-    ziel_wortzahl = int(match.group(1)) if match else 3500
+    # Wortzahl aus dem Kapitel-Plan (Fallback: aus der Freitext-Gliederung)
+    ziel_wortzahl = kapitel.get("wortzahl")
+    if not ziel_wortzahl:
+        match = re.search(r'Wortzahl[:\s]*\[?(\d+)', kapitel_gliederung)
+        ziel_wortzahl = int(match.group(1)) if match else 3500
     
     log(f"\n   [Kapitel {nr}] Schreiben (Ziel: {ziel_wortzahl} Wörter)...")
+    set_status(kapitel=nr, detail=f"Kapitel {nr} schreiben")
     
-    # === 1. CHARAKTERE aus Gliederung extrahieren ===
+    # === 1. CHARAKTERE aus dem Story-Modell ===
     charakter_section = ""
-    if roman_gliederung:
-        # Hauptcharaktere
-        match = re.search(r'(##\s*2\.?\s*HAUPTCHARAKTERE.*?)(?=##\s*3\.?|$)', roman_gliederung, re.DOTALL | re.IGNORECASE)
-        if match:
-            charakter_section += match.group(1)[:2000] + "\n\n"
-        
-        # Nebencharaktere
-        match = re.search(r'(##\s*3\.?\s*NEBENCHARAKTERE.*?)(?=##\s*4\.?|##\s*DIE\s*7|$)', roman_gliederung, re.DOTALL | re.IGNORECASE)
-        if match:
-            charakter_section += match.group(1)[:2500]
-    
-    # === 2. Vorheriges Kapitel (letzte 2000 Wörter) ===
+    if story is None and roman_gliederung:
+        story = load_story_model(roman_gliederung, output_dir)
+    if story:
+        if story.hauptcharaktere:
+            charakter_section += story.hauptcharaktere[:2000] + "\n\n"
+        charakter_section += story.nebencharaktere[:2500]
+    
+    # === 2. Vorheriges Kapitel (Digest + kurzes Ende, Fallback: letzte 2000 Wörter) ===
     prev_kontext = ""
     if vorheriges_kapitel and nr > 1:
         worte = vorheriges_kapitel.split()
-        if len(worte) > 2000:
-            prev_kontext = " ".join(worte[-2000:])
+        tail = PREV_TAIL_WORDS if story_so_far else 2000
+        if len(worte) > tail:
+            prev_kontext = " ".join(worte[-tail:])
         else:
             prev_kontext = vorheriges_kapitel
     
     # === 3. Qdrant Kontext ===
-    qdrant_results = qdrant_search(f"Kapitel {nr} {titel}", limit=3)
+    qdrant_results = qdrant_search(f"Kapitel {nr} {titel}", limit=3, filters={"type": ["gliederung", "akt"]})
     qdrant_kontext = ""
     for ctx in qdrant_results:
-        if ctx.get("type") in ["gliederung", "akt"]:
-            qdrant_kontext += f"[{ctx.get('type')}]: {ctx.get('content', '')[:800]}\n\n"
+        qdrant_kontext += f"[{ctx.get('type')}]: {ctx.get('content', '')[:800]}\n\n"
     
     # === PROMPT AUFBAUEN ===
-    prompt = f"""{STIL}
+    kontext = f"""{STIL}
 
 ═══════════════════════════════════════════════════════════════
 CHARAKTERE (WICHTIG - Verhalten beachten!)
@@ -1139,15 +3862,28 @@ KAPITEL-GLIEDERUNG (folge EXAKT!)
 {kapitel_gliederung}
 
 ═══════════════════════════════════════════════════════════════
-VORHERIGES KAPITEL (letzte Passage - für Kontinuität)
+BISHERIGE HANDLUNG (Story so far - Kontinuität beachten!)
 ═══════════════════════════════════════════════════════════════
-{prev_kontext if prev_kontext else "[Erstes Kapitel]"}
+{story_so_far if story_so_far else "[Keine Zusammenfassung]"}
 
 ═══════════════════════════════════════════════════════════════
 ZUSÄTZLICHER KONTEXT (aus Qdrant)
 ═══════════════════════════════════════════════════════════════
 {qdrant_kontext if qdrant_kontext else "[Kein zusätzlicher Kontext]"}
-
+"""
+    vorheriges = f"""
+═══════════════════════════════════════════════════════════════
+VORHERIGES KAPITEL (letzte Passage - für Kontinuität)
+═══════════════════════════════════════════════════════════════
+{prev_kontext if prev_kontext else "[Erstes Kapitel]"}
+"""
+    
+    szenen = kapitel.get("szenen") or []
+    text = None
+    if SCENE_PARALLEL and len(szenen) >= 2:
+        text = szenen_schreiben(kontext, vorheriges, szenen, nr, titel, ziel_wortzahl)
+    if text is None:
+        text = call_claude(f"""{kontext}{vorheriges}
 ═══════════════════════════════════════════════════════════════
 AUFGABE: Schreibe KAPITEL {nr}: {titel}
 ═══════════════════════════════════════════════════════════════
@@ -1162,9 +3898,7 @@ REGELN:
 - Ende mit Hook oder emotionalem Beat
 - KEINE Meta-Kommentare, beginne DIREKT mit dem Text
 
-BEGINNE JETZT:"""
-
-    text = call_claude(prompt)
+BEGINNE JETZT:""")
     wortzahl = len(text.split())
     log(f"      ✓ Geschrieben: {wortzahl} Wörter")
     save_versioned(output_dir, f"kapitel_{nr:02d}.md", text, iteration=1)
@@ -1173,7 +3907,7 @@ BEGINNE JETZT:"""
     if wortzahl < ziel_wortzahl * 0.75:
         log(f"      ⚠️ Zu kurz ({wortzahl}/{ziel_wortzahl}) - reichere an...")
         
-        anreicherung = f"""{STIL}
+        auftrag = f"""{STIL}
 
 CHARAKTERE:
 {charakter_section[:1500] if charakter_section else ""}
@@ -1186,12 +3920,16 @@ NICHT aufblähen! Stattdessen BEREICHERN durch:
 - Tiefere emotionale Beats
 - Eine Komplikation
 
+Füge die neuen Passagen als Einfügungen an den passenden Stellen ein (insgesamt
+ca. {ziel_wortzahl - wortzahl} Wörter)."""
+        anreicherung = f"""{auftrag}
+
 AKTUELLER TEXT:
 {text}
 
 Gib den VOLLSTÄNDIGEN angereicherten Text aus:"""
 
-        text = call_claude(anreicherung)
+        text = claude_patch(text, auftrag, anreicherung, label="Anreicherung:")
         wortzahl = len(text.split())
         log(f"      ✓ Angereichert: {wortzahl} Wörter")
         save_versioned(output_dir, f"kapitel_{nr:02d}.md", text, iteration=2)
@@ -1199,52 +3937,348 @@ Gib den VOLLSTÄNDIGEN angereicherten Text aus:"""
     return text
 
 
+# ============================================================
+# PROSA-LINT (lokale, deterministische Vorprüfung für Polish)
+# ============================================================
+
+LINT_WINDOW = 50            # Wörter: gleiches Lemma zweimal darin = Wiederholung
+LINT_NAME_SHARE = 0.008     # häufiger als 0,8% aller Wörter: Name/Leitmotiv, nicht melden
+LINT_CLEAN_SCORE = float(os.environ.get("LINT_CLEAN_SCORE", "3.0"))  # Score-Punkte (siehe lint_score)
+
+FUELLWOERTER = set("""eigentlich irgendwie ziemlich wirklich einfach gerade eben halt mal wohl etwas
+sehr total quasi plötzlich langsam irgendwann scheinbar regelrecht förmlich""".split())
+ANGLIZISMEN = set("""okay ok cool sorry happy meeting feedback deadline style lifestyle darling""".split())
+# Hilfsverben, Pronomen, Partikeln: wiederholen sich in jeder Prosa, keine Wiederholungsbefunde
+FUNKTIONSWOERTER = set("""hatte hatten hattest habe wurde wurden worden werden würde würden konnte konnten
+könnte musste mussten sollte sollten wollte wollten durfte ihnen ihrem ihren ihres seinem seinen
+seines meinem meinen deinem deinen dann denn doch immer wieder einmal alles nichts etwas diese dieser
+dieses diesem diesen jetzt hier dort wenn weil ohne durch gegen einen einem einer eines ihnen ihrer
+selbst sagte fragte""".split())
+
+LINT_GEWICHT = {"wiederholung": 1.0, "phrase": 1.5, "fragmente": 2.0, "abgehackt": 2.0, "satzlaenge": 1.0,
+                "absatzlaenge": 1.0, "fuellwort": 0.5, "gedanken": 2.0, "anfuehrung": 1.0, "anglizismus": 1.0}
+# Toleranz pro 1000 Wörter: so viele Befunde hat auch lektorierte Prosa (Referenzpassagen, s. Doku)
+LINT_TOLERANZ = {"wiederholung": 15.0, "phrase": 1.0, "fragmente": 1.0, "satzlaenge": 1.0, "absatzlaenge": 1.0}
+LINT_REGEL_CAP = 10.0  # max. Score-Punkte pro Regel - eine Regel allein dominiert nicht
+
+
+def lint_score(befunde: List[dict], n_woerter: int) -> float:
+    """Σ Gewicht × min(Cap, Befunde pro 1000 Wörter - Toleranz) über alle Regeln"""
+    pro_regel = {}
+    for b in befunde:
+        pro_regel[b["regel"]] = pro_regel.get(b["regel"], 0) + 1
+    # Kurze Texte wie 500 Wörter behandeln, sonst macht ein Einzelbefund 20+ Punkte
+    skala = 1000 / max(n_woerter, 500)
+    return sum(LINT_GEWICHT[regel] * min(LINT_REGEL_CAP, max(0.0, anzahl * skala - LINT_TOLERANZ.get(regel, 0.0)))
+               for regel, anzahl in pro_regel.items())
+
+
+def _lemma(wort: str) -> str:
+    """Grobe Stammform (Kleinschreibung + häufige Flexionsendungen) - reicht für Wiederholungen"""
+    wort = wort.lower()
+    for endung in ("ern", "en", "er", "es", "em", "e", "n", "s"):
+        if len(wort) > len(endung) + 3 and wort.endswith(endung):
+            return wort[:-len(endung)]
+    return wort
+
+
+def lint_prose(text: str) -> dict:
+    """Mechanische Stil-Befunde eines Kapitels: {"befunde", "score", "sauber", "metriken"}
+    
+    Befunde: [{regel, absatz, detail}] mit 1-basierter Absatz-Nummer. Wiederholungen und
+    N-Gramme werden über Token-IDs mit NumPy gezählt (kein Python-Loop pro Wortpaar).
+    """
+    absaetze = split_paragraphs(text)
+    absatz_starts = np.array([offset for offset, _ in absaetze] or [0])
+    befunde = []
+    
+    def absatz_von(offset: int) -> int:
+        return int(np.searchsorted(absatz_starts, offset, side="right"))
+    
+    tokens = [(m.start(), m.group(0)) for m in re.finditer(r'[A-Za-zÄÖÜäöüß]+', text)]
+    n_woerter = max(len(tokens), 1)
+    
+    if tokens:
+        offsets = np.array([o for o, _ in tokens])
+        lemmata = [_lemma(w) for _, w in tokens]
+        vokabular = {}
+        ids = np.array([vokabular.setdefault(l, len(vokabular)) for l in lemmata], dtype=np.int64)
+        counts = np.bincount(ids)
+        
+        # Lemma-Wiederholungen im Fenster: nach (id, position) sortieren, Nachbarn vergleichen
+        funktion = {_lemma(w) for w in FUNKTIONSWOERTER}
+        relevant = np.array([len(l) > 3 and l not in STOPWORDS and l not in FUELLWOERTER and l not in funktion
+                             for l in vokabular])
+        relevant &= counts <= max(2, LINT_NAME_SHARE * n_woerter)
+        pos = np.arange(len(ids))
+        order = np.lexsort((pos, ids))
+        same = (ids[order][1:] == ids[order][:-1]) & (np.diff(pos[order]) < LINT_WINDOW)
+        hits = order[1:][same & relevant[ids[order][1:]]]
+        gemeldet = set()
+        for i in hits:
+            key = (ids[i], absatz_von(offsets[i]))
+            if key not in gemeldet:
+                gemeldet.add(key)
+                befunde.append({"regel": "wiederholung", "absatz": key[1],
+                                "detail": f"„{tokens[i][1]}“ mehrfach innerhalb von {LINT_WINDOW} Wörtern"})
+        
+        # Wiederkehrende Phrasen (3- und 4-Gramme, mindestens 3x im Kapitel)
+        worte = np.array([vokabular[l] for l in lemmata], dtype=np.int64)
+        stop = np.array([l in STOPWORDS for l in vokabular])[worte]
+        phrase_starts = []  # überlappende N-Gramme derselben Stelle nur einmal melden
+        for n in (4, 3):
+            if len(worte) < n:
+                continue
+            gramme = sum(worte[k:len(worte) - n + 1 + k] * (1_000_003 ** (n - 1 - k)) for k in range(n))
+            nur_stop = np.all([stop[k:len(stop) - n + 1 + k] for k in range(n)], axis=0)
+            werte, erste, anzahl = np.unique(gramme, return_index=True, return_counts=True)
+            for idx in np.where(anzahl >= 3)[0]:
+                start = erste[idx]
+                if nur_stop[start] or len(phrase_starts) >= 15 or any(abs(start - p) <= 4 for p in phrase_starts):
+                    continue
+                phrase_starts.append(start)
+                phrase = " ".join(w for _, w in tokens[start:start + n])
+                befunde.append({"regel": "phrase", "absatz": absatz_von(offsets[start]),
+                                "detail": f"„{phrase}“ {anzahl[idx]}x im Kapitel"})
+        
+        # Füllwörter (Dichte pro 1000 Wörter, Einzelwörter ab 3x)
+        fuell = [w.lower() for _, w in tokens if w.lower() in FUELLWOERTER]
+        for wort in sorted(set(fuell)):
+            if fuell.count(wort) >= 3:
+                befunde.append({"regel": "fuellwort", "absatz": 0, "detail": f"„{wort}“ {fuell.count(wort)}x"})
+        
+        for i, (o, w) in enumerate(tokens):
+            if w.lower() in ANGLIZISMEN:
+                befunde.append({"regel": "anglizismus", "absatz": absatz_von(o), "detail": f"„{w}“"})
+    
+    # Satz- und Absatzlängen
+    satz_laengen = []
+    einsatz_folge = 0
+    for nr, (_, absatz) in enumerate(absaetze, 1):
+        saetze = [s for s in re.split(r'(?<=[.!?…])\s+', absatz) if s.strip()]
+        laengen = [len(s.split()) for s in saetze]
+        satz_laengen += laengen
+        # Dialog und kursive Gedanken (STIL: kurz, direkt) zählen nicht als Fragment/abgehackt
+        dialog = absatz.lstrip().startswith(("„", '"', "‚", "»", "–", "-", "*"))
+        
+        if len(laengen) >= 3 and np.mean(laengen) < 5 and not dialog:
+            befunde.append({"regel": "fragmente", "absatz": nr, "detail": f"{len(laengen)} Sätze, Ø {np.mean(laengen):.1f} Wörter"})
+        for s, l in zip(saetze, laengen):
+            if l > 45:
+                befunde.append({"regel": "satzlaenge", "absatz": nr, "detail": f"Satz mit {l} Wörtern: „{s[:60]}…“"})
+        if sum(laengen) > 180:
+            befunde.append({"regel": "absatzlaenge", "absatz": nr, "detail": f"{sum(laengen)} Wörter am Stück"})
+        
+        einsatz_folge = einsatz_folge + 1 if len(laengen) == 1 and not dialog else 0
+        if einsatz_folge == 4:
+            befunde.append({"regel": "abgehackt", "absatz": nr - 3, "detail": "4+ Ein-Satz-Absätze in Folge"})
+        
+        # STIL: Gedanken direkt kursiv statt "sie dachte, dass"
+        for m in re.finditer(r'\b(?:sie|er) dachte,? dass\b|\bdachte sie\b', absatz, re.IGNORECASE):
+            befunde.append({"regel": "gedanken", "absatz": nr, "detail": f"„{m.group(0)}“ - Gedanken direkt kursiv (*...*)"})
+        # STIL: deutsche Anführungszeichen
+        if re.search(r'"|“(?=\w)', absatz):
+            befunde.append({"regel": "anfuehrung", "absatz": nr, "detail": "englische Anführungszeichen - „...“ verwenden"})
+    
+    laengen = np.array(satz_laengen or [0])
+    metriken = {
+        "woerter": n_woerter,
+        "saetze": len(satz_laengen),
+        "satz_mittel": round(float(laengen.mean()), 1),
+        "satz_std": round(float(laengen.std()), 1),
+        "anteil_kurz": round(float((laengen <= 3).mean()), 2),
+        "absaetze": len(absaetze),
+        "fuellwoerter_promille": round(1000 * sum(1 for _, w in tokens if w.lower() in FUELLWOERTER) / n_woerter, 1),
+    }
+    score = lint_score(befunde, n_woerter)
+    return {
+        "befunde": sorted(befunde, key=lambda b: b["absatz"]),
+        "score": round(score, 2),
+        "sauber": score < LINT_CLEAN_SCORE and not any(b["regel"] == "gedanken" for b in befunde),
+        "metriken": metriken,
+    }
+
+
+def format_lint(lint: dict, limit: int = 60) -> str:
+    """Lint-Befunde als Liste für Prompts (Absatz 0 = ganzes Kapitel)"""
+    zeilen = [f"- {'Absatz ' + str(b['absatz']) if b['absatz'] else 'Kapitel'} [{b['regel']}]: {b['detail']}"
+              for b in lint["befunde"][:limit]]
+    m = lint["metriken"]
+    zeilen.append(f"- Metriken: Ø Satz {m['satz_mittel']} Wörter (σ {m['satz_std']}), "
+                  f"{int(m['anteil_kurz'] * 100)}% Sätze ≤3 Wörter, Füllwörter {m['fuellwoerter_promille']}‰")
+    return "\n".join(zeilen)
+
+
 # ============================================================
 # PHASE 4: POLISH (Gemini Critique + Claude Fix)
 # ============================================================
 
-def phase4_polish(text: str, kapitel_nr: int, output_dir: Path) -> str:
-    """Kapitel polieren mit Gemini Critique"""
+POLISH_SECTION_WORDS = int(os.environ.get("POLISH_SECTION_WORDS", "1800"))  # darüber: abschnittsweise
+POLISH_WORKERS = int(os.environ.get("POLISH_WORKERS", "4"))
+POLISH_CONTEXT_WORDS = 150  # Überlappender Kontext an Abschnittsgrenzen
+
+
+def polish_abschnitte(text: str, max_words: int = POLISH_SECTION_WORDS, min_words: int = 400) -> List[str]:
+    """Kapitel an Szenenwechseln in Abschnitte teilen (lange Szenen zusätzlich an Absätzen)"""
+    cuts = [0]
+    words = 0
+    for offset, absatz in split_paragraphs(text):
+        n = len(absatz.split())
+        szenenwechsel = bool(SCENE_BREAK.match(absatz))
+        if offset > cuts[-1] and ((szenenwechsel and words >= min_words) or words + n > max_words):
+            cuts.append(offset)
+            words = 0
+        words += n
+    cuts.append(len(text))
+    abschnitte = [text[a:b].strip() for a, b in zip(cuts, cuts[1:])]
+    # Zu kurzen Rest an den vorherigen Abschnitt hängen
+    if len(abschnitte) > 1 and len(abschnitte[-1].split()) < min_words // 2:
+        abschnitte[-2:] = [abschnitte[-2] + "\n\n" + abschnitte[-1]]
+    return abschnitte
+
+
+def polish_text(text: str, label: str = "Polish:", vorher: str = "", nachher: str = "") -> str:
+    """Lint -> (Gemini-Kritik) -> Claude-Patches für einen Text (Kapitel oder Abschnitt)
     
-    log(f"   [Kapitel {kapitel_nr}] Polish...")
+    vorher / nachher: angrenzender Text als reiner Kontext (wird nicht überarbeitet).
+    """
+    # Lokaler Lint: mechanische Befunde ohne LLM
+    lint = lint_prose(text)
+    lint_info = format_lint(lint)
+    log(f"      🔎 {label} Lint {len(lint['befunde'])} Befunde, Score {lint['score']}"
+        f"{' (sauber)' if lint['sauber'] else ''}")
     
-    # Gemini kritisiert (statt GPT)
-    kritik = call_gemini(f"""{SELF_CRITIQUE_PROMPT}
+    if lint["sauber"]:
+        # Sauberer Text: Gemini-Kritik sparen, nur die Lint-Befunde umsetzen
+        if not lint["befunde"]:
+            return text
+        kritik = "MECHANISCHE BEFUNDE (lokaler Lint):\n" + lint_info
+    else:
+        # Gemini kritisiert nur noch, was der Lint nicht messen kann
+        kritik = call_gemini(f"""{SELF_CRITIQUE_PROMPT}
 
-Prüfe diesen Romantext auf:
-1. Wortwiederholungen
-2. Satzfragmente oder abgehackte Absätze
-3. Unnatürliche Dialoge
-4. Tempo-Probleme
-5. Fehlende Sinnesbeschreibungen
-6. Out-of-Character Momente
+Wortwiederholungen, Satzfragmente, Satz-/Absatzlängen und Füllwörter sind bereits lokal
+geprüft (siehe unten) - NICHT wiederholen. Prüfe diesen Romantext auf:
+1. Unnatürliche Dialoge
+2. Tempo-Probleme
+3. Fehlende Sinnesbeschreibungen
+4. Out-of-Character Momente
+
+BEREITS GEFUNDEN (Lint):
+{lint_info}
 
 TEXT:
-{text[:12000]}
+{text}
 
 KONKRETE Verbesserungen (Liste):""", max_tokens=4000, use_flash=True)
+        kritik = f"MECHANISCHE BEFUNDE (lokaler Lint):\n{lint_info}\n\nLEKTORAT:\n{kritik}"
+    
+    kontext = ""
+    if vorher or nachher:
+        kontext = f"""
+DAVOR (nur Kontext, NICHT ändern):
+{" ".join(vorher.split()[-POLISH_CONTEXT_WORDS:]) if vorher else "[Kapitelanfang]"}
+
+DANACH (nur Kontext, NICHT ändern):
+{" ".join(nachher.split()[:POLISH_CONTEXT_WORDS]) if nachher else "[Kapitelende]"}
+"""
     
-    # Claude überarbeitet
-    polished = call_claude(f"""Du erhältst einen Roman-Text und Feedback dazu.
+    # Claude überarbeitet (Patches, Fallback: vollständige Neufassung)
+    polished = claude_patch(text, f"""Du erhältst einen Roman-Text und Feedback dazu.
 
 STIL-REGELN:
 {STIL}
 
 FEEDBACK:
 {kritik}
+{kontext}
+AUFGABE: Setze das Feedback an den betroffenen Stellen um.""", f"""Du erhältst einen Roman-Text und Feedback dazu.
 
+STIL-REGELN:
+{STIL}
+
+FEEDBACK:
+{kritik}
+{kontext}
 ORIGINALTEXT:
 {text}
 
 AUFGABE: Setze das Feedback um. Gib den VOLLSTÄNDIGEN überarbeiteten Text aus.
-Beginne DIREKT mit dem ersten Satz des Kapitels:""")
+Beginne DIREKT mit dem ersten Satz des Textes:""", label=label)
+    
+    return polished if len(polished.split()) > len(text.split()) * 0.5 else text
+
+
+def naht_check(abschnitte: List[str], kapitel_nr: int) -> str:
+    """Übergänge zwischen einzeln polierten Abschnitten prüfen -> Probleme ("" wenn alle OK)"""
+    naehte = "\n\n".join(
+        f"NAHT {i}:\n...{' '.join(a.split()[-POLISH_CONTEXT_WORDS:])}\n|||\n{' '.join(b.split()[:POLISH_CONTEXT_WORDS])}..."
+        for i, (a, b) in enumerate(zip(abschnitte, abschnitte[1:]), 1))
+    check = call_gemini(f"""Die Abschnitte von Kapitel {kapitel_nr} wurden getrennt überarbeitet.
+Prüfe jede Naht (||| markiert die Grenze) auf: doppelte oder fehlende Sätze, Brüche in
+Stimmung, Zeit oder Ort, Wiederholungen über die Grenze hinweg.
+
+{naehte}
+
+Antworte "OK" wenn alle Nähte passen, sonst liste die KONKRETEN Probleme pro Naht.""",
+                        max_tokens=2000, use_flash=True)
+    return "" if "OK" in check.upper() and len(check) < 100 else check
+
+
+def phase4_polish(text: str, kapitel_nr: int, output_dir: Path) -> str:
+    """Kapitel polieren: lokaler Lint, Gemini Critique nur wenn der Lint nicht sauber ist
+    
+    Kapitel über POLISH_SECTION_WORDS werden an Szenenwechseln geteilt, die Abschnitte
+    parallel poliert (mit überlappendem Kontext) und danach die Nähte geprüft.
+    """
+    
+    if skip_requested():
+        log(f"   [Kapitel {kapitel_nr}] ⏭️ Polish übersprungen (/skip)")
+        return text
+    
+    log(f"   [Kapitel {kapitel_nr}] Polish...")
+    set_status(detail=f"Kapitel {kapitel_nr} polieren")
+    
+    abschnitte = polish_abschnitte(text) if len(text.split()) > POLISH_SECTION_WORDS else [text]
+    
+    if len(abschnitte) == 1:
+        polished = polish_text(text)
+    else:
+        log(f"      {len(abschnitte)} Abschnitte, {POLISH_WORKERS} parallel")
+        with ThreadPoolExecutor(max_workers=POLISH_WORKERS, thread_name_prefix="polish") as executor:
+            futures = [executor.submit(polish_text, abschnitt, f"Abschnitt {i + 1}:",
+                                       abschnitte[i - 1] if i > 0 else "",
+                                       abschnitte[i + 1] if i + 1 < len(abschnitte) else "")
+                       for i, abschnitt in enumerate(abschnitte)]
+            poliert = [f.result() for f in futures]
+        polished = "\n\n".join(poliert)
+        
+        # Naht-Check: nur bei Problemen ein Patch-Call über das ganze Kapitel
+        if poliert != abschnitte:
+            probleme = naht_check(poliert, kapitel_nr)
+            if probleme:
+                log(f"      ⚠️ Nähte mit Problemen - glätte Übergänge...")
+                polished = claude_patch(polished, f"""Dieses Kapitel wurde abschnittsweise überarbeitet. An den
+Abschnittsgrenzen gibt es diese Probleme:
+
+{probleme}
+
+AUFGABE: Glätte NUR diese Übergänge. {STIL}""", f"""Dieses Kapitel wurde abschnittsweise überarbeitet. An den
+Abschnittsgrenzen gibt es diese Probleme:
+
+{probleme}
+
+KAPITEL:
+{polished}
+
+Glätte NUR diese Übergänge, alles andere bleibt. Gib das VOLLSTÄNDIGE Kapitel aus:""", label="Nähte:")
     
-    if len(polished.split()) > len(text.split()) * 0.5:
+    if polished != text:
         log(f"      ✓ Poliert ({len(polished.split())} Wörter)")
         save_versioned(output_dir, f"kapitel_{kapitel_nr:02d}.md", polished, iteration=3)
         return polished
     else:
-        log(f"      ⚠️ Polish fehlgeschlagen, behalte Original")
+        log(f"      ✓ Keine Änderungen - behalte Original")
         return text
 
 
@@ -1252,22 +4286,45 @@ Beginne DIREKT mit dem ersten Satz des Kapitels:""")
 # PHASE 5: FLOW-CHECK
 # ============================================================
 
-def phase5_flow_check(chapters: list, output_dir: Path) -> list:
-    """Prüft und korrigiert Übergänge zwischen Kapiteln"""
+def phase5_flow_check(chapters: list, output_dir: Path, bible: StoryBible = None) -> list:
+    """Prüft und korrigiert Übergänge zwischen Kapiteln
+    
+    Mit Story-Bible: Übergänge ohne Konflikt-Kandidaten im Ledger gelten als OK,
+    das LLM prüft nur Kapitel mit gemeldeten Konflikten.
+    """
     
     log(f"\n{'='*60}")
     log("PHASE 5: FLOW-CHECK (Kapitel-Übergänge)")
     log(f"{'='*60}")
+    set_status(phase="Phase 5: Flow-Check", detail="")
     
     telegram_send("🔄 *Phase 5 gestartet*: Flow-Check")
     
+    konflikte = []
+    if bible:
+        bible.wait()
+        konflikte = bible.konflikte()
+        log(f"   📒 Story-Bible: {len(konflikte)} Konflikt-Kandidaten")
+    
     corrected = [chapters[0]]
     
     for i in range(1, len(chapters)):
         prev = corrected[i-1]
         curr = chapters[i]
         
+        if skip_requested():
+            log(f"\n   ⏭️ Übergang {i} → {i+1} übersprungen (/skip)")
+            corrected.append(curr)
+            continue
+        
+        kapitel_konflikte = [k for k in konflikte if k["kapitel"] == i + 1]
+        if bible and i in bible.kapitel and i + 1 in bible.kapitel and not kapitel_konflikte:
+            log(f"\n   Übergang {i} → {i+1}: ✅ OK (Story-Bible ohne Konflikte)")
+            corrected.append(curr)
+            continue
+        
         log(f"\n   Prüfe Übergang {i} → {i+1}...")
+        set_status(detail=f"Übergang {i} → {i+1}")
         
         # Relevante Teile extrahieren
         prev_words = prev.split()
@@ -1275,12 +4332,18 @@ def phase5_flow_check(chapters: list, output_dir: Path) -> list:
         prev_end = ' '.join(prev_words[-(len(prev_words)//3):])
         curr_start = ' '.join(curr_words[:len(curr_words)//3])
         
-        # Qdrant: Relevanten Kontext für diese Kapitel holen
-        qdrant_context = qdrant_search(f"Kapitel {i} Kapitel {i+1} Übergang Charaktere", limit=3)
+        # Qdrant: Kapitel-Gliederungen beider Kapitel direkt per ID, dazu passende Planungs-Texte
+        qdrant_context = qdrant_get([
+            {"type": "kapitel_gliederung", "kapitel": i},
+            {"type": "kapitel_gliederung", "kapitel": i + 1}
+        ], consistent=True)
+        qdrant_context += qdrant_search(f"Kapitel {i} Kapitel {i+1} Übergang Charaktere", limit=2,
+                                        filters={"type": ["gliederung", "akt"]})
         kontext_info = ""
         for ctx in qdrant_context:
-            if ctx.get("type") in ["gliederung", "akt", "kapitel_gliederung"]:
-                kontext_info += f"[{ctx.get('type')}]: {ctx.get('content', '')[:500]}\n\n"
+            kontext_info += f"[{ctx.get('type')}]: {ctx.get('content', '')[:500]}\n\n"
+        
+        konflikt_info = StoryBible.format_konflikte(kapitel_konflikte)
         
         check = call_gemini(f"""Prüfe den Übergang zwischen zwei Kapiteln:
 
@@ -1289,6 +4352,11 @@ KONTEXT AUS QDRANT (Charaktere, Gliederung)
 ═══════════════════════════════════════════════════════════════
 {kontext_info if kontext_info else "[Kein Kontext verfügbar]"}
 
+═══════════════════════════════════════════════════════════════
+GEMELDETE KONFLIKTE (Story-Bible - prüfe, ob sie im Text echt sind)
+═══════════════════════════════════════════════════════════════
+{konflikt_info if konflikt_info else "[Keine]"}
+
 ═══════════════════════════════════════════════════════════════
 ENDE KAPITEL {i}:
 ═══════════════════════════════════════════════════════════════
@@ -1313,10 +4381,23 @@ Antworte:
         if "OK" in check.upper() and len(check) < 100:
             log(f"      ✅ OK")
             corrected.append(curr)
+            if bible and kapitel_konflikte:
+                bible.als_geprueft(kapitel_konflikte)
         else:
             log(f"      ⚠️ Probleme - korrigiere...")
             
-            fixed = call_claude(f"""Der Übergang zwischen Kapiteln hat Probleme:
+            fixed = claude_patch(curr, f"""Der Übergang zwischen Kapiteln hat Probleme:
+
+PROBLEME:
+{check}
+
+ENDE KAPITEL {i}:
+{prev_end}
+
+AUFGABE: Überarbeite Kapitel {i+1} (unten) so dass es nahtlos anschließt.
+Behebe die Probleme, behalte den Rest.
+
+{STIL}""", f"""Der Übergang zwischen Kapiteln hat Probleme:
 
 PROBLEME:
 {check}
@@ -1332,12 +4413,15 @@ Behebe die Probleme, behalte den Rest.
 
 {STIL}
 
-VOLLSTÄNDIG KORRIGIERTES KAPITEL:""")
+VOLLSTÄNDIG KORRIGIERTES KAPITEL:""", label=f"Kapitel {i+1}:")
             
-            if len(fixed.split()) > len(curr.split()) * 0.5:
+            if fixed != curr and len(fixed.split()) > len(curr.split()) * 0.5:
                 corrected.append(fixed)
                 save_versioned(output_dir, f"kapitel_{i+1:02d}.md", fixed, iteration=4)
                 log(f"      ✓ Korrigiert")
+                if bible:
+                    bible.submit(i + 1, fixed, force=True)  # Ledger auf die neue Fassung bringen
+                qdrant_store_kapitel(i + 1, fixed)
             else:
                 corrected.append(curr)
     
@@ -1349,45 +4433,162 @@ VOLLSTÄNDIG KORRIGIERTES KAPITEL:""")
 # PHASE 6: GESAMT-CHECK
 # ============================================================
 
-def phase6_check(full_novel: str, output_dir: Path) -> str:
-    """Gesamt-Qualitätsprüfung"""
+PHASE6_CHUNK_WORDS = 15000  # Wörter pro Review-Chunk (ganze Kapitel)
+PHASE6_WORKERS = int(os.environ.get("PHASE6_WORKERS", "8"))  # Obergrenze, sonst ein Worker pro Chunk
+
+BEFUNDE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "befunde": {"type": "ARRAY", "items": {
+            "type": "OBJECT",
+            "properties": {
+                "kapitel": {"type": "INTEGER"},
+                "absatz": {"type": "INTEGER"},
+                "kategorie": {"type": "STRING", "enum": ["charakter", "plot", "romance", "suspense",
+                                                         "pacing", "kontinuitaet", "stil"]},
+                "schwere": {"type": "INTEGER"},
+                "problem": _STR,
+                "vorschlag": _STR,
+            },
+            "required": ["kapitel", "absatz", "kategorie", "schwere", "problem"],
+        }},
+        "zusammenfassung": _STR,
+    },
+    "required": ["befunde", "zusammenfassung"],
+}
+
+
+def review_chunks(chapters: list, max_words: int = PHASE6_CHUNK_WORDS) -> List[List[int]]:
+    """Kapitel-Nummern zu Chunks bündeln (Kapitel werden nie geteilt)"""
+    chunks, current, words = [], [], 0
+    for nr, chapter in enumerate(chapters, 1):
+        n = len(chapter.split())
+        if current and words + n > max_words:
+            chunks.append(current)
+            current, words = [], 0
+        current.append(nr)
+        words += n
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def nummerierte_absaetze(kapitel_nr: int, text: str) -> str:
+    """Kapitel mit Fundstellen-Markern [K{n} ¶{m}] pro Absatz"""
+    return "\n\n".join(f"[K{kapitel_nr} ¶{i}] {absatz}" for i, (_, absatz) in enumerate(split_paragraphs(text), 1))
+
+
+def kapitel_uebersicht(output_dir: Path) -> str:
+    """Kapitel-Zusammenfassungen aus Phase 3 als globaler Kontext für Reviews"""
+    zusammenfassungen = (load_json(output_dir / "zusammenfassungen.json") or {}).get("kapitel", {})
+    return "\n".join(f"Kapitel {nr}: {text}" for nr, text in
+                     sorted(zusammenfassungen.items(), key=lambda x: int(x[0])))
+
+
+def review_kapitel(chapters: list, kapitel_nrs: List[int], uebersicht: str) -> Optional[dict]:
+    """Ein Review-Chunk (Map-Schritt): Befunde mit Kapitel + Absatz als JSON"""
+    text = "\n\n".join(f"# KAPITEL {nr}\n\n{nummerierte_absaetze(nr, chapters[nr - 1])}" for nr in kapitel_nrs)
+    return call_gemini_json(f"""Du prüfst einen Abschnitt (Kapitel {kapitel_nrs[0]}-{kapitel_nrs[-1]} von {len(chapters)}) eines Liebesromans.
+
+HANDLUNG DES GANZEN ROMANS (Kapitel-Zusammenfassungen):
+{uebersicht if uebersicht else "[Keine Zusammenfassungen]"}
+
+Prüfe NUR diesen Abschnitt auf:
+- charakter: Namen, Eigenschaften, Wissen der Figuren, Verhaltensbrüche
+- plot: Logikfehler, Plot-Löcher, vergessene Handlungsstränge
+- romance: Enemies-to-Lovers glaubwürdig, Spannung, verdientes HEA
+- suspense: Eskalation, Präsenz des Antagonisten, Finale
+- pacing: Durchhänger, zu schnelle Stellen
+- kontinuitaet: Widersprüche zu früheren Kapiteln (siehe Zusammenfassungen)
+- stil: nur gravierende Stilprobleme
+
+Jeder Befund mit exakter Fundstelle: kapitel + absatz aus den Markern [K{{n}} ¶{{m}}].
+schwere: 1 = kosmetisch, 2 = spürbar, 3 = muss behoben werden.
+zusammenfassung: Stand von Romance- und Suspense-Arc in diesem Abschnitt (3-5 Sätze).
+
+ABSCHNITT:
+{text}""", BEFUNDE_SCHEMA, max_tokens=8000, use_flash=True)
+
+
+def review_parallel(chapters: list, chunks: List[List[int]], output_dir: Path) -> tuple:
+    """Map-Schritt über mehrere Chunks parallel -> (Befunde sortiert, Arc-Stand pro Chunk)"""
+    uebersicht = kapitel_uebersicht(output_dir)
+    
+    ergebnisse = [None] * len(chunks)
+    with ThreadPoolExecutor(max_workers=max(1, min(len(chunks), PHASE6_WORKERS)), thread_name_prefix="review") as executor:
+        futures = {executor.submit(review_kapitel, chapters, chunk, uebersicht): i for i, chunk in enumerate(chunks)}
+        for done, future in enumerate(as_completed(futures), 1):
+            ergebnisse[futures[future]] = future.result()
+            set_status(detail=f"Review {done}/{len(chunks)}")
+    
+    befunde = []
+    chunk_info = []
+    for chunk, ergebnis in zip(chunks, ergebnisse):
+        if ergebnis is None:
+            log(f"   ⚠️ Review Kapitel {chunk[0]}-{chunk[-1]} fehlgeschlagen")
+            chunk_info.append(f"Kapitel {chunk[0]}-{chunk[-1]}: [Review fehlgeschlagen]")
+            continue
+        # Nur Fundstellen innerhalb des Chunks zulassen
+        befunde += [b for b in ergebnis["befunde"] if b["kapitel"] in chunk]
+        chunk_info.append(f"Kapitel {chunk[0]}-{chunk[-1]}: {ergebnis['zusammenfassung']}")
+    befunde.sort(key=lambda b: (b["kapitel"], b["absatz"]))
+    return befunde, chunk_info
+
+
+def phase6_check(chapters: list, output_dir: Path, bible: StoryBible = None) -> str:
+    """Gesamt-Qualitätsprüfung als Map-Reduce über den ganzen Roman
+    
+    Map: kapitelgenaue Chunks parallel auf Gemini Flash, Befunde als JSON mit Kapitel + Absatz.
+    Reduce: ein Call fasst alle Befunde + Chunk-Zusammenfassungen zum Bericht zusammen.
+    bible: offene Konflikte aus dem Fakten-Ledger mitgeben.
+    """
     
     log(f"\n{'='*60}")
     log("PHASE 6: GESAMT-CHECK")
     log(f"{'='*60}")
+    set_status(phase="Phase 6: Gesamt-Check", detail="")
     
     telegram_send("🔍 *Phase 6 gestartet*: Qualitäts-Check")
     
-    report = call_gemini(f"""Prüfe diesen Roman auf:
+    konflikt_info = ""
+    if bible:
+        bible.wait()
+        konflikt_info = StoryBible.format_konflikte(bible.konflikte())
+    
+    chunks = review_chunks(chapters)
+    log(f"   {len(chapters)} Kapitel in {len(chunks)} Chunks, {min(len(chunks), PHASE6_WORKERS)} parallel")
+    befunde, chunk_info = review_parallel(chapters, chunks, output_dir)
+    
+    (output_dir / "06_qualitaets_befunde.json").write_text(
+        json.dumps(befunde, ensure_ascii=False, indent=1), encoding="utf-8")
+    log(f"   ✓ {len(befunde)} Befunde ({sum(1 for b in befunde if b['schwere'] >= 3)} schwer)")
+    
+    # REDUCE: ein Bericht über den ganzen Roman
+    befund_liste = "\n".join(f"- K{b['kapitel']} ¶{b['absatz']} [{b['kategorie']}, Schwere {b['schwere']}]: "
+                             f"{b['problem']}" + (f" → {b['vorschlag']}" if b.get('vorschlag') else "")
+                             for b in befunde)
+    report = call_gemini(f"""Erstelle aus den Teil-Reviews EINEN Qualitäts-Bericht für den gesamten Roman.
 
+Gliederung:
 1. CHARAKTERKONSISTENZ
-   - Namen korrekt?
-   - Eigenschaften konsistent?
-   - Wissen der Figuren logisch?
-
 2. PLOT-LÖCHER
-   - Unbeantwortete Fragen?
-   - Logikfehler?
-   - Vergessene Handlungsstränge?
+3. ROMANCE-ARC (über alle Abschnitte: glaubwürdig? HEA earned?)
+4. SUSPENSE-ARC (Eskalation in 3 Stufen? Finale befriedigend?)
+5. PACING
+6. TOP-PRIORITÄTEN (was zuerst beheben)
 
-3. ROMANCE-ARC
-   - Enemies-to-Lovers glaubwürdig?
-   - Spannung aufgebaut?
-   - HEA earned?
+Fasse Duplikate zusammen, behalte die Fundstellen exakt bei (Kapitel N, Absatz M).
 
-4. SUSPENSE-ARC
-   - Eskalation sichtbar (3 Stufen)?
-   - Antagonist präsent?
-   - Finale befriedigend?
+ARC-STAND PRO ABSCHNITT:
+{chr(10).join(chunk_info)}
 
-5. PACING
-   - Durchhänger?
-   - Zu schnelle Stellen?
+BEFUNDE ({len(befunde)}):
+{befund_liste if befund_liste else "[Keine]"}
 
-ROMAN (Auszug - ca. 50.000 Zeichen):
-{full_novel[:50000]}
+BEKANNTE KONTINUITÄTS-KONFLIKTE (Story-Bible, ungeprüft - bestätigen oder verwerfen):
+{konflikt_info if konflikt_info else "[Keine]"}
 
-DETAILLIERTER BERICHT mit konkreten Fundstellen:""", max_tokens=8000, use_flash=True)
+BERICHT:""", max_tokens=8000, use_flash=True)
     
     save_versioned(output_dir, "06_qualitaets_report.md", report)
     
@@ -1397,13 +4598,141 @@ DETAILLIERTER BERICHT mit konkreten Fundstellen:""", max_tokens=8000, use_flash=
     return report
 
 
+# ============================================================
+# PHASE 6.5: FIX (Befunde aus Phase 6 gezielt beheben)
+# ============================================================
+
+FIX_MIN_SCHWERE = int(os.environ.get("FIX_MIN_SCHWERE", "2"))  # Befunde ab dieser Schwere beheben
+FIX_ROUNDS = 2  # Fix + Re-Check Runden
+
+
+def befunde_aus_report(report: str) -> List[dict]:
+    """Fallback ohne 06_qualitaets_befunde.json: Bericht per JSON-Call in Befunde übersetzen"""
+    ergebnis = call_gemini_json(f"""Übersetze diesen Qualitäts-Bericht in einzelne Befunde.
+Ein Befund pro konkretem Problem mit Kapitel-Nummer (absatz = 0 wenn nicht angegeben).
+zusammenfassung: leer lassen.
+
+BERICHT:
+{report}""", BEFUNDE_SCHEMA, max_tokens=8000, use_flash=True)
+    return ergebnis["befunde"] if ergebnis else []
+
+
+def fix_kapitel(nr: int, text: str, befunde: List[dict], prev_text: str = "", next_text: str = "") -> str:
+    """Ein Kapitel gezielt nach Befunden überarbeiten (Claude) - Original bei Fehlschlag"""
+    probleme = "\n".join(f"- Absatz {b['absatz']} [{b['kategorie']}, Schwere {b['schwere']}]: {b['problem']}"
+                         + (f" → Vorschlag: {b['vorschlag']}" if b.get("vorschlag") else "") for b in befunde)
+    absaetze = "\n\n".join(f"[¶{i}] {absatz}" for i, (_, absatz) in enumerate(split_paragraphs(text), 1))
+    
+    kontext = f"""Ein Qualitäts-Review hat in Kapitel {nr} diese Probleme gefunden:
+
+{probleme}
+
+ENDE VORHERIGES KAPITEL (nur Kontext):
+{" ".join(prev_text.split()[-300:]) if prev_text else "[Erstes Kapitel]"}
+
+ANFANG NÄCHSTES KAPITEL (nur Kontext):
+{" ".join(next_text.split()[:300]) if next_text else "[Letztes Kapitel]"}
+
+AUFGABE: Behebe GENAU diese Probleme an den genannten Stellen von Kapitel {nr} (Absätze
+nummeriert). Alles andere bleibt wörtlich erhalten. Der Anschluss an die Nachbarkapitel muss stimmen.
+
+{STIL}"""
+    
+    fixed = claude_patch(text, kontext, f"""{kontext}
+
+KAPITEL {nr} (Absätze nummeriert):
+{absaetze}
+
+Gib das VOLLSTÄNDIGE korrigierte Kapitel OHNE Absatz-Marker aus:""", label=f"Kapitel {nr}:", text_im_prompt=absaetze)
+    
+    return fixed if fixed == text else PATCH_MARKER.sub('', fixed).strip()
+
+
+def phase6_5_fix(chapters: list, output_dir: Path, bible: StoryBible = None) -> list:
+    """Befunde aus Phase 6 pro Kapitel parallel beheben, dann nur geänderte Kapitel + Nachbarn neu prüfen"""
+    
+    log(f"\n{'='*60}")
+    log("PHASE 6.5: FIX")
+    log(f"{'='*60}")
+    set_status(phase="Phase 6.5: Fix", detail="")
+    
+    befunde = load_json(output_dir / "06_qualitaets_befunde.json")
+    if befunde is None:
+        report_path = output_dir / "06_qualitaets_report.md"
+        befunde = befunde_aus_report(report_path.read_text(encoding="utf-8")) if report_path.exists() else []
+    zu_beheben = befunde
+    
+    chapters = list(chapters)
+    for runde in range(1, FIX_ROUNDS + 1):
+        if skip_requested():
+            log(f"   ⏭️ Fix übersprungen (/skip)")
+            break
+        
+        pro_kapitel = {}
+        for b in zu_beheben:
+            if b["schwere"] >= FIX_MIN_SCHWERE and 1 <= b["kapitel"] <= len(chapters):
+                pro_kapitel.setdefault(b["kapitel"], []).append(b)
+        if not pro_kapitel:
+            log(f"   ✅ Keine Befunde ab Schwere {FIX_MIN_SCHWERE}")
+            break
+        
+        log(f"   [Runde {runde}] Korrigiere {len(pro_kapitel)} Kapitel: {sorted(pro_kapitel)}")
+        telegram_send(f"🔧 *Phase 6.5*: Korrigiere {len(pro_kapitel)} Kapitel (Runde {runde})")
+        
+        # Fixes parallel (jedes Kapitel sieht die Nachbarn im Stand vor der Runde)
+        with ThreadPoolExecutor(max_workers=min(len(pro_kapitel), PHASE6_WORKERS), thread_name_prefix="fix") as executor:
+            futures = {executor.submit(fix_kapitel, nr, chapters[nr - 1], kapitel_befunde,
+                                       chapters[nr - 2] if nr > 1 else "",
+                                       chapters[nr] if nr < len(chapters) else ""): nr
+                       for nr, kapitel_befunde in pro_kapitel.items()}
+            geaendert = []
+            for future in as_completed(futures):
+                nr = futures[future]
+                fixed = future.result()
+                if fixed != chapters[nr - 1]:
+                    chapters[nr - 1] = fixed
+                    geaendert.append(nr)
+                    save_versioned(output_dir, f"kapitel_{nr:02d}.md", fixed, iteration=4 + runde)
+                    if bible:
+                        bible.submit(nr, fixed, force=True)
+                    qdrant_store_kapitel(nr, fixed)
+        
+        if not geaendert:
+            break
+        log(f"      ✓ Geändert: {sorted(geaendert)}")
+        
+        # Re-Check nur für geänderte Kapitel + Nachbarn
+        pruefen = sorted({n for nr in geaendert for n in (nr - 1, nr, nr + 1) if 1 <= n <= len(chapters)})
+        chunks = []
+        for nr in pruefen:
+            if chunks and chunks[-1][-1] == nr - 1 and len(chunks[-1]) < 3:
+                chunks[-1].append(nr)
+            else:
+                chunks.append([nr])
+        log(f"      Re-Check Kapitel {pruefen} ({len(chunks)} Chunks)")
+        neue_befunde, _ = review_parallel(chapters, chunks, output_dir)
+        
+        befunde = sorted([b for b in befunde if b["kapitel"] not in pruefen] + neue_befunde,
+                         key=lambda b: (b["kapitel"], b["absatz"]))
+        (output_dir / "06_qualitaets_befunde.json").write_text(
+            json.dumps(befunde, ensure_ascii=False, indent=1), encoding="utf-8")
+        
+        # Nächste Runde nur mit den Befunden des Re-Checks
+        zu_beheben = neue_befunde
+        log(f"      {sum(1 for b in neue_befunde if b['schwere'] >= FIX_MIN_SCHWERE)} "
+            f"Befunde ab Schwere {FIX_MIN_SCHWERE} nach Runde {runde}")
+    
+    log(f"\n✓ Phase 6.5 abgeschlossen!")
+    return chapters
+
+
 # ============================================================
 # MAIN PIPELINE
 # ============================================================
 
-def run_pipeline(setting: str, output_dir: str = None):
-    """Hauptfunktion"""
-    global LOG_FILE
+def run_pipeline(setting: str, output_dir: str = None, resume: bool = False):
+    """Hauptfunktion (resume=True setzt am checkpoint.json in output_dir an)"""
+    global LOG_FILE, RUN_ID
     
     start = datetime.now()
     
@@ -1416,85 +4745,161 @@ def run_pipeline(setting: str, output_dir: str = None):
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
+    checkpoint = load_checkpoint(output_path) if resume else {}
+    setting = checkpoint.get("setting", setting)
+    
     LOG_FILE = output_path / "pipeline.log"
     
+    # Run-Namespace für Qdrant (bleibt beim Resume gleich)
+    RUN_ID = output_path.name
+    
     log(f"\n{'#'*60}")
     log(f"# NOVEL PIPELINE V4")
     log(f"# Setting: {setting}")
     log(f"# Output: {output_dir}")
     log(f"# Start: {start}")
+    if checkpoint:
+        log(f"# Resume: Checkpoint vom {checkpoint.get('updated', '?')}")
     log(f"{'#'*60}")
     
-    # Qdrant initialisieren
-    qdrant_init_collection()
-    
-    telegram_send(f"🚀 *Pipeline V4 gestartet*\n\n📖 {setting}\n📁 {output_dir}")
-    
-    # Phase 1: Grob-Gliederung
-    gliederung = phase1_gliederung(setting, output_path)
-    
-    # Phase 2: Akt-Gliederungen
-    akte = phase2_akte(gliederung, output_path)
+    set_status(setting=setting, output_dir=output_dir, start=start, phase="Start",
+               detail="", paused=False, cancel=False, skip=False)
+    save_checkpoint(output_path, setting=setting)
     
-    # Phase 2.5: Kapitel-Gliederungen
-    kapitel_liste = phase2_5_kapitel(gliederung, akte, output_path)
+    # Qdrant initialisieren (Fallback: lokaler Index im Output-Verzeichnis)
+    qdrant_init_collection(local_dir=output_path)
     
-    # Phase 3 & 4: Schreiben + Polish
-    log(f"\n{'='*60}")
-    log("PHASE 3 & 4: SCHREIBEN + POLISH")
-    log(f"{'='*60}")
-    
-    telegram_send(f"✍️ *Phase 3 & 4 gestartet*: Schreiben ({len(kapitel_liste)} Kapitel)")
-    
-    all_chapters = []
-    vorheriges = None
+    # Steuerbefehle (/status, /pause, ...) ab jetzt annehmen
+    telegram_start_listener()
+    telegram_send(f"🚀 *Pipeline V4 gestartet*\n\n📖 {setting}\n📁 {output_dir}\n\n/help für Befehle")
     
-    for kap in kapitel_liste:
-        # Akt-Gliederung für dieses Kapitel bestimmen
-        kap_akt = kap.get("akt", 1)
-        akt_gliederung = akte.get(f"akt_{kap_akt}", "")
+    try:
+        # Phase 1: Grob-Gliederung
+        gliederung = checkpoint.get("gliederung")
+        if gliederung:
+            log("\n   ↪️ Phase 1 aus Checkpoint")
+        else:
+            gliederung = phase1_gliederung(setting, output_path)
+            save_checkpoint(output_path, gliederung=gliederung)
         
-        text = phase3_schreiben(
-            kapitel=kap, 
-            vorheriges_kapitel=vorheriges, 
-            output_dir=output_path,
-            roman_gliederung=gliederung,
-            akt_gliederung=akt_gliederung
-        )
-        polished = phase4_polish(text, kap["nummer"], output_path)
+        # Story-Modell (Titel, Figuren, Phasen) - beim Resume aus 01_gliederung.json
+        story = load_story_model(gliederung, output_path)
+        
+        # Phase 2: Akt-Gliederungen
+        akte = checkpoint.get("akte")
+        if akte:
+            log("   ↪️ Phase 2 aus Checkpoint")
+        else:
+            akte = phase2_akte(gliederung, output_path)
+            save_checkpoint(output_path, akte=akte)
         
-        all_chapters.append(polished)
-        vorheriges = polished
+        # Phase 2.5: Kapitel-Gliederungen
+        kapitel_liste = checkpoint.get("kapitel_liste")
+        if kapitel_liste:
+            log("   ↪️ Phase 2.5 aus Checkpoint")
+        else:
+            kapitel_liste = phase2_5_kapitel(gliederung, akte, output_path, story=story)
+            save_checkpoint(output_path, kapitel_liste=kapitel_liste)
         
-        save_versioned(output_path, f"kapitel_{kap['nummer']:02d}.md", polished)
+        # Phase 3 & 4: Schreiben + Polish
+        log(f"\n{'='*60}")
+        log("PHASE 3 & 4: SCHREIBEN + POLISH")
+        log(f"{'='*60}")
+        set_status(phase="Phase 3 & 4: Schreiben + Polish", kapitel_gesamt=len(kapitel_liste))
         
-        # In Qdrant speichern
-        qdrant_store(polished, {
-            "type": "kapitel_text",
-            "kapitel": kap["nummer"],
-            "wortzahl": len(polished.split())
-        })
+        telegram_send(f"✍️ *Phase 3 & 4 gestartet*: Schreiben ({len(kapitel_liste)} Kapitel)")
         
-        # Telegram Update alle 5 Kapitel
-        if kap["nummer"] % 5 == 0:
-            telegram_send(f"📝 Kapitel {kap['nummer']}/{len(kapitel_liste)} fertig")
-    
-    # Phase 5: Flow-Check
-    corrected = phase5_flow_check(all_chapters, output_path)
-    
-    # Korrigierte speichern
-    for i, chapter in enumerate(corrected):
-        save_versioned(output_path, f"kapitel_{i+1:02d}.md", chapter)
-    
-    # Roman zusammenfügen
-    full_novel = "\n\n---\n\n".join(corrected)
-    (output_path / "ROMAN_KOMPLETT.md").write_text(full_novel)
+        all_chapters = []
+        vorheriges = None
+        kapitel_fertig = checkpoint.get("kapitel_fertig", [])
+        digest = StoryDigest(output_path)
+        bible = StoryBible(output_path)
+        
+        for kap in kapitel_liste:
+            if kap["nummer"] in kapitel_fertig:
+                polished = (output_path / f"kapitel_{kap['nummer']:02d}.md").read_text(encoding="utf-8")
+                log(f"   ↪️ Kapitel {kap['nummer']} aus Checkpoint")
+                all_chapters.append(polished)
+                vorheriges = polished
+                increment_status("woerter", len(polished.split()))
+                digest.submit(kap["nummer"], polished)  # No-op wenn schon zusammengefasst
+                bible.submit(kap["nummer"], polished)
+                continue
+            
+            # Akt-Gliederung für dieses Kapitel bestimmen
+            kap_akt = kap.get("akt", 1)
+            akt_gliederung = akte.get(f"akt_{kap_akt}", "")
+            
+            text = phase3_schreiben(
+                kapitel=kap, 
+                vorheriges_kapitel=vorheriges, 
+                output_dir=output_path,
+                roman_gliederung=gliederung,
+                akt_gliederung=akt_gliederung,
+                story=story,
+                story_so_far=digest.kontext(kap["nummer"])
+            )
+            # Zusammenfassung läuft parallel zum Polish (Handlung ändert sich dabei nicht)
+            digest.submit(kap["nummer"], text)
+            polished = phase4_polish(text, kap["nummer"], output_path)
+            
+            all_chapters.append(polished)
+            vorheriges = polished
+            
+            save_versioned(output_path, f"kapitel_{kap['nummer']:02d}.md", polished)
+            kapitel_fertig.append(kap["nummer"])
+            save_checkpoint(output_path, kapitel_fertig=kapitel_fertig)
+            bible.submit(kap["nummer"], polished)
+            increment_status("woerter", len(polished.split()))
+            
+            # In Qdrant speichern
+            qdrant_store_kapitel(kap["nummer"], polished)
+            
+            # Telegram Update alle 5 Kapitel
+            if kap["nummer"] % 5 == 0:
+                telegram_send(f"📝 Kapitel {kap['nummer']}/{len(kapitel_liste)} fertig")
+        
+        # Phase 5: Flow-Check
+        if checkpoint.get("flow_check_fertig"):
+            log("   ↪️ Phase 5 aus Checkpoint")
+            corrected = all_chapters
+        else:
+            corrected = phase5_flow_check(all_chapters, output_path, bible=bible)
+            
+            # Korrigierte speichern
+            for i, chapter in enumerate(corrected):
+                save_versioned(output_path, f"kapitel_{i+1:02d}.md", chapter)
+            save_checkpoint(output_path, flow_check_fertig=True)
+        
+        # Roman zusammenfügen
+        full_novel = "\n\n---\n\n".join(corrected)
+        (output_path / "ROMAN_KOMPLETT.md").write_text(full_novel)
+        
+        wortzahl = len(full_novel.split())
+        set_status(woerter=wortzahl)
+        log(f"\n   Gesamtwortzahl: {wortzahl:,} Wörter")
+        
+        # Phase 6 + 6.5: Gesamt-Check, dann Befunde gezielt beheben
+        if checkpoint.get("fix_fertig"):
+            log("   ↪️ Phase 6 + 6.5 aus Checkpoint")
+        else:
+            report = phase6_check(corrected, output_path, bible=bible)
+            corrected = phase6_5_fix(corrected, output_path, bible=bible)
+            save_checkpoint(output_path, fix_fertig=True)
+            
+            full_novel = "\n\n---\n\n".join(corrected)
+            (output_path / "ROMAN_KOMPLETT.md").write_text(full_novel)
+            wortzahl = len(full_novel.split())
     
-    wortzahl = len(full_novel.split())
-    log(f"\n   Gesamtwortzahl: {wortzahl:,} Wörter")
+    except PipelineCancelled:
+        qdrant_flush(timeout=120)
+        set_status(phase="🛑 Abgebrochen", detail="", cancel=False)
+        log(f"\n🛑 Abgebrochen - Checkpoint: {output_path / 'checkpoint.json'}")
+        telegram_send(f"🛑 *Pipeline abgebrochen*\n\nFortsetzen mit:\n`python novel_pipeline.py --resume {output_dir}`")
+        return output_path
     
-    # Phase 6: Gesamt-Check
-    report = phase6_check(full_novel, output_path)
+    set_status(phase="✅ Fertig", detail="Output")
+    qdrant_flush(timeout=300)
     
     duration = datetime.now() - start
     
@@ -1508,9 +4913,7 @@ def run_pipeline(setting: str, output_dir: str = None):
     # Roman zusammenfügen
     log(f"\n   📚 Erstelle Gesamtdatei...")
     
-    # Titel aus Gliederung extrahieren
-    titel_match = re.search(r'Titel[:\s]*([^\n]+)', gliederung, re.IGNORECASE)
-    titel = titel_match.group(1).strip() if titel_match else "Roman"
+    titel = story.titel
     titel_clean = re.sub(r'[^a-zA-ZäöüÄÖÜß0-9_\- ]', '', titel)[:50]
     
     roman_path = output_path / f"{titel_clean}.md"
@@ -1534,11 +4937,13 @@ def run_pipeline(setting: str, output_dir: str = None):
 ⏱ {duration}
 📁 {output_dir}""")
     
-    telegram_send_file(
-        open(roman_path).read(),
-        f"{titel_clean}.md",
-        f"📚 *{titel}*\n\n{wortzahl:,} Wörter | {len(corrected)} Kapitel"
-    )
+    caption = f"📚 *{titel}*\n\n{wortzahl:,} Wörter | {len(corrected)} Kapitel"
+    if TELEGRAM_COMPRESS_UPLOADS:
+        # Roman + alle Kapitel als ein ZIP
+        kapitel_paths = [output_path / f"kapitel_{i:02d}.md" for i in range(1, len(corrected) + 1)]
+        telegram_send_zip([roman_path] + kapitel_paths, f"{titel_clean}.zip", caption)
+    else:
+        telegram_send_file(roman_path, f"{titel_clean}.md", caption)
     
     # Hörbuch erstellen und senden
     mp3_path = text_to_speech(full_novel, output_path)
@@ -1548,7 +4953,7 @@ def run_pipeline(setting: str, output_dir: str = None):
             url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendAudio"
             with open(mp3_path, 'rb') as f:
                 requests.post(url, data={
-                    "chat_id": TELEGRAM_CHAT_ID,
+                    **telegram_target(),
                     "title": titel,
                     "performer": "Novel Pipeline V4"
                 }, files={
@@ -1575,12 +4980,31 @@ if __name__ == "__main__":
         print("  python novel_pipeline.py 'Setting'       - Direkt starten")
         print("  python novel_pipeline.py --telegram      - Auf Telegram /start warten")
         print("  python novel_pipeline.py --telegram 'Setting' - Setting vorbereiten, /start abwarten")
+        print("  python novel_pipeline.py --resume <output_dir>  - Abgebrochenen Run fortsetzen")
+        print("  python novel_pipeline.py --qdrant-cleanup <run_id> - Qdrant-Punkte eines Runs löschen")
+        print("  python novel_pipeline.py --qdrant-compact <output_root> [--apply] [--altbestand]")
+        print("                                                    - Runs ohne Output-Verzeichnis finden/entfernen")
         print("")
         print("Beispiel:")
         print("  python novel_pipeline.py 'Archäologin entdeckt auf Kreta ein Geheimnis'")
         sys.exit(1)
     
-    if sys.argv[1] == "--telegram":
+    if sys.argv[1] == "--qdrant-cleanup":
+        # run_id = Name des Output-Verzeichnisses
+        qdrant_cleanup(Path(sys.argv[2]).name)
+    elif sys.argv[1] == "--qdrant-compact":
+        # Ohne --apply nur auflisten; Output-Root ausdrücklich angeben (kein Default auf cwd)
+        if len(sys.argv) < 3 or sys.argv[2].startswith("--"):
+            print("Verwendung: python novel_pipeline.py --qdrant-compact <output_root> [--apply] [--altbestand]")
+            sys.exit(1)
+        qdrant_compact(Path(sys.argv[2]), apply="--apply" in sys.argv, altbestand="--altbestand" in sys.argv)
+    elif sys.argv[1] == "--resume":
+        # Fortsetzen ab checkpoint.json
+        if len(sys.argv) < 3:
+            print("Verwendung: python novel_pipeline.py --resume <output_dir>")
+            sys.exit(1)
+        run_pipeline("", output_dir=sys.argv[2], resume=True)
+    elif sys.argv[1] == "--telegram":
         # Telegram-Modus: Warte auf /start
         if len(sys.argv) > 2:
             # Setting vorbereitet, warte auf Bestätigung
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Novel Pipeline V4 - Telegram Webhook Relay
+Empfängt Telegram Updates per Webhook und verteilt sie nach Chat + Thread
+an mehrere parallel laufende Pipelines (ein Bot-Token, viele Runs)
+
+Pipelines holen ihre Updates per Long-Polling (nur auf localhost, Header X-Relay-Token):
+    GET /updates?chat_id=<id>&thread_id=<id>&offset=<update_id>&timeout=<s>
+Antwortformat wie Telegram getUpdates: {"ok": true, "result": [...]}
+
+Öffentlich (für Telegram) lauscht nur POST /webhook, beide Wege verlangen
+TELEGRAM_WEBHOOK_SECRET - ohne Secret startet der Relay nicht.
+"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import os
+import hmac
+import json
+import time
+import threading
+import requests
+
+from novel_pipeline import load_env
+
+load_env()
+
+MAX_UPDATES_PER_ROUTE = 500
+
+# (chat_id, thread_id) -> Liste von Updates, nach update_id sortiert
+ROUTES = {}
+ROUTES_CONDITION = threading.Condition()
+# Zuletzt vergebene update_id - streng monoton, auch über Test-Updates hinweg
+LAST_UPDATE_ID = 0
+
+
+def route_key(update: dict) -> tuple:
+    """Routing-Schlüssel eines Updates: (chat_id, message_thread_id)"""
+    message = update.get("message") or update.get("edited_message") or {}
+    chat_id = str(message.get("chat", {}).get("id", ""))
+    thread_id = str(message.get("message_thread_id", "") or "")
+    return chat_id, thread_id
+
+
+def publish_update(update: dict):
+    """Update in die Queue seines Runs legen und wartende Poller wecken
+    
+    Der Relay vergibt die update_id selbst: Telegram-IDs bleiben erhalten, solange sie
+    steigen, Test-Updates (ohne update_id) bekommen die nächste freie ID. So kollidiert
+    kein Test-Update mit einem echten und die Offsets der Pipelines bleiben gültig.
+    """
+    global LAST_UPDATE_ID
+    key = route_key(update)
+    with ROUTES_CONDITION:
+        LAST_UPDATE_ID = max(LAST_UPDATE_ID + 1, int(update.get("update_id", 0)))
+        update["update_id"] = LAST_UPDATE_ID
+        updates = ROUTES.setdefault(key, [])
+        updates.append(update)
+        del updates[:-MAX_UPDATES_PER_ROUTE]
+        ROUTES_CONDITION.notify_all()
+
+
+def fetch_updates(chat_id: str, thread_id: str, offset: int, timeout: float) -> list:
+    """Updates ab offset für einen Run (Long-Polling, bestätigt ältere wie getUpdates)"""
+    key = (chat_id, thread_id)
+    deadline = time.time() + timeout
+    with ROUTES_CONDITION:
+        while True:
+            updates = ROUTES.get(key, [])
+            # Alles unter offset gilt als bestätigt
+            updates[:] = [u for u in updates if u["update_id"] >= offset]
+            if updates:
+                return list(updates)
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return []
+            ROUTES_CONDITION.wait(remaining)
+
+
+def secret_ok(value: str) -> bool:
+    """Header-Wert gegen TELEGRAM_WEBHOOK_SECRET prüfen (ohne Secret: immer abgelehnt)"""
+    secret = os.environ.get("TELEGRAM_WEBHOOK_SECRET", "")
+    return bool(secret) and hmac.compare_digest((value or "").encode(), secret.encode())
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    # Nur der localhost-Listener liefert /updates aus
+    serve_updates = False
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/webhook':
+            self.send_json(404, {"ok": False})
+            return
+
+        # Telegram schickt das beim setWebhook vergebene Secret mit
+        if not secret_ok(self.headers.get('X-Telegram-Bot-Api-Secret-Token')):
+            self.send_json(403, {"ok": False})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            update = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_json(400, {"ok": False})
+            return
+
+        if not isinstance(update, dict):
+            self.send_json(400, {"ok": False})
+            return
+
+        publish_update(update)
+        self.send_json(200, {"ok": True, "update_id": update["update_id"]})
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if not self.serve_updates or parsed.path != '/updates':
+            self.send_json(404, {"ok": False})
+            return
+
+        if not secret_ok(self.headers.get('X-Relay-Token')):
+            self.send_json(403, {"ok": False})
+            return
+
+        params = parse_qs(parsed.query)
+        chat_id = params.get('chat_id', [''])[0]
+        thread_id = params.get('thread_id', [''])[0]
+        offset = int(params.get('offset', ['0'])[0] or 0)
+        timeout = min(float(params.get('timeout', ['0'])[0] or 0), 50)
+
+        self.send_json(200, {"ok": True, "result": fetch_updates(chat_id, thread_id, offset, timeout)})
+
+    def send_json(self, status: int, data: dict):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalRelayHandler(WebhookHandler):
+    serve_updates = True
+
+
+def set_webhook(public_url: str) -> dict:
+    """Registriert <public_url>/webhook bei Telegram (danach liefert getUpdates 409)"""
+    data = {
+        "url": public_url.rstrip('/') + '/webhook',
+        "secret_token": os.environ["TELEGRAM_WEBHOOK_SECRET"],
+    }
+    r = requests.post(
+        f"https://api.telegram.org/bot{os.environ.get('TELEGRAM_BOT_TOKEN')}/setWebhook",
+        json=data,
+        timeout=30
+    )
+    return r.json()
+
+
+def send_test_update(relay_url: str, text: str, chat_id: str, thread_id: str = None) -> dict:
+    """Lokaler Stand-in für Telegram: postet ein synthetisches Update an den Relay
+    
+    Ohne update_id - der Relay vergibt sie aus seinem Zähler (siehe publish_update).
+    """
+    message = {
+        "message_id": int(time.time() * 1000) % 2**31,
+        "date": int(time.time()),
+        "chat": {"id": int(chat_id), "type": "supergroup" if thread_id else "private"},
+        "text": text,
+    }
+    if thread_id:
+        message["message_thread_id"] = int(thread_id)
+
+    headers = {'X-Telegram-Bot-Api-Secret-Token': os.environ["TELEGRAM_WEBHOOK_SECRET"]}
+
+    r = requests.post(relay_url.rstrip('/') + '/webhook', json={"message": message},
+                      headers=headers, timeout=10)
+    return r.json()
+
+
+if __name__ == '__main__':
+    import sys
+
+    if not os.environ.get("TELEGRAM_WEBHOOK_SECRET"):
+        print("❌ TELEGRAM_WEBHOOK_SECRET fehlt (.env oder Environment) - ohne Secret kann jeder")
+        print("   Updates lesen oder /cancel bzw. Freigaben posten. Relay startet nicht.")
+        sys.exit(1)
+
+    if len(sys.argv) > 1 and sys.argv[1] == '--set-webhook':
+        print(set_webhook(sys.argv[2]))
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] == '--send-test':
+        # --send-test <text> [chat_id] [thread_id]
+        relay = os.environ.get("TELEGRAM_WEBHOOK_RELAY", "http://localhost:8444")
+        chat = sys.argv[3] if len(sys.argv) > 3 else os.environ.get("TELEGRAM_CHAT_ID", "0")
+        thread = sys.argv[4] if len(sys.argv) > 4 else None
+        print(send_test_update(relay, sys.argv[2], chat, thread))
+        sys.exit(0)
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8443
+    local_port = int(sys.argv[2]) if len(sys.argv) > 2 else port + 1
+
+    # /updates nur auf localhost, öffentlich nur der Webhook für Telegram
+    local = ThreadingHTTPServer(('127.0.0.1', local_port), LocalRelayHandler)
+    threading.Thread(target=local.serve_forever, name="relay-local", daemon=True).start()
+
+    print(f"📡 Telegram Webhook Relay: http://0.0.0.0:{port}/webhook (öffentlich, nur POST)")
+    print(f"   Pipelines: TELEGRAM_WEBHOOK_RELAY=http://localhost:{local_port}")
+    print("   Ctrl+C zum Beenden")
+
+    ThreadingHTTPServer(('0.0.0.0', port), WebhookHandler).serve_forever()